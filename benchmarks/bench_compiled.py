@@ -0,0 +1,85 @@
+"""Cold-load benchmark: vocabs.txt as dicts or as a WordTable, and compiled vocabs.bin.
+
+Each measurement runs in a fresh interpreter so neither side benefits from
+warm caches inside the process. Usage:
+
+    python benchmarks/bench_compiled.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import vocab  # noqa: E402
+from gen_deck import make_deck  # noqa: E402
+
+# Runs in the child: measures wall time and peak RSS growth for one load.
+CHILD = r'''
+import json, resource, sys, time
+sys.path.insert(0, %(root)r)
+import vocab
+
+def rss_kb():
+    # ru_maxrss survives exec on Linux (it would report the parent's peak),
+    # so prefer the current resident size where /proc is available.
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+before = rss_kb()
+start = time.perf_counter()
+if %(kind)r == 'json':
+    with open(%(path)r, encoding='utf-8') as f:
+        data = json.load(f)
+elif %(kind)r == 'table':
+    with open(%(path)r, encoding='utf-8') as f:
+        data = vocab.WordTable.from_json(f.read())
+else:
+    data = vocab.load_compiled(%(path)r)
+elapsed = time.perf_counter() - start
+after = rss_kb()
+print(json.dumps({'seconds': elapsed, 'rss_kb': after - before}))
+'''
+
+
+def measure(kind, path):
+    code = CHILD % {'root': os.path.dirname(HERE), 'kind': kind, 'path': path}
+    out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True)
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            deck = make_deck(n)
+            txt = os.path.join(tmp, 'vocabs_%d.txt' % n)
+            binary = os.path.join(tmp, 'vocabs_%d.bin' % n)
+            with open(txt, 'w', encoding='utf-8') as f:
+                json.dump(deck, f, ensure_ascii=False, indent=2)
+            vocab.compile_vocabs(deck, binary)
+            del deck
+            for kind, path in (('json', txt), ('table', txt), ('compiled', binary)):
+                row = dict(measure(kind, path), words=n, format=kind, bytes=os.path.getsize(path))
+                results.append(row)
+                print('%8d words  %-8s  %8.3f s  %9.1f MB RSS  %9.1f MB file' % (
+                    n, kind, row['seconds'], row['rss_kb'] / 1024.0, row['bytes'] / 1e6), file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
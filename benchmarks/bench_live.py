@@ -0,0 +1,232 @@
+"""Live quiz load test: hundreds of simulated players in one room.
+
+Starts `vocab.py live` on a generated deck in a child process, hosts a room
+from this process and spreads the players over a few client processes, each
+running its own event loop. Every player answers each question after a
+random think time. Reports how long a question takes to reach every player
+(host's "next" to each player's receipt, on the shared monotonic clock),
+the answer-to-ack round trip, and leaderboard updates per player. Usage:
+
+    python benchmarks/bench_live.py [--clients 300] [--questions 10] [--procs 4]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from bench_load import percentile  # noqa: E402
+from gen_deck import write_deck  # noqa: E402
+from vocab_live import OP_CLOSE, encode_frame, read_frame  # noqa: E402
+
+# Runs in the child: serve live rooms on the given deck and report the port.
+SERVER = r'''
+import asyncio, os, sys
+sys.path.insert(0, %(root)r)
+os.environ['DUOVOCAB_PROGRESS_DB'] = %(db)r
+import vocab, vocab_live
+
+vocab.vocab_store = vocab.VocabStore(%(deck)r, None)
+vocab.distractor_index(vocab.vocab_store.snapshot())
+
+async def main():
+    server = await vocab_live.LiveServer().start('127.0.0.1', 0)
+    print(server.sockets[0].getsockname()[1], flush=True)
+    await server.serve_forever()
+
+asyncio.run(main())
+'''
+
+
+class Socket:
+    """A bare-bones WebSocket client on asyncio streams."""
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+
+    @classmethod
+    async def connect(cls, port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        writer.write(('GET /ws HTTP/1.1\r\nHost: 127.0.0.1:%d\r\nUpgrade: websocket\r\n'
+                      'Connection: Upgrade\r\nSec-WebSocket-Key: %s\r\nSec-WebSocket-Version: 13\r\n\r\n'
+                      % (port, key)).encode())
+        head = await reader.readuntil(b'\r\n\r\n')
+        if not head.startswith(b'HTTP/1.1 101'):
+            raise ConnectionError(head.split(b'\r\n', 1)[0].decode('latin-1'))
+        return cls(reader, writer)
+
+    def send(self, message):
+        self.writer.write(encode_frame(json.dumps(message).encode('utf-8'), mask=os.urandom(4)))
+
+    async def receive(self):
+        _, opcode, payload = await read_frame(self.reader, 1 << 20, masked=False)
+        return None if opcode == OP_CLOSE else json.loads(payload)
+
+    def close(self):
+        self.writer.close()
+
+
+async def play(port, code, name, think, seed, joined, result):
+    rng = random.Random(seed)
+    sock = await Socket.connect(port)
+    sock.send({'type': 'join', 'code': code, 'name': name})
+    sent = {}
+    while True:
+        message = await sock.receive()
+        kind = message and message['type']
+        if kind is None or kind in ('finished', 'closed'):
+            break
+        if kind == 'joined':
+            joined.release()
+        elif kind == 'question':
+            result['received'].append((message['n'], time.monotonic()))
+            delay = rng.uniform(*think)
+
+            def answer(n=message['n'], options=len(message['options'])):
+                sent[n] = time.monotonic()
+                sock.send({'type': 'answer', 'n': n, 'option': rng.randrange(options)})
+            asyncio.get_running_loop().call_later(delay, answer)
+        elif kind == 'ack':
+            result['rtt'].append(time.monotonic() - sent[message['n']])
+        elif kind == 'board':
+            result['boards'] += 1
+        elif kind == 'error':
+            result['errors'] += 1
+    sock.close()
+
+
+def run_players(port, code, names, think, seed, ready, out):
+    """One client process: ``names`` players on a single event loop."""
+    result = {'received': [], 'rtt': [], 'boards': 0, 'errors': 0}
+
+    async def main():
+        joined = asyncio.Semaphore(0)
+        tasks = [asyncio.create_task(play(port, code, name, think, seed + i, joined, result))
+                 for i, name in enumerate(names)]
+        for _ in names:
+            await joined.acquire()
+        ready.put(len(names))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    out.put(result)
+
+
+async def host(port, args, procs):
+    sock = await Socket.connect(port)
+    sock.send({'type': 'create', 'lessons': list(range(min(args.lessons, 20))),
+               'questions': args.questions, 'seconds': args.seconds})
+    created = await sock.receive()
+    if created['type'] != 'created':
+        raise RuntimeError(created)
+
+    ctx = multiprocessing.get_context('spawn')
+    ready, out = ctx.Queue(), ctx.Queue()
+    workers = []
+    for i in range(procs):
+        names = ['player-%d' % n for n in range(i, args.clients, procs)]
+        workers.append(ctx.Process(target=run_players, args=(
+            port, created['code'], names, (args.think_min, args.think_max), 1000 * i, ready, out)))
+    for w in workers:
+        w.start()
+    loop = asyncio.get_running_loop()
+    joined = 0
+    while joined < args.clients:
+        joined += await loop.run_in_executor(None, ready.get)
+
+    asked, reveals = {}, []
+    for n in range(1, created['questions'] + 1):
+        asked[n] = time.monotonic()
+        sock.send({'type': 'next'})
+        while True:
+            message = await sock.receive()
+            if message['type'] == 'reveal':
+                reveals.append((time.monotonic() - asked[n], message['answered']))
+                break
+    sock.send({'type': 'end'})
+    results = [await loop.run_in_executor(None, out.get) for _ in workers]
+    for w in workers:
+        w.join()
+    sock.close()
+    return created, asked, reveals, results
+
+
+def summarize(args, created, asked, reveals, results):
+    fanout = sorted((t - asked[n]) * 1000.0 for r in results for n, t in r['received'])
+    # The slowest player per question: when the last phone in the room had it.
+    last = {}
+    for r in results:
+        for n, t in r['received']:
+            last[n] = max(last.get(n, 0.0), (t - asked[n]) * 1000.0)
+    rtt = sorted(x * 1000.0 for r in results for x in r['rtt'])
+    questions = created['questions']
+    return {
+        'clients': args.clients,
+        'procs': args.procs,
+        'questions': questions,
+        'deliveries': len(fanout),
+        'answers': len(rtt),
+        'errors': sum(r['errors'] for r in results),
+        'fanout_p50_ms': percentile(fanout, 50),
+        'fanout_p95_ms': percentile(fanout, 95),
+        'fanout_p99_ms': percentile(fanout, 99),
+        'fanout_last_max_ms': max(last.values()) if last else None,
+        'ack_p50_ms': percentile(rtt, 50),
+        'ack_p95_ms': percentile(rtt, 95),
+        'ack_p99_ms': percentile(rtt, 99),
+        'ack_max_ms': rtt[-1] if rtt else None,
+        'boards_per_player_question': sum(r['boards'] for r in results) / float(args.clients * questions),
+        'question_seconds_mean': sum(t for t, _ in reveals) / len(reveals) if reveals else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--procs', type=int, default=min(4, os.cpu_count() or 1), help='client processes')
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--seconds', type=float, default=10.0, help='time limit per question')
+    parser.add_argument('--think-min', type=float, default=0.2)
+    parser.add_argument('--think-max', type=float, default=2.0)
+    parser.add_argument('--lessons', type=int, default=100)
+    parser.add_argument('--words-per-lesson', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        deck = os.path.join(tmp, 'vocabs.txt')
+        write_deck(deck, args.lessons, args.words_per_lesson)
+        code = SERVER % {'root': ROOT, 'deck': deck, 'db': os.path.join(tmp, 'progress.db')}
+        proc = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True)
+        try:
+            line = proc.stdout.readline()
+            if not line:
+                raise RuntimeError('server failed to start')
+            result = summarize(args, *asyncio.run(host(int(line), args, args.procs)))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print('%d players, %d questions: question reaches players p50 %.2f  p95 %.2f  p99 %.2f ms '
+          '(last player, worst question %.2f ms)' % (
+              result['clients'], result['questions'], result['fanout_p50_ms'], result['fanout_p95_ms'],
+              result['fanout_p99_ms'], result['fanout_last_max_ms']), file=sys.stderr)
+    print('answer ack p50 %.2f  p95 %.2f  p99 %.2f  max %.2f ms, %.1f board updates per player per question, '
+          '%d errors' % (result['ack_p50_ms'], result['ack_p95_ms'], result['ack_p99_ms'], result['ack_max_ms'],
+                         result['boards_per_player_question'], result['errors']), file=sys.stderr)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
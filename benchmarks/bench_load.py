@@ -0,0 +1,210 @@
+"""Multi-threaded HTTP load driver: per-route latency percentiles and throughput.
+
+By default it starts the app on a generated deck in a child process and
+drives it from this one, so client and server don't share a GIL. Use
+``--url`` to point it at a server that is already running instead. Usage:
+
+    python benchmarks/bench_load.py [--words 20000] [--threads 8] [--duration 10]
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from gen_deck import write_deck  # noqa: E402
+
+# Runs in the child: serve the app on the given deck and report the port.
+SERVER = r'''
+import os, sys
+sys.path.insert(0, %(root)r)
+os.environ['DUOVOCAB_PROGRESS_DB'] = %(db)r
+import vocab
+from werkzeug.serving import make_server
+
+vocab.vocab_store = vocab.VocabStore(%(deck)r, None)
+server = make_server('127.0.0.1', 0, vocab.app, threaded=True)
+print(server.server_port, flush=True)
+server.serve_forever()
+'''
+
+# (route label, weight, path builder). Lesson ids and queries are drawn per
+# request so the page caches see a realistic mix of hits and misses.
+QUERIES = ['ca', 'ma', 'ción', 'de', 'ří', 'ne', 'sto', 'lo', 'xq']
+
+
+def route_mix(lessons):
+    return [
+        ('/', 3, lambda rng: '/'),
+        ('/practice', 2, lambda rng: '/practice?lesson_id=%d' % rng.randrange(lessons)),
+        ('/api/practice', 4, lambda rng: '/api/practice?lesson_id=%d' % rng.randrange(lessons)),
+        ('/dictionary', 2, lambda rng: '/dictionary?page=%d' % rng.randint(1, 20)),
+        ('/api/search', 4, lambda rng: '/api/search?' + urllib.parse.urlencode({'q': rng.choice(QUERIES)})),
+        ('/custom', 1, lambda rng: '/custom'),
+    ]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile.
+    rank = math.ceil(pct / 100.0 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+class Worker(threading.Thread):
+    def __init__(self, host, port, mix, deadline, seed):
+        super().__init__(daemon=True)
+        self.host, self.port = host, port
+        self.mix = mix
+        self.weights = [weight for _, weight, _ in mix]
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.samples = []
+        self.errors = {}
+        self.conn = None
+
+    def request(self, path):
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+                response = self.conn.getresponse()
+                response.read()
+                if response.will_close:
+                    self.conn.close()
+                    self.conn = None
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def run(self):
+        while time.monotonic() < self.deadline:
+            label, _, path = self.rng.choices(self.mix, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                status = self.request(path(self.rng))
+            except (http.client.HTTPException, OSError):
+                status = None
+            elapsed = time.perf_counter() - start
+            if status == 200:
+                self.samples.append((label, elapsed))
+            else:
+                self.errors[label] = self.errors.get(label, 0) + 1
+
+
+def drive(host, port, lessons, threads, duration, warmup, seed=0):
+    mix = route_mix(lessons)
+    if warmup:
+        warm = [Worker(host, port, mix, time.monotonic() + warmup, seed - i - 1) for i in range(threads)]
+        for w in warm:
+            w.start()
+        for w in warm:
+            w.join()
+
+    deadline = time.monotonic() + duration
+    workers = [Worker(host, port, mix, deadline, seed + i) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - start
+
+    by_route, errors = {}, {}
+    for w in workers:
+        for label, elapsed in w.samples:
+            by_route.setdefault(label, []).append(elapsed * 1000.0)
+        for label, count in w.errors.items():
+            errors[label] = errors.get(label, 0) + count
+
+    routes = {}
+    for label, _, _ in mix:
+        latencies = sorted(by_route.get(label, []))
+        routes[label] = {
+            'requests': len(latencies),
+            'errors': errors.get(label, 0),
+            'rps': len(latencies) / wall,
+            'mean_ms': sum(latencies) / len(latencies) if latencies else None,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+        }
+    total = sum(r['requests'] for r in routes.values())
+    return {
+        'threads': threads,
+        'seconds': wall,
+        'requests': total,
+        'errors': sum(errors.values()),
+        'rps': total / wall,
+        'routes': routes,
+    }
+
+
+def start_server(tmp, words, words_per_lesson):
+    deck = os.path.join(tmp, 'vocabs.txt')
+    write_deck(deck, max(1, words // words_per_lesson), words_per_lesson)
+    code = SERVER % {'root': ROOT, 'deck': deck, 'db': os.path.join(tmp, 'progress.db')}
+    proc = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True)
+    line = proc.stdout.readline()
+    if not line:
+        proc.kill()
+        raise RuntimeError('server failed to start')
+    return proc, int(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='drive an already running server instead of starting one')
+    parser.add_argument('--lessons', type=int, help='lesson count of the deck behind --url')
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--words-per-lesson', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    args = parser.parse_args()
+
+    proc = None
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            if args.url:
+                url = urllib.parse.urlsplit(args.url)
+                host, port = url.hostname, url.port or 80
+                lessons = args.lessons or 1
+            else:
+                proc, port = start_server(tmp, args.words, args.words_per_lesson)
+                host = '127.0.0.1'
+                lessons = max(1, args.words // args.words_per_lesson)
+            result = drive(host, port, lessons, args.threads, args.duration, args.warmup)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+    for label, row in result['routes'].items():
+        if row['requests']:
+            print('%-16s %7d req %8.1f req/s  p50 %7.2f  p95 %7.2f  p99 %7.2f ms  %d errors' % (
+                label, row['requests'], row['rps'], row['p50_ms'], row['p95_ms'], row['p99_ms'],
+                row['errors']), file=sys.stderr)
+    print('%-16s %7d req %8.1f req/s' % ('total', result['requests'], result['rps']), file=sys.stderr)
+    print(json.dumps(dict(result, words=None if args.url else args.words), indent=2))
+
+
+if __name__ == '__main__':
+    main()
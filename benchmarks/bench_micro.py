@@ -0,0 +1,141 @@
+"""Micro-benchmarks for the load, index and render paths.
+
+Runs in-process against a generated deck and prints one JSON object per
+benchmark (per-call milliseconds), so runs can be diffed across commits.
+Usage:
+
+    python benchmarks/bench_micro.py [--words 20000] [--repeat 5] [--only search]
+"""
+import argparse
+import atexit
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+TMP = tempfile.mkdtemp(prefix='duovocab-bench-')
+atexit.register(shutil.rmtree, TMP, ignore_errors=True)
+# Keep benchmark progress/answer rows out of the real database.
+os.environ.setdefault('DUOVOCAB_PROGRESS_DB', os.path.join(TMP, 'progress.db'))
+
+import vocab  # noqa: E402
+from gen_deck import write_deck  # noqa: E402
+
+
+def timed(fn, repeat, number=1, setup=None):
+    """Per-call milliseconds over ``repeat`` rounds of ``number`` calls each."""
+    rounds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) * 1000.0 / number)
+    return {
+        'min_ms': min(rounds),
+        'median_ms': statistics.median(rounds),
+        'max_ms': max(rounds),
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def fresh_snapshot(lessons):
+    # A new version each time, so nothing memoized by derived() is reused.
+    fresh_snapshot.version += 1
+    return vocab.VocabSnapshot(fresh_snapshot.version, lessons, None)
+
+
+fresh_snapshot.version = 1000
+
+
+def benchmarks(deck_path, compiled_path):
+    """Yield ``(name, fn, timing options)`` for every benchmark."""
+    store = vocab.VocabStore(deck_path, None, check_interval=3600)
+    vocab.vocab_store = store
+    lessons = store.snapshot().lessons
+    snapshot = store.snapshot()
+    client = vocab.app.test_client()
+
+    def load_json():
+        vocab.VocabStore(deck_path, None).snapshot()
+
+    def load_compiled():
+        vocab.load_compiled(compiled_path)
+
+    yield 'load.json', load_json, {}
+    yield 'load.compiled', load_compiled, {}
+    yield 'load.compile', lambda: vocab.compile_vocabs(lessons, compiled_path), {}
+
+    for name, build in (('flat_words', vocab.flat_words),
+                        ('lesson_summaries', vocab.lesson_summaries),
+                        ('deck_stats', vocab.deck_stats),
+                        ('distractor_index', vocab.distractor_index),
+                        ('search_index', vocab.search_index),
+                        ('card_lookup', vocab.card_lookup),
+                        ('grading_index', vocab.grading_index)):
+        yield 'index.' + name, lambda build=build: build(fresh_snapshot(lessons)), {}
+
+    index = vocab.search_index(snapshot)
+    for query in ('ca', 'ción', 'něco', 'zz'):
+        yield 'search.%s' % query, lambda query=query: index.search(query), dict(number=200)
+
+    grading = vocab.grading_index(snapshot)
+    word = lessons[0]['words'][0]
+    yield 'grade.exact', lambda: grading.grade(word, 'es-cz', word['czech']), dict(number=1000)
+    yield 'grade.typo', lambda: grading.grade(word, 'es-cz', word['czech'][:-1] + 'x'), dict(number=1000)
+
+    distractors = vocab.practice_distractors(snapshot, [0])
+    yield 'question.build', lambda: vocab.build_question(word, distractors), dict(number=1000)
+
+    vocab.deck_stats(snapshot)
+
+    def edit_word():
+        # Applied to the same snapshot each time, with every index built.
+        editor = vocab.DeckEditor(snapshot.lessons)
+        editor.apply({'op': 'update_word', 'lesson': 0, 'position': 0, 'word': {'notes': 'edited'}})
+        snapshot.edited(editor.deck(), editor.steps)
+    yield 'edit.update_word', edit_word, dict(number=20)
+
+    routes = ('/', '/dictionary', '/dictionary?page=5', '/custom',
+              '/api/practice?lesson_id=0', '/api/search?q=ma')
+    for route in routes:
+        def get(route=route):
+            response = client.get(route)
+            assert response.status_code == 200, (route, response.status_code)
+        yield 'render.cold %s' % route, get, dict(setup=vocab.page_cache.clear)
+        yield 'render.warm %s' % route, get, dict(number=20)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--words-per-lesson', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', help='run only benchmarks whose name contains this')
+    args = parser.parse_args()
+
+    deck_path = os.path.join(TMP, 'vocabs.txt')
+    compiled_path = os.path.join(TMP, 'vocabs.bin')
+    write_deck(deck_path, max(1, args.words // args.words_per_lesson), args.words_per_lesson)
+    vocab.compile_vocabs(vocab.VocabStore(deck_path, None).snapshot().lessons, compiled_path)
+
+    results = []
+    for name, fn, options in benchmarks(deck_path, compiled_path):
+        if args.only and args.only not in name:
+            continue
+        row = timed(fn, args.repeat, **options)
+        results.append(dict(row, name=name))
+        print('%-40s %10.3f ms (median %.3f)' % (name, row['min_ms'], row['median_ms']), file=sys.stderr)
+    print(json.dumps({'words': args.words, 'python': sys.version.split()[0], 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
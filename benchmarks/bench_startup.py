@@ -0,0 +1,78 @@
+"""Startup check for the terminal drill: cold `python vocab.py drill` runs.
+
+Runs the documented command in a fresh interpreter each time, on a generated
+deck, answering 'q' to the first question, and compares the wall time with
+a bare `python -c pass`. The first run (which may write __pycache__) is not
+counted. Exits with status 1 if the median is above ``--max-ms``. Usage:
+
+    python benchmarks/bench_startup.py [--words 100000] [--runs 20] [--max-ms 100]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from bench_load import percentile  # noqa: E402
+from gen_deck import write_deck  # noqa: E402
+
+
+def time_runs(argv, runs, env):
+    times = []
+    for i in range(runs + 1):
+        start = time.perf_counter()
+        subprocess.run(argv, input='q\n', env=env, cwd=ROOT, check=True, text=True,
+                       stdout=subprocess.DEVNULL)
+        if i:
+            times.append(time.perf_counter() - start)
+    return sorted(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--words', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--lesson', type=int, default=0, help='lesson to drill')
+    parser.add_argument('--max-ms', type=float, default=100.0, help='fail above this median')
+    args = parser.parse_args()
+    if os.environ.get('PYTHONDONTWRITEBYTECODE'):
+        print('Warning: PYTHONDONTWRITEBYTECODE is set, so vocab_core.py is recompiled on every run',
+              file=sys.stderr)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        deck = os.path.join(tmp, 'vocabs.txt')
+        write_deck(deck, max(1, args.words // 50))
+        # Progress and sessions go to the temp dir, should anything open them.
+        env = dict(os.environ, DUOVOCAB_PROGRESS_DB=os.path.join(tmp, 'progress.db'),
+                   DUOVOCAB_SECRET_KEY_FILE=os.path.join(tmp, 'secret_key'))
+        commands = (
+            ('python -c pass', [sys.executable, '-c', 'pass']),
+            ('vocab.py drill', [sys.executable, 'vocab.py', 'drill', str(args.lesson), '--source', deck,
+                                '--compiled', os.path.join(tmp, 'vocabs.bin')]),
+        )
+        for name, argv in commands:
+            times = time_runs(argv, args.runs, env)
+            results[name] = {'median_ms': statistics.median(times) * 1000,
+                             'p90_ms': percentile(times, 90) * 1000}
+            print('%-16s median %6.1f ms  p90 %6.1f ms' % (
+                name, results[name]['median_ms'], results[name]['p90_ms']), file=sys.stderr)
+        if os.path.exists(os.path.join(tmp, 'progress.db')):
+            print('Warning: the drill created progress.db', file=sys.stderr)
+    print(json.dumps(results, indent=2))
+    if results['vocab.py drill']['median_ms'] > args.max_ms:
+        print('vocab.py drill takes %.1f ms to start, above %.0f ms' % (
+            results['vocab.py drill']['median_ms'], args.max_ms), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
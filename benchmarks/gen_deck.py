@@ -0,0 +1,89 @@
+"""Synthetic vocabs.txt generator for benchmarks and load tests.
+
+Words are built from Spanish/Czech-like syllables so string lengths, accent
+density and prefix sharing resemble a real deck. Output is deterministic
+for a given seed. Usage:
+
+    python benchmarks/gen_deck.py --lessons 200 --words-per-lesson 50 -o deck.txt
+"""
+import argparse
+import json
+import random
+import sys
+
+TYPES = ['Word', 'Noun', 'Verb', 'Adjective', 'Phrase']
+
+SPANISH_SYLLABLES = [
+    'la', 'ma', 'ca', 'de', 'te', 'pe', 'ri', 'si', 'ni', 'co', 'lo', 'to',
+    'mu', 'ru', 'ción', 'más', 'qué', 'ñu', 'llo', 'rra', 'sí', 'tú', 'é', 'ía',
+]
+CZECH_SYLLABLES = [
+    'ka', 'po', 'ne', 'dě', 'ří', 'mě', 'ná', 'sto', 'kou', 'ji', 'vo', 'le',
+    'ži', 'šo', 'ča', 'tý', 'ů', 'ře', 'pr', 'zá', 'ho', 'ny', 'ov', 'ek',
+]
+
+
+def make_term(rng, syllables, min_syllables=2, max_syllables=4):
+    return ''.join(rng.choice(syllables) for _ in range(rng.randint(min_syllables, max_syllables)))
+
+
+def make_entry(rng, syllables):
+    """One side of a card: usually a word, sometimes a short phrase."""
+    if rng.random() < 0.15:
+        return ' '.join(make_term(rng, syllables, 1, 3) for _ in range(rng.randint(2, 4)))
+    return make_term(rng, syllables)
+
+
+def make_lesson(rng, number, n_words):
+    return {
+        'lesson_name': 'Lesson %d: %s' % (number, make_term(rng, SPANISH_SYLLABLES, 2, 4).capitalize()),
+        'words': [{
+            'spanish': make_entry(rng, SPANISH_SYLLABLES),
+            'czech': make_entry(rng, CZECH_SYLLABLES),
+            'type': rng.choice(TYPES),
+            'notes': make_entry(rng, SPANISH_SYLLABLES) if rng.random() < 0.2 else '',
+        } for _ in range(n_words)],
+    }
+
+
+def iter_lessons(lessons, words_per_lesson=50, seed=0):
+    rng = random.Random(seed)
+    for number in range(1, lessons + 1):
+        yield make_lesson(rng, number, words_per_lesson)
+
+
+def make_deck(n_words, words_per_lesson=50, seed=0):
+    """A deck of ``n_words`` words split into lessons of ``words_per_lesson``."""
+    rng = random.Random(seed)
+    return [make_lesson(rng, number, min(words_per_lesson, n_words - start))
+            for number, start in enumerate(range(0, n_words, words_per_lesson), 1)]
+
+
+def write_deck(path, lessons, words_per_lesson=50, seed=0):
+    """Stream a generated deck to ``path`` one lesson at a time."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for i, lesson in enumerate(iter_lessons(lessons, words_per_lesson, seed)):
+            f.write(',\n' if i else '\n')
+            json.dump(lesson, f, ensure_ascii=False)
+        f.write('\n]\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lessons', type=int, default=100)
+    parser.add_argument('--words-per-lesson', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='-', help="output path ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.output == '-':
+        json.dump(list(iter_lessons(args.lessons, args.words_per_lesson, args.seed)),
+                  sys.stdout, ensure_ascii=False)
+        sys.stdout.write('\n')
+    else:
+        write_deck(args.output, args.lessons, args.words_per_lesson, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Keep the module-level stores away from the checkout's progress.db.
+_tmp = tempfile.mkdtemp(prefix='duovocab-tests-')
+os.environ.setdefault('DUOVOCAB_PROGRESS_DB', os.path.join(_tmp, 'progress.db'))
+os.environ.setdefault('DUOVOCAB_SECRET_KEY_FILE', os.path.join(_tmp, 'secret_key'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,42 @@
+import os
+import sqlite3
+
+from vocab import AnswerLog
+
+
+def rows(n, user='u'):
+    return [(user, 1000.0 + i, 1, i, 'w%d\tx' % i, 'es-cz', i % 2, 800) for i in range(n)]
+
+
+def stored(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute('SELECT COUNT(*) FROM answer_events').fetchone()[0]
+
+
+def test_full_queue_refuses_and_counts(tmp_path):
+    path = str(tmp_path / 'progress.db')
+    log = AnswerLog(path, max_queue=5, batch_size=2)
+    log._writer_pid = os.getpid()  # no writer thread: the queue only fills
+    assert log.submit(rows(8)) == 5
+    assert log.submit(rows(1)) == 0
+    stats = log.stats()
+    assert (stats['accepted'], stats['dropped'], stats['queued']) == (5, 4, 5)
+
+    log.flush()
+    stats = log.stats()
+    assert (stats['written'], stats['batches'], stats['queued']) == (5, 3, 0)
+    assert log.submit(rows(3)) == 3
+    log.flush()
+    assert stored(path) == 8
+
+
+def test_close_drains_the_queue(tmp_path):
+    path = str(tmp_path / 'progress.db')
+    log = AnswerLog(path, batch_size=50, flush_interval=0.05)
+    for user in range(20):
+        assert log.submit(rows(30, 'u%d' % user)) == 30
+    log.close()
+    assert not log._writer_thread.is_alive()
+    assert log.stats()['queued'] == 0
+    assert stored(path) == 600
+    assert log.missed('u3') == {'w%d\tx' % i: 1 for i in range(0, 30, 2)}
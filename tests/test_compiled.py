@@ -0,0 +1,55 @@
+import pytest
+
+from vocab import VocabFormatError, compile_vocabs, load_compiled, validate_vocabs
+
+DECK = [
+    {'lesson_name': 'Animals', 'words': [
+        {'spanish': 'perro', 'czech': 'pes', 'type': 'Noun', 'notes': ''},
+        {'spanish': 'gato', 'czech': 'kočka', 'type': 'Noun', 'notes': 'f.'},
+    ]},
+    {'lesson_name': 'Empty', 'words': []},
+    {'lesson_name': 'Verbs', 'words': [
+        {'spanish': 'comer', 'czech': 'jíst', 'type': 'Verb', 'notes': ''},
+        {'spanish': 'perro', 'czech': 'pes', 'type': 'Noun', 'notes': ''},
+    ]},
+]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'vocabs.bin')
+    counts = compile_vocabs(DECK, path)
+    assert counts == {'strings': 13, 'words': 4, 'lessons': 3, 'types': 2}
+    table = load_compiled(path)
+    assert [lesson['lesson_name'] for lesson in table] == ['Animals', 'Empty', 'Verbs']
+    assert [[dict(w) for w in lesson['words']] for lesson in table] == \
+        [lesson['words'] for lesson in DECK]
+
+
+def test_truncated_file_is_rejected(tmp_path):
+    path = tmp_path / 'vocabs.bin'
+    compile_vocabs(DECK, str(path))
+    data = path.read_bytes()
+    for size in (10, len(data) - 4):
+        path.write_bytes(data[:size])
+        with pytest.raises(VocabFormatError):
+            load_compiled(str(path))
+
+
+def test_wrong_magic_is_rejected(tmp_path):
+    path = tmp_path / 'vocabs.bin'
+    compile_vocabs(DECK, str(path))
+    path.write_bytes(b'XVOC' + path.read_bytes()[4:])
+    with pytest.raises(VocabFormatError):
+        load_compiled(str(path))
+
+
+def test_nul_characters_are_rejected(tmp_path):
+    bad_name = [{'lesson_name': 'A\0B', 'words': []}]
+    bad_word = [{'lesson_name': 'A', 'words': [{'spanish': 'uno\0', 'czech': 'jedna'}]}]
+    assert validate_vocabs(bad_name) == ['lesson 0: lesson_name contains a NUL character']
+    assert validate_vocabs(bad_word) == ['lesson 0, word 0: contains a NUL character']
+    assert validate_vocabs(DECK) == []
+    for deck in (bad_name, bad_word):
+        with pytest.raises(VocabFormatError):
+            compile_vocabs(deck, str(tmp_path / 'vocabs.bin'))
+    assert not (tmp_path / 'vocabs.bin.tmp').exists()
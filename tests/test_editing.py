@@ -0,0 +1,319 @@
+import json
+import os
+import random
+import shutil
+
+import pytest
+
+import vocab
+from vocab import (CardLookup, DeckEditor, DeckStats, DistractorIndex, GradingIndex, LayeredDict,
+                   SearchIndex, VocabSnapshot, VocabStore, WordTable, card_key, deck_stats, flat_words)
+
+SYLLABLES = ['ca', 'sa', 'pe', 'rro', 'mé', 'sa', 'lu', 'na', 'ko', 'čka', 'dům', 'stůl']
+TYPES = ['Noun', 'Verb', 'Adjective']
+
+
+def random_word(rng):
+    def term():
+        return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+    return {'spanish': term(), 'czech': term(), 'type': rng.choice(TYPES),
+            'notes': rng.choice(['', '', 'el ' + term()])}
+
+
+def random_deck(rng, lessons=6, words=8):
+    return [{'lesson_name': 'Lesson %d' % i, 'words': [random_word(rng) for _ in range(words)]}
+            for i in range(lessons)]
+
+
+def random_edit(rng, deck):
+    counts = [len(lesson['words']) for lesson in deck]
+    lesson = rng.randrange(len(deck))
+    op = rng.choice(['add_word'] * 4 + ['update_word'] * 3 + ['delete_word'] * 3
+                    + ['add_lesson', 'update_lesson', 'delete_lesson'])
+    if op == 'add_word':
+        word = rng.choice(deck[rng.randrange(len(deck))]['words'] or [None]) or random_word(rng)
+        if rng.random() < 0.5:
+            word = random_word(rng)
+        return {'op': op, 'lesson': lesson, 'position': rng.randint(0, counts[lesson]), 'word': word}
+    if op == 'add_lesson':
+        return {'op': op, 'lesson': rng.randint(0, len(deck)), 'name': 'New %d' % rng.randrange(1000)}
+    if op == 'update_lesson':
+        return {'op': op, 'lesson': lesson, 'to': rng.randrange(len(deck))}
+    if op == 'delete_lesson':
+        return {'op': op, 'lesson': lesson} if len(deck) > 2 else None
+    if not counts[lesson]:
+        return None
+    position = rng.randrange(counts[lesson])
+    if op == 'delete_word':
+        return {'op': op, 'lesson': lesson, 'position': position}
+    to_lesson = rng.randrange(len(deck))
+    changes = {'type': rng.choice(TYPES)} if rng.random() < 0.5 else {'czech': random_word(rng)['czech']}
+    return {'op': op, 'lesson': lesson, 'position': position, 'word': changes, 'to_lesson': to_lesson,
+            'to_position': rng.randint(0, counts[to_lesson] - (to_lesson == lesson))}
+
+
+def plain(lessons):
+    """A deck as plain lesson and word dicts, whatever it is stored as."""
+    if isinstance(lessons, WordTable):
+        return [{'lesson_name': lessons.names[i], 'words': lessons.word_dicts(i)} for i in range(len(lessons))]
+    return [{'lesson_name': l['lesson_name'], 'words': [dict(w) for w in l['words']]} for l in lessons]
+
+
+def search_queries(rng, deck):
+    words = [w for lesson in deck for w in lesson['words']] + [random_word(rng) for _ in range(5)]
+    queries = ['zz', 'ca', 'sa lu', 'čk']
+    for w in rng.sample(words, 15):
+        text = w[rng.choice(['spanish', 'czech'])]
+        start = rng.randrange(len(text))
+        queries.append(text[start:start + rng.randint(1, 5)])
+    return queries
+
+
+def pools(index):
+    def terms(pool):
+        return sorted(pool.spanish), sorted(pool.czech)
+    return (terms(index.all),
+            {wt: terms(pool) for wt, pool in index.by_type.items() if pool.spanish},
+            {idx: terms(pool) for idx, pool in index.by_lesson.items()})
+
+
+def grading(index):
+    return ({lang: {term: sorted(targets) for term, targets in terms.items()}
+             for lang, terms in index.translations.items()}, index.duplicates)
+
+
+def assert_same_indexes(edited, rng):
+    """Every index carried through the edits matches one built from scratch."""
+    lessons = edited.lessons
+    fresh = VocabSnapshot(edited.version, lessons, None)
+    words = flat_words(fresh)
+    assert [(i, dict(w)) for i, w in flat_words(edited)] == [(i, dict(w)) for i, w in words]
+
+    cards = edited.derived('cards', None)
+    assert isinstance(cards, CardLookup)
+    assert dict(cards) == {card_key(w): wid for wid, (_, w) in enumerate(words)}
+
+    stats = edited.derived('stats', None)
+    assert (stats.total, stats.by_type) == (deck_stats(fresh).total, deck_stats(fresh).by_type)
+
+    assert pools(edited.derived('distractors', None)) == pools(DistractorIndex(enumerate(lessons)))
+
+    assert grading(edited.derived('grading', None)) == grading(GradingIndex(words))
+
+    search, rebuilt = edited.derived('search', None), SearchIndex(words)
+    for query in search_queries(rng, plain(lessons)):
+        assert search.search(query, limit=10 ** 6) == rebuilt.search(query, limit=10 ** 6), query
+    lesson_id = rng.randrange(len(lessons))
+    assert (search.search('a', lesson_id=lesson_id, word_type='Noun', limit=10 ** 6)
+            == rebuilt.search('a', lesson_id=lesson_id, word_type='Noun', limit=10 ** 6))
+
+
+def warm(snapshot):
+    vocab.card_lookup(snapshot)
+    vocab.deck_stats(snapshot)
+    vocab.distractor_index(snapshot)
+    vocab.grading_index(snapshot)
+    vocab.search_index(snapshot)
+
+
+@pytest.mark.parametrize('table', [True, False], ids=['word-table', 'plain'])
+def test_edited_indexes_match_rebuild(table):
+    rng = random.Random(23)
+    deck = random_deck(rng)
+    lessons = WordTable.from_json(json.dumps(deck)) if table else deck
+    snapshot = VocabSnapshot(1, lessons, None)
+    warm(snapshot)
+    applied = 0
+    while applied < 300:
+        record = random_edit(rng, plain(snapshot.lessons))
+        if record is None:
+            continue
+        editor = DeckEditor(snapshot.lessons)
+        editor.apply(record)
+        snapshot = snapshot.edited(editor.deck(), editor.steps)
+        applied += 1
+        if applied % 50 == 0:
+            assert_same_indexes(snapshot, rng)
+    assert isinstance(snapshot.lessons, WordTable) == table
+    # The first snapshot is untouched by the edits made after it.
+    assert plain(lessons) == deck
+
+
+def test_deck_editor_leaves_the_original_deck_alone():
+    rng = random.Random(1)
+    deck = random_deck(rng, lessons=2, words=3)
+    before = plain(deck)
+    editor = DeckEditor(deck)
+    record = editor.apply({'op': 'update_word', 'lesson': 0, 'position': 2, 'word': {'czech': 'nový'},
+                           'to_lesson': 1})
+    assert record['to_position'] == 3
+    editor.apply({'op': 'delete_lesson', 'lesson': 0})
+    assert plain(deck) == before
+    edited = editor.deck()
+    assert [len(l['words']) for l in edited] == [4]
+    assert edited[0]['words'][3]['czech'] == 'nový'
+    assert [step[0] for step in editor.steps] == ['remove', 'insert', 'remove', 'remove', 'remove_lesson']
+
+
+def test_deck_editor_rejects_bad_records():
+    editor = DeckEditor(random_deck(random.Random(2), lessons=1, words=1))
+    for record, status in (({'op': 'explode'}, 400),
+                           ({'op': 'delete_word', 'lesson': 3, 'position': 0}, 404),
+                           ({'op': 'delete_word', 'lesson': 0, 'position': 1}, 404),
+                           ({'op': 'add_word', 'lesson': 0, 'word': {'spanish': 'x'}}, 400),
+                           ({'op': 'add_lesson', 'name': 'a\0b'}, 400)):
+        with pytest.raises(vocab.VocabEditError) as e:
+            editor.apply(record)
+        assert e.value.status == status
+    assert editor.steps == []
+
+
+def test_layered_dict():
+    base = {'a': 1, 'b': 2}
+    d = LayeredDict(base)
+    d['c'] = 3
+    d['a'] = 10
+    del d['b']
+    assert dict(d) == {'a': 10, 'c': 3} and len(d) == 2
+    assert 'b' not in d and d.get('b', 'gone') == 'gone'
+    with pytest.raises(KeyError):
+        d['b']
+    with pytest.raises(KeyError):
+        del d['b']
+    assert base == {'a': 1, 'b': 2}
+
+    copy = d.copy()
+    assert copy.base is base
+    copy['b'] = 20
+    del copy['c']
+    assert dict(copy) == {'a': 10, 'b': 20}
+    assert dict(d) == {'a': 10, 'c': 3}
+
+    for i in range(100):
+        copy[i] = i
+    folded = copy.copy()
+    assert folded.base is not base and not folded.changes
+    assert dict(folded) == dict(copy) and len(folded) == len(copy)
+    assert vocab.layered(base).base is base and vocab.layered(d).base is base
+
+
+def test_deck_stats_edited_drops_empty_types():
+    stats = DeckStats(1, {'Noun': 1})
+    word = {'spanish': 'a', 'czech': 'b', 'type': 'Noun'}
+    stats = stats.edited(None, [('remove', 0, 0, word), ('insert', 0, 0, dict(word, type='Verb'))])
+    assert (stats.total, stats.by_type) == (1, {'Verb': 1})
+
+
+# -------------------------------------------------------------------
+# Journal and compaction
+# -------------------------------------------------------------------
+@pytest.fixture
+def deck_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(vocab, 'JOURNAL_COMPACT_EDITS', 10 ** 6)
+    path = tmp_path / 'vocabs.txt'
+    path.write_text(json.dumps(random_deck(random.Random(3), lessons=3, words=4), ensure_ascii=False),
+                    encoding='utf-8')
+    return str(path)
+
+
+def make_edits(store, count, seed=4):
+    rng = random.Random(seed)
+    done = 0
+    while done < count:
+        record = random_edit(rng, plain(store.snapshot().lessons))
+        if record is not None:
+            store.edit(record)
+            done += 1
+    return plain(store.snapshot().lessons)
+
+
+def test_journal_is_replayed_by_a_new_store(deck_path):
+    store = VocabStore(deck_path)
+    source = open(deck_path, 'rb').read()
+    edited = make_edits(store, 20)
+    # Edits only go to the journal until compaction.
+    assert open(deck_path, 'rb').read() == source
+    with open(deck_path + '.journal', 'rb') as f:
+        lines = f.read().splitlines()
+    assert 'base' in json.loads(lines[0]) and len(lines) == 21
+
+    other = VocabStore(deck_path)
+    assert plain(other.snapshot().lessons) == edited
+    assert other.revision == store.revision
+
+
+def test_store_catches_up_with_another_writer(deck_path):
+    reader = VocabStore(deck_path, check_interval=0, journal_interval=0)
+    warm(reader.snapshot())
+    edited = make_edits(VocabStore(deck_path), 15)
+    snapshot = reader.snapshot()
+    assert plain(snapshot.lessons) == edited
+    # Applied as a delta: the indexes came along through edited().
+    assert set(snapshot._derived) >= {'cards', 'search', 'grading'}
+    assert_same_indexes(snapshot, random.Random(5))
+
+
+def test_torn_journal_record_is_ignored_and_overwritten(deck_path):
+    store = VocabStore(deck_path)
+    edited = make_edits(store, 5)
+    with open(deck_path + '.journal', 'ab') as f:
+        f.write(b'{"op":"delete_lesson","les')
+    assert plain(VocabStore(deck_path).snapshot().lessons) == edited
+
+    store = VocabStore(deck_path)
+    store.edit({'op': 'add_lesson', 'name': 'After the crash'})
+    lessons = plain(VocabStore(deck_path).snapshot().lessons)
+    assert lessons == edited + [{'lesson_name': 'After the crash', 'words': []}]
+
+
+def test_crash_before_compaction_keeps_every_edit(deck_path):
+    store = VocabStore(deck_path)
+    edited = make_edits(store, 12)
+    # The process died mid-compaction: a half-written temp file, no rename.
+    with open('%s.%d.tmp' % (deck_path, 12345), 'w') as f:
+        f.write('[{"lesson_name": "trunc')
+    store = VocabStore(deck_path)
+    assert plain(store.snapshot().lessons) == edited
+
+    assert store.compact() == 12
+    assert not os.path.exists(deck_path + '.journal')
+    with open(deck_path, encoding='utf-8') as f:
+        assert json.load(f) == edited
+    assert plain(VocabStore(deck_path).snapshot().lessons) == edited
+
+
+def test_crash_after_rename_does_not_replay_the_journal(deck_path):
+    store = VocabStore(deck_path)
+    edited = make_edits(store, 8)
+    journal = deck_path + '.journal'
+    shutil.copy(journal, journal + '.saved')
+    assert store.compact() == 8
+    # Died after renaming the new source into place, before unlinking the
+    # journal: its header no longer matches, so it must not apply twice.
+    os.replace(journal + '.saved', journal)
+    reopened = VocabStore(deck_path)
+    assert plain(reopened.snapshot().lessons) == edited
+
+    reopened.edit({'op': 'add_lesson', 'name': 'Later'})
+    assert os.path.exists(journal + '.stale')
+    assert plain(VocabStore(deck_path).snapshot().lessons) == edited + [{'lesson_name': 'Later', 'words': []}]
+
+
+def test_compact_writes_through_a_temp_file(deck_path):
+    store = VocabStore(deck_path)
+    make_edits(store, 3)
+    source = open(deck_path, 'rb').read()
+    renames = []
+
+    def failing_replace(src, dst):
+        renames.append((src, dst))
+        raise OSError('disk full')
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(os, 'replace', failing_replace)
+        with pytest.raises(OSError):
+            store.compact()
+    assert renames == [('%s.%d.tmp' % (deck_path, os.getpid()), deck_path)]
+    assert not os.path.exists(renames[0][0])
+    assert open(deck_path, 'rb').read() == source
+    assert os.path.exists(deck_path + '.journal')
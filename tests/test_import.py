@@ -0,0 +1,40 @@
+import io
+
+from vocab import ImportFormat, import_rows, iter_import_chunks, parse_import_chunk
+
+FMT = ImportFormat(',', ('spanish', 'czech', 'type', 'notes'), False, 'Word')
+
+
+def sample_csv(n=200):
+    rows = []
+    for i in range(n):
+        if i % 3 == 0:
+            rows.append('perro%d,"pes, ""%d""",Noun,"first line\nsecond line"\n' % (i, i))
+        elif i % 3 == 1:
+            # Quotes inside an unquoted field are just characters.
+            rows.append('gato%d,kočka <span class="x">%d</span>,Noun,a 12" pizza\n' % (i, i))
+        else:
+            rows.append('casa%d,"dům\n%d",Noun,say "hi"\n' % (i, i))
+    return ''.join(rows).encode('utf-8')
+
+
+def test_chunks_end_on_record_boundaries():
+    data = sample_csv()
+    expected = parse_import_chunk(data, 1, FMT)
+    assert len(expected) == 200 and all(problem is None for _, _, problem in expected)
+    for chunk_bytes in (1, 7, 64, 500, len(data)):
+        chunks = list(iter_import_chunks(io.BytesIO(data), 1, chunk_bytes))
+        assert b''.join(chunk for chunk, _ in chunks) == data
+        parsed = []
+        for chunk, first_line in chunks:
+            parsed.extend(parse_import_chunk(chunk, first_line, FMT))
+        assert parsed == expected
+
+
+def test_parallel_import_matches_serial(tmp_path):
+    path = tmp_path / 'deck.csv'
+    path.write_bytes(sample_csv(600))
+    serial = list(import_rows(str(path), 'csv'))
+    assert len(serial) == 600
+    assert serial[1] == (3, (None, 'gato1', 'kočka <span class="x">1</span>', 'Noun', 'a 12" pizza'), None)
+    assert list(import_rows(str(path), 'csv', jobs=2, chunk_bytes=1024)) == serial
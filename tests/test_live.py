@@ -0,0 +1,126 @@
+import asyncio
+import random
+import types
+
+import pytest
+
+import vocab
+from vocab import DistractorIndex
+from vocab_live import LiveError, Room
+
+WORDS = [{'spanish': 'perro', 'czech': 'pes', 'type': 'Noun'},
+         {'spanish': 'gato', 'czech': 'kočka', 'type': 'Noun'},
+         {'spanish': 'casa', 'czech': 'dům', 'type': 'Noun'},
+         {'spanish': 'mesa', 'czech': 'stůl', 'type': 'Noun'}]
+
+
+class StubClient:
+    def __init__(self):
+        self.sent = []
+        self.room = self.player = None
+
+    def send(self, frame):
+        self.sent.append(frame)
+
+    def send_json(self, message):
+        self.sent.append(message)
+
+    def close(self, code=1000, abort=False):
+        pass
+
+
+class StubLog:
+    def __init__(self):
+        self.rows = []
+
+    def submit(self, rows):
+        self.rows.extend(rows)
+
+
+def make_room():
+    words = list(enumerate(WORDS))
+    distractors = DistractorIndex([(0, {'words': WORDS})])
+    snapshot = types.SimpleNamespace(version=1)
+    return Room('ABCD', StubClient(), snapshot, words, distractors, 30, random.Random(1))
+
+
+def test_answer_then_disconnect_does_not_end_question(monkeypatch):
+    monkeypatch.setattr(vocab, 'answer_log', StubLog())
+
+    async def scenario():
+        room = make_room()
+        alice, bob, carol = StubClient(), StubClient(), StubClient()
+        for client, name in ((alice, 'alice'), (bob, 'bob'), (carol, 'carol')):
+            room.join(client, name)
+        room.ask()
+        room.answer(alice.player, room.n, 0)
+        room.leave(alice.player)
+        room.answer(bob.player, room.n, 0)
+        # Carol is still here and has not answered: the question stays open.
+        assert room.question is not None
+        room.answer(carol.player, room.n, 0)
+        assert room.question is None
+        room.close()
+
+    asyncio.run(scenario())
+
+
+def test_last_unanswered_player_leaving_reveals(monkeypatch):
+    monkeypatch.setattr(vocab, 'answer_log', StubLog())
+
+    async def scenario():
+        room = make_room()
+        alice, bob = StubClient(), StubClient()
+        room.join(alice, 'alice')
+        room.join(bob, 'bob')
+        room.ask()
+        room.answer(alice.player, room.n, 0)
+        assert room.question is not None
+        room.leave(bob.player)
+        assert room.question is None
+        room.close()
+
+    asyncio.run(scenario())
+
+
+def test_everyone_leaving_leaves_question_to_the_timer(monkeypatch):
+    monkeypatch.setattr(vocab, 'answer_log', StubLog())
+
+    async def scenario():
+        room = make_room()
+        alice = StubClient()
+        room.join(alice, 'alice')
+        room.ask()
+        room.leave(alice.player)
+        assert room.question is not None
+        room.close()
+
+    asyncio.run(scenario())
+
+
+def test_rejoin_needs_the_token(monkeypatch):
+    monkeypatch.setattr(vocab, 'answer_log', StubLog())
+
+    async def scenario():
+        room = make_room()
+        alice = StubClient()
+        room.join(alice, 'alice')
+        token = alice.sent[0]['token']
+        room.ask()
+        room.answer(alice.player, room.n, 0)
+        score = alice.player.score
+        room.leave(alice.player)
+
+        for bad in (None, 'not-the-token', 'žluťoučký', 42):
+            with pytest.raises(LiveError):
+                room.join(StubClient(), 'alice', bad)
+        back = StubClient()
+        room.join(back, 'alice', token)
+        assert back.player is alice.player and back.player.score == score
+        assert back.sent[0]['token'] == token
+        # The name is held again: not even the token takes it from a connected player.
+        with pytest.raises(LiveError):
+            room.join(StubClient(), 'alice', token)
+        room.close()
+
+    asyncio.run(scenario())
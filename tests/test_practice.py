@@ -0,0 +1,22 @@
+import json
+
+from vocab import DIRECTIONS, PRACTICE_VARIANTS, VocabSnapshot, practice_fragments
+
+NOUNS = ['perro', 'gato', 'casa', 'mesa', 'silla', 'libro', 'coche', 'árbol', 'flor', 'río']
+
+
+def noun_deck(version=1):
+    words = [{'spanish': s, 'czech': s.upper(), 'type': 'Noun'} for s in NOUNS]
+    return VocabSnapshot(version, [{'lesson_name': 'Nouns', 'words': words}], None)
+
+
+def test_practice_fragments_vary_distractors():
+    fragments = practice_fragments(noun_deck(), 0)
+    assert len(fragments) == len(NOUNS)
+    for wid, choices in enumerate(fragments):
+        questions = [json.loads(q) for q in choices]
+        assert len(questions) == len(DIRECTIONS) * PRACTICE_VARIANTS
+        assert {q['word_id'] for q in questions} == {wid}
+        for direction in DIRECTIONS:
+            option_sets = {frozenset(q['options']) for q in questions if q['direction'] == direction}
+            assert len(option_sets) > 1
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+
+from vocab import SQLiteProgressStore
+
+
+class FailingConnection(sqlite3.Connection):
+    """Fails part-way through a flush, after the resets were deleted."""
+
+    def executemany(self, sql, rows):
+        if sql.startswith('INSERT'):
+            raise sqlite3.OperationalError('database is locked')
+        return super().executemany(sql, rows)
+
+
+class FailingConnections:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, factory=FailingConnection)
+
+    def get(self):
+        return self.conn
+
+
+def make_store(path):
+    store = SQLiteProgressStore(str(path))
+    store._writer_pid = os.getpid()  # flushed by the test, not a thread
+    return store
+
+
+def test_flush_and_reset_ordering(tmp_path):
+    db = tmp_path / 'progress.db'
+    store = make_store(db)
+    store.mark('u', 1)
+    store.mark('u', 2)
+    store.mark('v', 1)
+    store.flush()
+    store.reset('u')
+    store.mark('u', 3)
+    store.mark('u', 2)
+    store.mark('u', 2, done=False)
+    assert store.completed('u') == {3}
+    store.flush()
+    assert store.completed('u') == {3}
+    assert make_store(db).completed('u') == {3}
+    assert make_store(db).completed('v') == {1}
+
+
+def test_failed_flush_keeps_changes(tmp_path, capsys):
+    db = tmp_path / 'progress.db'
+    store = make_store(db)
+    store.mark('u', 1)
+    store.mark('u', 2)
+    store.flush()
+
+    conns, store._conns = store._conns, FailingConnections(str(db))
+    store.reset('u')
+    store.mark('u', 5)
+    store.mark('v', 7)
+    store.flush()
+    assert 'will retry' in capsys.readouterr().err
+    assert store._flushing == {}
+    # Newer changes land on top of the batch that failed.
+    store.mark('u', 6)
+    store.mark('v', 7, done=False)
+    store.mark('v', 8)
+    assert store.completed('u') == {5, 6}
+    assert store.completed('v') == {8}
+    assert make_store(db).completed('u') == {1, 2}
+
+    store._conns = conns
+    store.flush()
+    assert store._pending == {}
+    fresh = make_store(db)
+    assert fresh.completed('u') == {5, 6}
+    assert fresh.completed('v') == {8}
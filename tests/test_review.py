@@ -0,0 +1,81 @@
+import pytest
+
+from vocab import DAY, ReviewScheduler, VocabSnapshot, card_key, sm2
+
+
+def deck(*spanish, version=1):
+    words = [{'spanish': s, 'czech': s.upper(), 'type': 'Noun'} for s in spanish]
+    return VocabSnapshot(version, [{'lesson_name': 'L', 'words': words}], None)
+
+
+def keys(cards):
+    return [w['spanish'] for _, w in cards]
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    return ReviewScheduler(str(tmp_path / 'progress.db'))
+
+
+def test_sm2_intervals():
+    reps, interval, ease = sm2(0, 0.0, 2.5, 4)
+    assert (reps, interval, ease) == (1, 1.0, 2.5)
+    reps, interval, ease = sm2(reps, interval, ease, 4)
+    assert (reps, interval) == (2, 6.0)
+    reps, interval, ease = sm2(reps, interval, ease, 4)
+    assert (reps, interval) == (3, 15)
+    reps, interval, ease = sm2(reps, interval, ease, 1)
+    assert (reps, interval) == (0, 1.0)
+    assert ease < 2.5
+
+
+def test_sm2_ease_bounds():
+    assert sm2(0, 0.0, 2.5, 5)[2] == pytest.approx(2.6)
+    assert sm2(0, 0.0, 2.5, 4)[2] == pytest.approx(2.5)
+    ease = 2.5
+    for _ in range(20):
+        _, _, ease = sm2(0, 0.0, ease, 0)
+    assert ease == 1.3
+
+
+def test_due_cards_come_first_in_due_order(scheduler):
+    snapshot = deck('a', 'b', 'c', 'd', 'e')
+    now = 1000 * DAY
+    scheduler.grade('u', card_key({'spanish': 'c', 'czech': 'C'}), 4, snapshot, now=now - 3 * DAY)
+    scheduler.grade('u', card_key({'spanish': 'a', 'czech': 'A'}), 4, snapshot, now=now - 2 * DAY)
+    scheduler.grade('u', card_key({'spanish': 'e', 'czech': 'E'}), 1, snapshot, now=now)
+    assert keys(scheduler.due('u', snapshot, limit=2, now=now)) == ['c', 'a']
+    assert keys(scheduler.due('u', snapshot, limit=10, now=now)) == ['c', 'a', 'b', 'd']
+    assert keys(scheduler.due('u', snapshot, limit=10, now=now + DAY)) == ['c', 'a', 'e', 'b', 'd']
+
+
+def test_fetching_does_not_use_up_new_cards(scheduler):
+    snapshot = deck('a', 'b', 'c', 'd')
+    first = scheduler.due('u', snapshot, limit=2, now=0)
+    assert keys(first) == ['a', 'b']
+    assert scheduler.due('u', snapshot, limit=2, now=0) == first
+    assert scheduler.due_count('u', now=0) == 0
+
+    for _, word in first:
+        scheduler.grade('u', card_key(word), 4, snapshot, now=0)
+    assert keys(scheduler.due('u', snapshot, limit=2, now=0)) == ['c', 'd']
+
+
+def test_cards_answered_out_of_order(scheduler):
+    snapshot = deck('a', 'b', 'c', 'd')
+    scheduler.grade('u', 'b\tB', 4, snapshot, now=0)
+    assert keys(scheduler.due('u', snapshot, limit=3, now=0)) == ['a', 'c', 'd']
+    scheduler.grade('u', 'a\tA', 4, snapshot, now=0)
+    assert keys(scheduler.due('u', snapshot, limit=3, now=0)) == ['c', 'd']
+
+
+def test_cursor_follows_edits(scheduler):
+    before = deck('a', 'b', 'c', 'd')
+    for key in ('a\tA', 'b\tB'):
+        scheduler.grade('u', key, 4, before, now=0)
+    # Words inserted before the cursor and the cursor's own card moved.
+    after = deck('x', 'a', 'y', 'b', 'c', 'd', version=2)
+    assert keys(scheduler.due('u', after, limit=3, now=0)) == ['c', 'd']
+    # The cursor's card deleted: unseen cards are found again from the start.
+    edited = deck('x', 'a', 'c', 'd', version=3)
+    assert keys(scheduler.due('u', edited, limit=4, now=0)) == ['x', 'c', 'd']
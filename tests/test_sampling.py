@@ -0,0 +1,48 @@
+import collections
+import random
+
+import pytest
+
+from vocab import AliasTable, sample_distinct, sample_words
+
+
+def test_alias_table_distribution():
+    weights = [1, 0, 3, 6]
+    table = AliasTable(weights)
+    rng = random.Random(7)
+    n = 100000
+    counts = collections.Counter(table.draw(rng) for _ in range(n))
+    assert counts[1] == 0
+    for i, weight in enumerate(weights):
+        assert counts[i] / n == pytest.approx(weight / sum(weights), abs=0.01)
+
+
+def test_alias_table_needs_a_positive_weight():
+    for weights in ([], [0, 0]):
+        with pytest.raises(ValueError):
+            AliasTable(weights)
+
+
+def test_sample_distinct_with_fewer_candidates_than_k():
+    rng = random.Random(1)
+    pool = ['a', 'b', 'c', 'a', 'd']
+    picked = sample_distinct(pool, 10, exclude=('b',), rng=rng)
+    assert sorted(picked) == ['a', 'c', 'd']
+    assert sample_distinct(pool, 3, exclude=('a', 'b', 'c', 'd'), rng=rng) == []
+    assert sample_distinct([], 3, rng=rng) == []
+    assert len(set(sample_distinct(pool, 2, rng=rng))) == 2
+
+
+def test_sample_words_is_distinct_and_weighted():
+    rng = random.Random(3)
+    lessons = [(0, 50, 1.0), (1, 50, 3.0), (2, 10, 0.0)]
+    counts = collections.Counter()
+    for _ in range(500):
+        picks = sample_words(lessons, 10, rng)
+        assert len(set(picks)) == 10
+        counts.update(lesson_id for lesson_id, _ in picks)
+    assert counts[2] == 0
+    assert counts[1] / counts[0] == pytest.approx(3.0, rel=0.15)
+    # Asking for more than there is returns every word once.
+    assert sorted(sample_words(lessons, 1000, rng)) == \
+        [(lesson_id, pos) for lesson_id in (0, 1) for pos in range(50)]
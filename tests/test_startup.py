@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import vocab
+import vocab_core
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_vocab_is_the_core_module():
+    assert vocab is vocab_core
+    assert vocab.SQLiteProgressStore is vocab_core.SQLiteProgressStore
+
+
+def test_import_does_not_open_the_database(tmp_path):
+    code = ('import sys, vocab; '
+            'print(sorted(m for m in ("sqlite3", "flask", "vocab_web") if m in sys.modules), '
+            '"progress_store" in vars(vocab)); '
+            'vocab.progress_store.completed("nobody"); '
+            'print("sqlite3" in sys.modules, vocab.progress_store is vocab.db_store("progress_store"))')
+    env = dict(os.environ, DUOVOCAB_PROGRESS_DB=str(tmp_path / 'progress.db'))
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    assert out.split('\n')[:2] == ['[] False', 'True True']
+
+
+def test_drill_command(tmp_path):
+    deck = [{'lesson_name': 'Animals', 'words': [
+        {'spanish': s, 'czech': c, 'type': 'Noun'} for s, c in (('perro', 'pes'), ('gato', 'kočka'))]}]
+    path = tmp_path / 'vocabs.txt'
+    path.write_text(json.dumps(deck), encoding='utf-8')
+    result = subprocess.run([sys.executable, 'vocab.py', 'drill', '0', '--source', str(path),
+                             '--compiled', str(tmp_path / 'vocabs.bin')],
+                            cwd=ROOT, input='q\n', capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith('Animals: 2 words.')
+    assert not os.path.exists(tmp_path / 'progress.db')
+
+
+@pytest.mark.parametrize('chunk_chars', [1, 5, 64 * 1024])
+def test_load_lessons_reads_in_chunks(tmp_path, monkeypatch, chunk_chars):
+    deck = [{'lesson_name': 'L%d' % i, 'words': [{'spanish': 'ñ' * i, 'czech': str(i), 'type': 'Noun'}]}
+            for i in range(12)]
+    path = tmp_path / 'vocabs.txt'
+    path.write_text(json.dumps(deck, ensure_ascii=False, indent=2), encoding='utf-8')
+    monkeypatch.setattr(vocab_core._JSONReader.__init__, '__defaults__', (chunk_chars,))
+    missing = str(tmp_path / 'vocabs.bin')
+    assert vocab.load_lessons([3, 0, 99], str(path), missing) == {0: deck[0], 3: deck[3]}
+    assert vocab.load_lessons(range(12), str(path), missing) == dict(enumerate(deck))
+
+    path.write_text(json.dumps(deck)[:-40], encoding='utf-8')
+    assert vocab.load_lessons([0], str(path), missing) == {0: deck[0]}
+    with pytest.raises(ValueError):
+        vocab.load_lessons([11], str(path), missing)
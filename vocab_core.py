@@ -0,0 +1,4051 @@
+import os
+import re
+import sys
+import json
+import mmap
+import array
+import struct
+import argparse
+import collections
+import collections.abc
+import bisect
+import itertools
+import random
+import threading
+import time
+import unicodedata
+import atexit
+import queue
+import hashlib
+import gc
+import heapq
+import csv
+import io
+import zlib
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: edits are only serialized within the process
+    fcntl = None
+
+
+# The web app (Flask, templates, routes) lives in vocab_web.py and is only
+# imported when something asks for it (``vocab.app``, `vocab.py run`...),
+# so the command-line tools start without loading Flask and Jinja. The
+# stores kept in progress.db are likewise created on first use (see
+# db_store), and sqlite3 is imported by the code that opens the database.
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    if name in _DB_STORES:
+        return db_store(name)
+    import vocab_web
+    try:
+        return getattr(vocab_web, name)
+    except AttributeError:
+        raise AttributeError("module 'vocab' has no attribute %r" % name) from None
+
+
+# Lazy mode decodes lessons from vocabs.bin on demand instead of holding the
+# whole deck; decoded lessons are kept in an LRU of this many bytes.
+LAZY_LESSONS = os.environ.get('DUOVOCAB_LAZY_LESSONS') == '1'
+LESSON_CACHE_BYTES = int(os.environ.get('DUOVOCAB_LESSON_CACHE_MB', '64')) * 1024 * 1024
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VOCABS_PATH = os.path.join(BASE_DIR, 'vocabs.txt')
+COMPILED_PATH = os.path.join(BASE_DIR, 'vocabs.bin')
+PROGRESS_DB = os.environ.get('DUOVOCAB_PROGRESS_DB', os.path.join(BASE_DIR, 'progress.db'))
+
+# -------------------------------------------------------------------
+# Settings
+# -------------------------------------------------------------------
+class Settings:
+    """Runtime configuration, read from ``DUOVOCAB_*`` environment variables.
+
+    Flags given to `vocab.py run` / `vocab.py serve` override these. Without
+    DUOVOCAB_SECRET_KEY a random key is generated once and kept in
+    ``secret_key_file``, so sessions survive restarts and every worker of
+    `serve` signs cookies with the same key.
+    """
+
+    def __init__(self, env=os.environ):
+        self.host = env.get('DUOVOCAB_HOST', '127.0.0.1')
+        self.port = int(env.get('DUOVOCAB_PORT', '5000'))
+        self.live_port = int(env.get('DUOVOCAB_LIVE_PORT', '5001'))
+        self.workers = int(env.get('DUOVOCAB_WORKERS', str(min(8, (os.cpu_count() or 1) * 2 + 1))))
+        self.threads = int(env.get('DUOVOCAB_THREADS', '4'))
+        self.secret_key_file = env.get('DUOVOCAB_SECRET_KEY_FILE', os.path.join(BASE_DIR, '.secret_key'))
+        self._secret_key = env.get('DUOVOCAB_SECRET_KEY')
+        # Bearer token for the deck editing API; editing is off without one.
+        self.edit_token = env.get('DUOVOCAB_EDIT_TOKEN') or None
+
+    @property
+    def secret_key(self):
+        # Read (or created) on first use, so CLI commands never touch the file.
+        if not self._secret_key:
+            self._secret_key = self._load_secret_key()
+        return self._secret_key
+
+    def _load_secret_key(self):
+        path = self.secret_key_file
+        if not os.path.exists(path):
+            # Write a private temp file and hard-link it into place, so
+            # concurrent first starts all end up reading the same key.
+            tmp = '%s.%d' % (path, os.getpid())
+            try:
+                fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'w', encoding='ascii') as f:
+                    f.write(os.urandom(32).hex())
+                try:
+                    os.link(tmp, path)
+                except FileExistsError:
+                    pass
+            except OSError:
+                print("Warning: cannot write %s; sessions will not survive a restart" % path,
+                      file=sys.stderr)
+                return os.urandom(32).hex()
+            finally:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+        with open(path, encoding='ascii') as f:
+            return f.read().strip()
+
+
+settings = Settings()
+
+# Per-request sampling profiler: off unless DUOVOCAB_PROFILE_DIR is set, then
+# requests carrying an `X-Profile: 1` header write folded stacks there.
+PROFILE_DIR = os.environ.get('DUOVOCAB_PROFILE_DIR')
+PROFILE_INTERVAL = float(os.environ.get('DUOVOCAB_PROFILE_INTERVAL_MS', '1')) / 1000.0
+
+# -------------------------------------------------------------------
+# Metrics (Prometheus text format, served at /metrics)
+# -------------------------------------------------------------------
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metrics:
+    """Counters, histograms and callback gauges, kept in-process.
+
+    Updates take one short lock and touch a handful of ints, so they are
+    cheap enough for every request. ``render()`` produces the Prometheus
+    text exposition format.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = collections.defaultdict(float)
+        self._histograms = {}
+        self._gauges = []
+
+    def describe(self, name, kind, help_text):
+        self._meta[name] = (kind, help_text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            hist[0][slot] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def timer(self, name, **labels):
+        return _Timer(self, name, labels)
+
+    def gauge(self, name, help_text, fn, kind='gauge'):
+        """Report ``fn()`` (a number, or a dict of label tuples to numbers) at scrape time.
+
+        Use ``kind='counter'`` for values kept elsewhere that only go up.
+        """
+        self.describe(name, kind, help_text)
+        self._gauges.append((name, fn))
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        return '{%s}' % ','.join('%s="%s"' % (k, str(v).replace('\\', r'\\').replace('"', r'\"'))
+                                 for k, v in pairs)
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, ([*h[0]], h[1], h[2])) for key, h in self._histograms.items())
+        samples = collections.defaultdict(list)
+        for (name, labels), value in counters:
+            samples[name].append('%s%s %r' % (name, self._labels(labels), value))
+        for (name, labels), (counts, total, count) in histograms:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples[name].append('%s_bucket%s %d' % (name, self._labels(labels, [('le', le)]), cumulative))
+            samples[name].append('%s_sum%s %r' % (name, self._labels(labels), total))
+            samples[name].append('%s_count%s %d' % (name, self._labels(labels), count))
+        for name, fn in self._gauges:
+            value = fn()
+            if isinstance(value, dict):
+                samples[name].extend('%s%s %r' % (name, self._labels(labels), float(v))
+                                     for labels, v in sorted(value.items()))
+            else:
+                samples[name].append('%s %r' % (name, float(value)))
+
+        lines = []
+        for name in sorted(samples):
+            kind, help_text = self._meta.get(name, ('untyped', ''))
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s %s' % (name, kind))
+            lines.extend(samples[name])
+        return '\n'.join(lines) + '\n'
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics, self.name, self.labels = metrics, name, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+metrics = Metrics()
+metrics.describe('http_requests_total', 'counter', 'Requests handled, by route, method and status.')
+metrics.describe('http_request_duration_seconds', 'histogram', 'Request handling time, by route.')
+metrics.describe('http_response_bytes_total', 'counter', 'Response body bytes sent (after compression), by route.')
+metrics.describe('vocab_reloads_total', 'counter', 'Vocabulary reloads, by outcome.')
+metrics.describe('vocab_reload_seconds', 'histogram', 'Time spent parsing vocabulary sources.')
+metrics.describe('derived_build_seconds', 'histogram', 'Time spent building per-snapshot indexes, by index.')
+metrics.describe('page_render_seconds', 'histogram', 'Time spent rendering cacheable pages, by page.')
+
+
+class StackSampler:
+    """Samples one thread's Python stack every ``interval`` seconds.
+
+    ``folded()`` returns the samples in the collapsed format read by
+    flamegraph.pl, speedscope and similar tools: one ``frame;frame;... count``
+    line per distinct stack, outermost frame first.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename),
+                                             code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return ''.join('%s %d\n' % item for item in self.stacks.most_common())
+
+# -------------------------------------------------------------------
+# Compiled vocabulary format (vocabs.bin, written by `vocab.py compile`)
+# -------------------------------------------------------------------
+# Layout, all integers little-endian:
+#   header    magic, format version, type count, string count, word count,
+#             lesson count, string blob length
+#   strings   unique strings, UTF-8, NUL-separated (the string table)
+#   words     five columns of n_words: spanish, czech and notes string ids,
+#             lesson id (u32) and type index (u8)
+#   lessons   name string id, first word id, word count (u32 each)
+#   types     string id per type index (u32)
+#   offsets   n_strings + 1 byte offsets into the string blob (u32), so single
+#             lessons can be decoded without touching the rest of the table
+COMPILED_MAGIC = b'DVOC'
+COMPILED_VERSION = 2
+_COMPILED_HEADER = struct.Struct('<4sHHIIII')
+_U32 = 'I' if array.array('I').itemsize == 4 else 'L'
+
+
+class VocabFormatError(ValueError):
+    pass
+
+
+def validate_vocabs(data):
+    """Check parsed vocabs.txt content; return a list of problems found."""
+    errors = []
+    if not isinstance(data, list):
+        return ['top level must be a list of lessons']
+    for li, lesson in enumerate(data):
+        where = 'lesson %d' % li
+        if not isinstance(lesson, dict):
+            errors.append('%s: must be an object' % where)
+            continue
+        if not isinstance(lesson.get('lesson_name'), str):
+            errors.append('%s: lesson_name must be a string' % where)
+        elif '\0' in lesson['lesson_name']:
+            errors.append('%s: lesson_name contains a NUL character' % where)
+        words = lesson.get('words', [])
+        if not isinstance(words, list):
+            errors.append('%s: words must be a list' % where)
+            continue
+        for wi, w in enumerate(words):
+            where = 'lesson %d, word %d' % (li, wi)
+            if not isinstance(w, dict):
+                errors.append('%s: must be an object' % where)
+                continue
+            for field in ('spanish', 'czech'):
+                if not isinstance(w.get(field), str) or not w[field]:
+                    errors.append('%s: %s must be a non-empty string' % (where, field))
+            for field in ('type', 'notes'):
+                if field in w and not isinstance(w[field], str):
+                    errors.append('%s: %s must be a string' % (where, field))
+            if any('\0' in v for v in w.values() if isinstance(v, str)):
+                errors.append('%s: contains a NUL character' % where)
+    return errors
+
+
+def compile_vocabs(data, out_path):
+    """Write validated vocabs.txt content to ``out_path`` in the binary format."""
+    strings = {}
+    types = {}
+
+    def sid(text):
+        return strings.setdefault(text, len(strings))
+
+    spanish, czech, notes, lesson_ids = (array.array(_U32) for _ in range(4))
+    type_ids = array.array('B')
+    lesson_table = array.array(_U32)
+    for li, lesson in enumerate(data):
+        words = lesson.get('words', [])
+        lesson_table.extend((sid(lesson['lesson_name']), len(spanish), len(words)))
+        for w in words:
+            spanish.append(sid(w['spanish']))
+            czech.append(sid(w['czech']))
+            notes.append(sid(w.get('notes', '')))
+            lesson_ids.append(li)
+            wt = w.get('type', 'Other')
+            if wt not in types:
+                if len(types) == 256:
+                    raise VocabFormatError('more than 256 distinct word types')
+                types[wt] = len(types)
+            type_ids.append(types[wt])
+    type_table = array.array(_U32, (sid(t) for t in types))
+
+    encoded = [text.encode('utf-8') for text in strings]
+    # NUL separates the string table, so a string containing one would
+    # shift every string id after it.
+    if any(b'\0' in raw for raw in encoded):
+        raise VocabFormatError('strings must not contain a NUL character')
+    blob = b'\0'.join(encoded)
+    string_offsets = array.array(_U32, [0])
+    for raw in encoded:
+        string_offsets.append(string_offsets[-1] + len(raw) + 1)
+    columns = [spanish, czech, notes, lesson_ids, type_ids, lesson_table, type_table, string_offsets]
+    if sys.byteorder != 'little':
+        for col in columns:
+            col.byteswap()
+
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_COMPILED_HEADER.pack(COMPILED_MAGIC, COMPILED_VERSION, len(types),
+                                      len(strings), len(spanish), len(data), len(blob)))
+        f.write(blob)
+        for col in columns:
+            _pad4(f)
+            col.tofile(f)
+    os.replace(tmp_path, out_path)
+    return {'strings': len(strings), 'words': len(spanish), 'lessons': len(data), 'types': len(types)}
+
+
+def _pad4(f):
+    f.write(b'\0' * (-f.tell() % 4))
+
+
+def _compiled_sections(mm, path):
+    """Validate the header and return ``(counts, {section: memoryview})``."""
+    if len(mm) < _COMPILED_HEADER.size:
+        raise VocabFormatError('%s: truncated header' % path)
+    magic, version, n_types, n_strings, n_words, n_lessons, blob_len = \
+        _COMPILED_HEADER.unpack_from(mm, 0)
+    if magic != COMPILED_MAGIC or version != COMPILED_VERSION:
+        raise VocabFormatError('%s: not a compiled vocabulary (v%d)' % (path, COMPILED_VERSION))
+
+    view = memoryview(mm)
+    pos = _COMPILED_HEADER.size
+    sections = {'blob': view[pos:pos + blob_len]}
+    pos += blob_len
+    for name, typecode, count in (('spanish', _U32, n_words), ('czech', _U32, n_words),
+                                  ('notes', _U32, n_words), ('lesson', _U32, n_words),
+                                  ('type', 'B', n_words), ('lessons', _U32, 3 * n_lessons),
+                                  ('types', _U32, n_types), ('offsets', _U32, n_strings + 1)):
+        pos += -pos % 4
+        end = pos + count * array.array(typecode).itemsize
+        if end > len(mm):
+            # Release the views, or the caller cannot close the mmap.
+            for section in sections.values():
+                section.release()
+            view.release()
+            raise VocabFormatError('%s: truncated' % path)
+        sections[name] = _column(view[pos:end], typecode)
+        pos = end
+    return (n_strings, n_words, n_lessons), sections
+
+
+def _column(raw, typecode):
+    # Zero-copy on little-endian hosts; otherwise copy and swap.
+    if sys.byteorder == 'little':
+        return raw.cast(typecode)
+    col = array.array(typecode, raw.tobytes())
+    col.byteswap()
+    return col
+
+
+def load_compiled(path):
+    """Read a compiled vocabulary into a WordTable (its columns map across directly)."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        (n_strings, _, n_lessons), sec = _compiled_sections(mm, path)
+        table = str(sec['blob'], 'utf-8').split('\0') if n_strings else []
+        if len(table) != n_strings:
+            raise VocabFormatError('%s: corrupt string table' % path)
+        spanish, czech, notes = (array.array(_U32, sec[c]) for c in ('spanish', 'czech', 'notes'))
+        type_ids = bytes(sec['type'])
+        lesson_table = array.array(_U32, sec['lessons'])
+        types = [table[i] for i in sec['types']]
+        # Release the views before the mmap is closed.
+        for view in sec.values():
+            view.release()
+
+    names = [table[name] for name in lesson_table[0::3]]
+    return WordTable(table, spanish, czech, notes, type_ids, types, names,
+                     lesson_table[1::3], lesson_table[2::3])
+
+
+class CompiledDeck:
+    """Sequence of lessons backed by a memory-mapped vocabs.bin.
+
+    Only lesson names and the lesson table are read up front. Each lesson's
+    words are decoded on first access and kept in an LRU bounded by
+    ``cache_bytes`` (an estimate of the decoded objects' size), so decks
+    with thousands of lessons do not have to live in every worker.
+    """
+
+    def __init__(self, path, cache_bytes):
+        self.path = path
+        self.cache_bytes = cache_bytes
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (_, self.total_words, n_lessons), sec = _compiled_sections(self._mm, path)
+        self._sec = sec
+        self._lessons = sec['lessons']
+        self.names = [self._string(self._lessons[3 * i]) for i in range(n_lessons)]
+        self.types = [self._string(i) for i in sec['types']]
+        self._cache = collections.OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def _string(self, sid):
+        start, end = self._sec['offsets'][sid], self._sec['offsets'][sid + 1] - 1
+        return str(self._sec['blob'][start:end], 'utf-8')
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('lesson index out of range')
+        return {'lesson_name': self.names[idx], 'words': self.words(idx)}
+
+    def word_count(self, idx):
+        return self._lessons[3 * idx + 2]
+
+    def type_counts(self):
+        """Words per type, counted from the type column without decoding words."""
+        counts = collections.Counter(bytes(self._sec['type']))
+        return {self.types[t]: n for t, n in sorted(counts.items())}
+
+    def words(self, idx):
+        with self._lock:
+            cached = self._cache.get(idx)
+            if cached is not None:
+                self._cache.move_to_end(idx)
+                return cached[0]
+
+        first, count = self._lessons[3 * idx + 1], self._lessons[3 * idx + 2]
+        sec, string, types = self._sec, self._string, self.types
+        words = [
+            {'spanish': string(sec['spanish'][i]), 'czech': string(sec['czech'][i]),
+             'type': types[sec['type'][i]], 'notes': string(sec['notes'][i])}
+            for i in range(first, first + count)
+        ]
+        size = sys.getsizeof(words) + sum(
+            sys.getsizeof(w) + sys.getsizeof(w['spanish']) + sys.getsizeof(w['czech'])
+            + sys.getsizeof(w['notes']) for w in words)
+
+        with self._lock:
+            if idx not in self._cache:
+                self._cache[idx] = (words, size)
+                self._cached_bytes += size
+                # Always keep the lesson we just decoded, even if it alone
+                # exceeds the budget.
+                while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+                    _, (_, evicted) = self._cache.popitem(last=False)
+                    self._cached_bytes -= evicted
+        return words
+
+
+# -------------------------------------------------------------------
+# Compact in-memory deck (columns indexed by word id)
+# -------------------------------------------------------------------
+WORD_FIELDS = ('spanish', 'czech', 'type', 'notes')
+
+
+class Word(collections.abc.Mapping):
+    """Read-only dict-like view of one row of a WordTable.
+
+    Views are created on access and hold only the table and the word id,
+    so ``w['spanish']``, ``w.get('notes', '')`` and ``{{ w.czech }}`` in
+    templates keep working without a dict per word.
+    """
+    __slots__ = ('table', 'id')
+
+    def __init__(self, table, wid):
+        self.table = table
+        self.id = wid
+
+    def __getitem__(self, key):
+        t = self.table
+        if key == 'spanish':
+            return t.strings[t.spanish[self.id]]
+        if key == 'czech':
+            return t.strings[t.czech[self.id]]
+        if key == 'type':
+            return t.types[t.type_ids[self.id]]
+        if key == 'notes':
+            return t.strings[t.notes[self.id]]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(WORD_FIELDS)
+
+    def __len__(self):
+        return len(WORD_FIELDS)
+
+    def __repr__(self):
+        return 'Word(%r)' % dict(self)
+
+
+class WordRange(collections.abc.Sequence):
+    """Words ``first:first + count`` of a WordTable (one lesson's ``words``)."""
+    __slots__ = ('table', 'first', 'count')
+
+    def __init__(self, table, first, count):
+        self.table, self.first, self.count = table, first, count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [Word(self.table, self.first + i) for i in range(*idx.indices(self.count))]
+        if idx < 0:
+            idx += self.count
+        if not 0 <= idx < self.count:
+            raise IndexError('word index out of range')
+        return Word(self.table, self.first + idx)
+
+    def __iter__(self):
+        table = self.table
+        return (Word(table, i) for i in range(self.first, self.first + self.count))
+
+
+class FlatWords(collections.abc.Sequence):
+    """``(lesson_id, word)`` by word id, as flat_words() returns for dict decks."""
+    __slots__ = ('table',)
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.total_words
+
+    def __getitem__(self, wid):
+        if isinstance(wid, slice):
+            return [self[i] for i in range(*wid.indices(len(self)))]
+        if wid < 0:
+            wid += len(self)
+        if not 0 <= wid < len(self):
+            raise IndexError('word id out of range')
+        t = self.table
+        return bisect.bisect_right(t.firsts, wid) - 1, Word(t, wid)
+
+    def __iter__(self):
+        t = self.table
+        for li in range(len(t.names)):
+            first = t.firsts[li]
+            for wid in range(first, first + t.counts[li]):
+                yield li, Word(t, wid)
+
+
+class WordTable:
+    """A whole deck as parallel arrays instead of one dict per word.
+
+    Every distinct string is stored once in ``strings``; words are u32 string
+    ids in the ``spanish``, ``czech`` and ``notes`` columns and a u8 index
+    into ``types``; lessons are a name plus a ``(first, count)`` word range.
+    Like CompiledDeck it is a sequence of ``{'lesson_name', 'words'}``
+    lessons, whose words are Word views.
+    """
+
+    def __init__(self, strings, spanish, czech, notes, type_ids, types, names, firsts, counts):
+        self.strings = strings
+        self.spanish, self.czech, self.notes = spanish, czech, notes
+        self.type_ids = type_ids
+        self.types = types
+        self.names = names
+        self.firsts = firsts
+        self.counts = counts
+        self.total_words = len(spanish)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('lesson index out of range')
+        return {'lesson_name': self.names[idx], 'words': self.words(idx)}
+
+    def word_count(self, idx):
+        return self.counts[idx]
+
+    def words(self, idx):
+        return WordRange(self, self.firsts[idx], self.counts[idx])
+
+    def word_dicts(self, idx):
+        """Lesson ``idx``'s words as plain dicts, without going through Word views."""
+        s, types = self.strings, self.types
+        return [{'spanish': s[self.spanish[i]], 'czech': s[self.czech[i]],
+                 'type': types[self.type_ids[i]], 'notes': s[self.notes[i]]}
+                for i in range(self.firsts[idx], self.firsts[idx] + self.counts[idx])]
+
+    def type_counts(self):
+        counts = collections.Counter(self.type_ids)
+        return {self.types[t]: n for t, n in sorted(counts.items())}
+
+    def flat(self):
+        return FlatWords(self)
+
+    @classmethod
+    def from_json(cls, text):
+        """Parse vocabs.txt content straight into columns.
+
+        Word objects are folded into the columns by ``object_hook`` as the
+        decoder produces them, so the per-word dicts never accumulate.
+        Returns None if the content is not shaped like a deck (the caller
+        then keeps the plain parsed JSON).
+        """
+        strings, types = {}, {}
+        spanish, czech, notes = (array.array(_U32) for _ in range(3))
+        type_ids = bytearray()
+        names, firsts, counts = [], array.array(_U32), array.array(_U32)
+        sid = strings.setdefault
+
+        # Words come back as their id and lessons as their index; anything
+        # else (or words outside a lesson) means this is not a plain deck.
+        def hook(obj):
+            if 'lesson_name' not in obj:
+                wid = len(spanish)
+                spanish.append(sid(obj['spanish'], len(strings)))
+                czech.append(sid(obj['czech'], len(strings)))
+                notes.append(sid(obj.get('notes', ''), len(strings)))
+                wt = obj.get('type', 'Other')
+                tid = types.get(wt)
+                if tid is None:
+                    if len(types) == 256:
+                        raise _NotADeck()
+                    tid = types[wt] = len(types)
+                type_ids.append(tid)
+                return wid
+            words = obj.get('words', [])
+            first = firsts[-1] + counts[-1] if names else 0
+            if (not isinstance(obj['lesson_name'], str) or not isinstance(words, list)
+                    or len(spanish) != first + len(words)
+                    or (words and (words[0] != first or words[-1] != first + len(words) - 1))):
+                raise _NotADeck()
+            names.append(obj['lesson_name'])
+            firsts.append(first)
+            counts.append(len(words))
+            return len(names) - 1
+
+        try:
+            data = json.loads(text, object_hook=hook)
+        except (_NotADeck, KeyError, TypeError, OverflowError):
+            return None
+        if (not isinstance(data, list) or data != list(range(len(names)))
+                or not all(isinstance(t, str) for t in strings)
+                or not all(isinstance(t, str) for t in types)):
+            return None
+        return cls(list(strings), spanish, czech, notes, bytes(type_ids), list(types),
+                   names, firsts, counts)
+
+
+class _NotADeck(Exception):
+    pass
+
+
+# -------------------------------------------------------------------
+# Bulk import (CSV, TSV and Anki plain-text exports)
+# -------------------------------------------------------------------
+IMPORT_FIELDS = ('spanish', 'czech', 'type', 'notes', 'lesson')
+IMPORT_ALIASES = {'lesson_name': 'lesson', 'deck': 'lesson', 'front': 'spanish', 'back': 'czech'}
+IMPORT_DEFAULT_COLUMNS = ('spanish', 'czech', 'type', 'notes')
+IMPORT_CHUNK_BYTES = 4 * 1024 * 1024
+ANKI_SEPARATORS = {'tab': '\t', 'comma': ',', 'semicolon': ';', 'pipe': '|', 'space': ' '}
+_HTML_BREAK_RE = re.compile(r'<br\s*/?>|</?div>', re.I)
+_HTML_TAG_RE = re.compile(r'<[^>]*>')
+
+# How one input file is read; passed as-is to the worker processes.
+ImportFormat = collections.namedtuple('ImportFormat', 'delimiter columns html default_type')
+
+
+def import_column(name):
+    """Map a column name (or '-') to an IMPORT_FIELDS entry, or None to skip it."""
+    name = name.strip().lower()
+    name = IMPORT_ALIASES.get(name, name)
+    return name if name in IMPORT_FIELDS else None
+
+
+def _import_value(value, html):
+    if html:
+        import html as html_lib
+        value = html_lib.unescape(_HTML_TAG_RE.sub('', _HTML_BREAK_RE.sub(' ', value)))
+    return ' '.join(value.split())
+
+
+def parse_import_chunk(data, first_line, fmt):
+    """Parse one chunk of rows into ``[(line, record, problem), ...]``.
+
+    ``record`` is ``(lesson, spanish, czech, type, notes)`` (lesson is None
+    without a lesson column) or None when the row is rejected for ``problem``.
+    """
+    return list(parse_import_lines(io.StringIO(data.decode('utf-8', errors='replace')), first_line, fmt))
+
+
+def parse_import_lines(lines, first_line, fmt):
+    """Like parse_import_chunk(), over an iterable of text lines, as a generator."""
+    reader = csv.reader(lines, delimiter=fmt.delimiter)
+    consumed = 0
+    for row in reader:
+        line, consumed = first_line + consumed, reader.line_num
+        if not any(cell.strip() for cell in row):
+            continue
+        fields = {}
+        for name, cell in zip(fmt.columns, row):
+            if name is not None:
+                fields[name] = _import_value(cell, fmt.html)
+        problem = None
+        if not fields.get('spanish') or not fields.get('czech'):
+            problem = ('expected %d columns, got %d' % (len(fmt.columns), len(row))
+                       if len(row) < len(fmt.columns) else 'spanish and czech must not be empty')
+        elif 'lesson' in fmt.columns and not fields.get('lesson'):
+            problem = 'lesson must not be empty'
+        elif any('\0' in v or '\ufffd' in v for v in fields.values()):
+            problem = 'invalid characters (NUL or bad UTF-8)'
+        if problem:
+            yield line, None, problem
+        else:
+            yield line, (fields.get('lesson'), fields['spanish'], fields['czech'],
+                         fields.get('type') or fmt.default_type, fields.get('notes', '')), None
+
+
+def _decoded_lines(f):
+    # Lines split on b'\n', which never occurs inside a UTF-8 sequence.
+    for raw in f:
+        yield raw.decode('utf-8', errors='replace')
+
+
+def iter_import_chunks(f, first_line=1, chunk_bytes=IMPORT_CHUNK_BYTES, delimiter=','):
+    """Split a binary file into ``(data, first_line)`` chunks of whole rows.
+
+    Row boundaries come from a csv reader pass with the same dialect the
+    workers use, so multi-line quoted fields are never cut in half, and
+    quotes inside unquoted fields (Anki HTML like ``class="x"``) do not
+    throw the split off. The pass only finds records; building them is
+    left to the workers.
+    """
+    parts = []
+    size = 0
+
+    def lines():
+        nonlocal size
+        for raw in f:
+            parts.append(raw)
+            size += len(raw)
+            yield raw.decode('utf-8', errors='replace')
+
+    line = first_line
+    for _ in csv.reader(lines(), delimiter=delimiter):
+        if size >= chunk_bytes:
+            chunk = b''.join(parts)
+            parts.clear()
+            size = 0
+            yield chunk, line
+            line += chunk.count(b'\n')
+    if parts:
+        yield b''.join(parts), line
+
+
+def read_import_header(f, fmt_name):
+    """Consume Anki '#key:value' header lines; return ``(options, lines read)``."""
+    options = {}
+    lines = 0
+    while fmt_name == 'anki':
+        pos = f.tell()
+        raw = f.readline()
+        if not raw.startswith(b'#'):
+            f.seek(pos)
+            break
+        lines += 1
+        key, _, value = raw.decode('utf-8-sig').strip()[1:].partition(':')
+        options[key.strip().lower()] = value.strip()
+    return options, lines
+
+
+def import_rows(path, fmt_name='csv', columns=None, header=False, default_type='Word', jobs=1,
+                chunk_bytes=IMPORT_CHUNK_BYTES):
+    """Yield ``(line, record, problem)`` for every row of ``path``, in file order.
+
+    Large files are parsed by ``jobs`` worker processes, at most ``2 * jobs``
+    chunks in flight, so memory stays bounded whatever the file size.
+    """
+    with open(path, 'rb') as f:
+        if f.read(3) != b'\xef\xbb\xbf':
+            f.seek(0)
+        options, line = read_import_header(f, fmt_name)
+        delimiter = {'csv': ',', 'tsv': '\t', 'anki': '\t'}[fmt_name]
+        html = fmt_name == 'anki'
+        if fmt_name == 'anki':
+            delimiter = ANKI_SEPARATORS.get(options.get('separator', 'tab').lower(), delimiter)
+            html = options.get('html', 'false').lower() == 'true'
+            if columns is None and 'columns' in options:
+                columns = options['columns'].split(delimiter)
+        if header:
+            first = next(csv.reader([f.readline().decode('utf-8')], delimiter=delimiter), [])
+            line += 1
+            if columns is None:
+                columns = first
+        names = [import_column(c) for c in (columns or IMPORT_DEFAULT_COLUMNS)]
+        if fmt_name == 'anki' and options.get('deck column', '').isdigit():
+            deck = int(options['deck column']) - 1
+            names += [None] * (deck + 1 - len(names))
+            names[deck] = 'lesson'
+        if 'spanish' not in names or 'czech' not in names:
+            raise ValueError('columns must include spanish and czech (got %s)' % ', '.join(map(str, columns or names)))
+        fmt = ImportFormat(delimiter, tuple(names), html, default_type)
+
+        if jobs <= 1 or os.fstat(f.fileno()).st_size < 2 * chunk_bytes:
+            yield from parse_import_lines(_decoded_lines(f), line + 1, fmt)
+            return
+        chunks = iter_import_chunks(f, line + 1, chunk_bytes, delimiter)
+
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(jobs) as pool:
+            pending = collections.deque()
+            for data, first_line in chunks:
+                pending.append(pool.submit(parse_import_chunk, data, first_line, fmt))
+                if len(pending) >= 2 * jobs:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+
+class DeckWriter:
+    """Streams lessons to a vocabs.txt-format file as they are completed.
+
+    Only the lesson being filled is held in memory. Duplicate words (same
+    spanish and czech, ignoring case and spacing) are dropped using a set
+    of 8-byte digests rather than the words themselves.
+    """
+
+    def __init__(self, f, lesson_size=50):
+        self.f = f
+        self.lesson_size = lesson_size
+        self.seen = set()
+        self.lessons = self.words = self.duplicates = 0
+        self.split_lessons = set()
+        self._written_names = set()
+        self._current = None
+        f.write('[')
+
+    @staticmethod
+    def word_key(spanish, czech):
+        text = '%s\0%s' % (' '.join(spanish.casefold().split()), ' '.join(czech.casefold().split()))
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+    def add_lesson(self, lesson):
+        """Copy an existing lesson through, remembering its words for dedup."""
+        for w in lesson.get('words', []):
+            self.seen.add(self.word_key(w['spanish'], w['czech']))
+        self.write_lesson(lesson)
+
+    def write_lesson(self, lesson):
+        """Copy a lesson through as is, when no words will be added after it."""
+        self._flush()
+        self._write(lesson)
+
+    def add(self, lesson_name, word):
+        key = self.word_key(word['spanish'], word['czech'])
+        if key in self.seen:
+            self.duplicates += 1
+            return False
+        self.seen.add(key)
+        if lesson_name is None:
+            if self._current is None or len(self._current['words']) >= self.lesson_size:
+                # Numbered after the lessons already written (plus the one
+                # about to be flushed).
+                lesson_name = 'Lesson %d' % (self.lessons + 1 + (self._current is not None))
+            else:
+                lesson_name = self._current['lesson_name']
+        if self._current is None or self._current['lesson_name'] != lesson_name:
+            self._flush()
+            if lesson_name in self._written_names:
+                # Rows of this lesson were not contiguous; keep memory bounded
+                # by writing the new run as a separate lesson of the same name.
+                self.split_lessons.add(lesson_name)
+            self._current = {'lesson_name': lesson_name, 'words': []}
+        self._current['words'].append(word)
+        self.words += 1
+        return True
+
+    def _write(self, lesson):
+        text = json.dumps(lesson, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+        self.f.write('%s\n  %s' % (',' if self.lessons else '', text))
+        self._written_names.add(lesson['lesson_name'])
+        self.lessons += 1
+
+    def _flush(self):
+        if self._current is not None:
+            self._write(self._current)
+            self._current = None
+
+    def close(self):
+        self._flush()
+        self.f.write('\n]\n')
+
+
+# -------------------------------------------------------------------
+# Vocabulary store (loaded once, hot-reloaded when vocabs.txt changes)
+# -------------------------------------------------------------------
+class VocabSnapshot:
+    """One parsed version of vocabs.txt. Treat ``lessons`` as read-only.
+
+    ``version`` increases every time the store swaps in new content, so
+    derived caches can key on it instead of re-checking the file.
+    """
+    __slots__ = ('version', 'lessons', 'source_key', '_derived', '_derived_lock')
+
+    def __init__(self, version, lessons, source_key):
+        self.version = version
+        self.lessons = lessons
+        self.source_key = source_key
+        self._derived = {}
+        self._derived_lock = threading.RLock()
+
+    def derived(self, name, builder):
+        """Return ``builder(self)``, computed at most once per snapshot."""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if name not in self._derived:
+                with metrics.timer('derived_build_seconds', index=name):
+                    self._derived[name] = builder(self)
+            return self._derived[name]
+
+    def edited(self, lessons, steps, versions=1, source_key=None):
+        """The snapshot after an edit of this one.
+
+        Derived values that have an ``edited(snapshot, steps)`` method are
+        updated from this snapshot's; the others are rebuilt on first use.
+        """
+        new = VocabSnapshot(self.version + versions, lessons, source_key)
+        with self._derived_lock:
+            derived = list(self._derived.items())
+        for name, value in derived:
+            if hasattr(value, 'edited'):
+                with metrics.timer('derived_edit_seconds', index=name):
+                    new._derived[name] = value.edited(new, steps)
+        return new
+
+
+class VocabStore:
+    """Process-wide vocabulary cache.
+
+    Requests call ``snapshot()``; at most every ``check_interval`` seconds it
+    stats the source files and, if their mtime/size changed, one thread
+    reparses them and swaps the new snapshot in. Other threads keep serving
+    the old snapshot while that happens.
+
+    A compiled artifact at ``compiled_path`` is preferred over the JSON
+    source whenever it is at least as new. With ``lazy`` set, it is opened as
+    a CompiledDeck instead of being decoded in full.
+
+    ``edit()`` appends each change to a write-ahead journal next to the
+    source (``<path>.journal``, headed by a digest of the source it applies
+    to) before publishing the edited snapshot, and ``compact()`` folds the
+    journal back into the source. Every ``journal_interval`` seconds the
+    journal is checked even when the source is not watched, so records
+    written by other processes are applied here as deltas too.
+    """
+
+    def __init__(self, path, compiled_path=None, check_interval=1.0,
+                 lazy=False, cache_bytes=LESSON_CACHE_BYTES, journal_interval=1.0):
+        self.path = path
+        self.compiled_path = compiled_path
+        self.check_interval = check_interval
+        self.lazy = lazy
+        self.cache_bytes = cache_bytes
+        self.journal_path = path + '.journal'
+        self.journal_interval = journal_interval
+        self._reload_lock = threading.Lock()
+        self._snapshot = VocabSnapshot(0, [], None)
+        self._next_check = 0.0
+        self._next_journal_check = 0.0
+        # Digest of the source the snapshot was parsed from (None: not
+        # computed yet), and how far into the journal it reflects.
+        self._base_digest = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._compacting = False
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    @property
+    def revision(self):
+        """Names the deck content the same way in every process (unlike ``version``)."""
+        with self._reload_lock:
+            return self._revision()
+
+    def _revision(self):
+        if self._base_digest is None:
+            self._base_digest = _file_digest(self.path)
+        return '%s-%d' % (self._base_digest[:16], self._journal_records)
+
+    def snapshot(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._next_journal_check = now + self.journal_interval
+            self._maybe_reload()
+        elif now >= self._next_journal_check:
+            self._next_journal_check = now + self.journal_interval
+            key = self._snapshot.source_key
+            if key is None or self._stat(self.journal_path) != key[2]:
+                self._maybe_reload()
+        return self._snapshot
+
+    @staticmethod
+    def _stat(path):
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _source_key(self):
+        return (self._stat(self.path), self._stat(self.compiled_path), self._stat(self.journal_path))
+
+    def _maybe_reload(self):
+        key = self._source_key()
+        if key == self._snapshot.source_key:
+            return
+        # Someone else is already reloading: keep serving the old snapshot.
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            if key == self._snapshot.source_key:
+                return
+            self._reload(key)
+        finally:
+            self._reload_lock.release()
+
+    def _reload(self, key):
+        # Callers hold _reload_lock.
+        with metrics.timer('vocab_reload_seconds'):
+            if self._catch_up(key):
+                return
+            lessons = self._parse(key)
+        if lessons is None:
+            # Half-written or invalid file; keep the last good content
+            # but remember the key so we don't reparse it on every check.
+            self._snapshot.source_key = key
+            metrics.inc('vocab_reloads_total', outcome='invalid')
+            return
+        metrics.inc('vocab_reloads_total', outcome='ok')
+        self._snapshot = VocabSnapshot(self._snapshot.version + 1, lessons, key)
+
+    def _parse(self, key):
+        source, compiled, journal = key
+        self._base_digest, self._journal_offset, self._journal_records = None, 0, 0
+        if journal is not None:
+            lessons = self._parse_journaled(source)
+            if lessons is not None:
+                return lessons
+        if compiled is not None and (source is None or compiled[0] >= source[0]):
+            try:
+                if self.lazy:
+                    return CompiledDeck(self.compiled_path, self.cache_bytes)
+                return load_compiled(self.compiled_path)
+            except (OSError, ValueError):
+                pass
+        if source is None:
+            return []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return self._decode(f.read())
+
+    @staticmethod
+    def _decode(text):
+        try:
+            data = WordTable.from_json(text)
+            if data is None:
+                data = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return data if isinstance(data, (list, WordTable)) else None
+
+    def _parse_journaled(self, source):
+        """The source with the journal replayed, or None if the journal does not apply to it."""
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raw = b''
+        digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        records, offset = self._read_journal(0, digest)
+        if records is None:
+            print('Warning: %s was not written against the current %s; ignoring it'
+                  % (self.journal_path, self.path), file=sys.stderr)
+            return None
+        lessons = self._decode(str(raw, 'utf-8')) if raw else []
+        if lessons is None:
+            return None
+        editor = self._replay(lessons, records)
+        self._base_digest, self._journal_offset, self._journal_records = digest, offset, len(records)
+        return editor.deck()
+
+    def _read_journal(self, offset, digest=None):
+        """Complete records from ``offset`` on, and the offset after them.
+
+        Reading from the start checks the header against ``digest`` and
+        returns ``(None, 0)`` if the journal belongs to another source. A
+        torn last line (a writer died mid-append) is left unread.
+        """
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        lines = data.split(b'\n')[:-1]
+        if offset == 0:
+            try:
+                header = json.loads(lines[0])
+            except (IndexError, ValueError):
+                return None, 0
+            if not isinstance(header, dict) or header.get('base') != digest:
+                return None, 0
+            offset += len(lines[0]) + 1
+            lines = lines[1:]
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            offset += len(line) + 1
+        return records, offset
+
+    def _replay(self, lessons, records):
+        editor = DeckEditor(self._editable(lessons))
+        for record in records:
+            try:
+                editor.apply(record)
+            except VocabEditError as e:
+                # Every process skips the same record, so they still agree.
+                print('Warning: skipping journaled edit %r: %s' % (record, e), file=sys.stderr)
+        return editor
+
+    def _editable(self, lessons):
+        if isinstance(lessons, CompiledDeck):
+            return load_compiled(lessons.path)
+        return lessons
+
+    def _catch_up(self, key):
+        """Apply journal records appended since the snapshot, if that is all that changed."""
+        old = self._snapshot.source_key
+        if old is None or key[:2] != old[:2] or key[2] is None:
+            return False
+        if self._journal_offset == 0 and self._base_digest is None:
+            self._base_digest = _file_digest(self.path)
+        if key[2][1] < self._journal_offset:
+            return False
+        records, offset = self._read_journal(self._journal_offset, self._base_digest)
+        if records is None:
+            return False
+        if records:
+            editor = self._replay(self._snapshot.lessons, records)
+            self._snapshot = self._snapshot.edited(editor.deck(), editor.steps, len(records), key)
+            self._journal_records += len(records)
+        else:
+            self._snapshot.source_key = key
+        self._journal_offset = offset
+        metrics.inc('vocab_reloads_total', outcome='journal')
+        return True
+
+    def _sync(self):
+        # Callers hold both locks: bring the snapshot up to date with disk,
+        # other processes' edits included.
+        key = self._source_key()
+        if key != self._snapshot.source_key:
+            self._reload(key)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Serialize edits across processes (and, with _reload_lock, threads)."""
+        with self._reload_lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def edit(self, record, revision=None):
+        """Apply one edit record; return ``(snapshot, normalized record, new revision)``.
+
+        The record is journaled (and fsynced) before the new snapshot is
+        published. With ``revision`` given, the edit is refused with a 409
+        unless the deck is still at that revision.
+        """
+        with self._file_lock():
+            self._sync()
+            snapshot = self._snapshot
+            current = self._revision()
+            if revision is not None and revision != current:
+                raise VocabEditError('the deck is at revision %s, not %s' % (current, revision), 409)
+            editor = DeckEditor(self._editable(snapshot.lessons))
+            with metrics.timer('vocab_edit_seconds'):
+                record = editor.apply(record)
+                self._append(record)
+                self._snapshot = snapshot.edited(editor.deck(), editor.steps, 1, self._source_key())
+            self._journal_records += 1
+            snapshot, revision = self._snapshot, self._revision()
+            compact = self._journal_records >= JOURNAL_COMPACT_EDITS and not self._compacting
+            self._compacting = self._compacting or compact
+        metrics.inc('vocab_edits_total', op=record['op'])
+        if compact:
+            threading.Thread(target=self._compact_in_background, name='vocab-compact', daemon=True).start()
+        return snapshot, record, revision
+
+    def _append(self, record):
+        data = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        if self._journal_offset == 0:
+            if os.path.exists(self.journal_path):
+                # Left over from another version of the source; keep it for
+                # inspection rather than appending to it.
+                os.replace(self.journal_path, self.journal_path + '.stale')
+            if self._base_digest is None:
+                self._base_digest = _file_digest(self.path)
+            data = json.dumps({'base': self._base_digest}) + '\n' + data
+        data = data.encode('utf-8')
+        with open(self.journal_path, 'ab') as f:
+            if f.tell() > self._journal_offset:
+                # A torn record from a writer that died mid-append.
+                f.truncate(self._journal_offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_offset += len(data)
+
+    def compact(self):
+        """Rewrite the source with the journal applied and drop the journal.
+
+        The new source is written next to it, fsynced and renamed into
+        place, so readers see either the old file plus the journal or the
+        new file. Returns how many journaled edits were folded in.
+        """
+        with self._file_lock():
+            self._sync()
+            if self._journal_offset == 0:
+                return 0
+            folded = self._journal_records
+            with metrics.timer('vocab_compact_seconds'):
+                tmp = '%s.%d.tmp' % (self.path, os.getpid())
+                try:
+                    with open(tmp, 'w', encoding='utf-8') as f:
+                        writer = DeckWriter(f)
+                        lessons = self._snapshot.lessons
+                        for idx, lesson in enumerate(lessons):
+                            words = (lessons.word_dicts(idx) if isinstance(lessons, WordTable)
+                                     else [dict(w) for w in lesson.get('words', [])])
+                            writer.write_lesson(dict(lesson, words=words))
+                        writer.close()
+                        f.flush()
+                        os.fsync(f.fileno())
+                    digest = _file_digest(tmp)
+                    os.replace(tmp, self.path)
+                finally:
+                    if os.path.exists(tmp):
+                        os.unlink(tmp)
+                try:
+                    os.unlink(self.journal_path)
+                except FileNotFoundError:
+                    pass
+            self._base_digest, self._journal_offset, self._journal_records = digest, 0, 0
+            self._snapshot.source_key = self._source_key()
+        metrics.inc('vocab_compactions_total')
+        return folded
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except OSError as e:
+            print('Warning: compacting %s failed: %s' % (self.journal_path, e), file=sys.stderr)
+        finally:
+            self._compacting = False
+
+    def reload(self):
+        """Force a stat check now, regardless of ``check_interval``."""
+        self._next_check = 0.0
+        return self.snapshot()
+
+
+vocab_store = VocabStore(VOCABS_PATH, COMPILED_PATH, lazy=LAZY_LESSONS)
+
+
+def load_vocabs():
+    return vocab_store.snapshot().lessons
+
+
+_JSON_SPACE_RE = re.compile(r'[ \t\n\r]*')
+
+
+class _JSONReader:
+    """Reads JSON values from a text file in growing chunks, only as far as asked."""
+
+    def __init__(self, f, chunk_chars=64 * 1024):
+        self.f = f
+        self.chunk_chars = chunk_chars
+        self.text, self.pos, self.eof = '', 0, False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.f.read(self.chunk_chars)
+        self.chunk_chars *= 2
+        self.text, self.pos, self.eof = self.text[self.pos:] + data, 0, not data
+
+    def peek(self):
+        """The next character after any whitespace ('' at the end of the file)."""
+        while True:
+            self.pos = _JSON_SPACE_RE.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or self.eof:
+                return self.text[self.pos:self.pos + 1]
+            self._fill()
+
+    def skip(self):
+        self.pos += 1
+
+    def decode(self):
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # A value that ends the buffer (a number) may go on in the next chunk.
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            self._fill()
+
+
+def load_lessons(lesson_ids, path=VOCABS_PATH, compiled_path=COMPILED_PATH):
+    """Only the lessons in ``lesson_ids``, as ``{lesson_id: lesson}``.
+
+    A fresh vocabs.bin is opened as a CompiledDeck, which decodes just those
+    lessons. Otherwise vocabs.txt is read and decoded one lesson at a time,
+    keeping the wanted ones and stopping after the last of them. Ids that are
+    out of range are left out. Nothing here touches ``vocab_store``.
+    """
+    wanted = set(lesson_ids)
+    if os.path.exists(path + '.journal'):
+        # Edits not compacted yet: only the store knows how to apply them.
+        lessons = VocabStore(path, compiled_path).snapshot().lessons
+        return {idx: dict(lessons[idx], words=[dict(w) for w in lessons[idx]['words']])
+                for idx in sorted(wanted) if 0 <= idx < len(lessons)}
+    source, compiled = VocabStore._stat(path), VocabStore._stat(compiled_path)
+    if compiled is not None and (source is None or compiled[0] >= source[0]):
+        try:
+            deck = CompiledDeck(compiled_path, LESSON_CACHE_BYTES)
+        except (OSError, ValueError):
+            pass
+        else:
+            return {idx: deck[idx] for idx in sorted(wanted) if 0 <= idx < len(deck)}
+
+    found = {}
+    if not wanted or source is None:
+        return found
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _JSONReader(f)
+        if reader.peek() != '[':
+            raise VocabFormatError('%s: expected a list of lessons' % path)
+        reader.skip()
+        last = max(wanted)
+        idx = 0
+        while idx <= last and reader.peek() not in ('', ']'):
+            lesson = reader.decode()
+            if idx in wanted:
+                found[idx] = lesson
+            if reader.peek() == ',':
+                reader.skip()
+            idx += 1
+    return found
+
+
+# -------------------------------------------------------------------
+# Deck edits
+# -------------------------------------------------------------------
+# Edits are journaled next to vocabs.txt and folded back into it once this
+# many have accumulated (or by `vocab.py compact`).
+JOURNAL_COMPACT_EDITS = int(os.environ.get('DUOVOCAB_JOURNAL_COMPACT_EDITS', '200'))
+MAX_WORD_TYPES = 256
+
+
+class VocabEditError(ValueError):
+    """A rejected edit; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _file_digest(path):
+    """blake2b of a file's bytes (of b'' if it does not exist)."""
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        pass
+    return digest.hexdigest()
+
+
+class DeckEditor:
+    """Applies edit records to a deck without changing the deck passed in.
+
+    Snapshots share their lessons, so the columns of a WordTable (or the
+    lesson and word lists of a plain deck) are copied on the first write
+    and changed in place after that. New strings are appended to the shared
+    string table; older tables never index past their own end.
+
+    Every change is recorded in ``steps``, which is what the derived
+    indexes' ``edited()`` methods consume: ``('insert' | 'remove', word_id,
+    lesson_id, word)`` with ids as they are at that step, and
+    ``('insert_lesson' | 'remove_lesson', lesson_id)``. Moves are a remove
+    and an insert.
+    """
+
+    def __init__(self, deck):
+        self._deck = deck
+        self._table = isinstance(deck, WordTable)
+        self._copied = False
+        self._fresh = set()  # ids of plain-deck lessons already copied
+        self.steps = []
+
+    def deck(self):
+        """The edited deck (the original one if nothing was applied)."""
+        if self._table:
+            self._deck.total_words = len(self._deck.spanish)
+        return self._deck
+
+    # Records ----------------------------------------------------------
+
+    def apply(self, record):
+        """Apply one edit record; return it with every default filled in.
+
+        Replaying the returned record against the same deck gives the same
+        result, which is what the journal relies on.
+        """
+        if not isinstance(record, dict):
+            raise VocabEditError('an edit must be an object')
+        op = record.get('op')
+        handler = getattr(self, '_op_' + op, None) if isinstance(op, str) else None
+        if handler is None:
+            raise VocabEditError('unknown edit op %r' % (op,))
+        return dict({'op': op}, **handler(record))
+
+    def _op_add_lesson(self, record):
+        name = self._name(record.get('name'))
+        lesson = self._index(record, 'lesson', len(self._deck), len(self._deck))
+        self._insert_lesson(lesson, name)
+        return {'lesson': lesson, 'name': name}
+
+    def _op_update_lesson(self, record):
+        lesson = self._lesson(record)
+        name = self._name(record['name']) if record.get('name') is not None else self._lesson_name(lesson)
+        to = self._index(record, 'to', lesson, len(self._deck) - 1)
+        if to == lesson:
+            if name != self._lesson_name(lesson):
+                self._rename_lesson(lesson, name)
+        else:
+            words = self._remove_words(lesson)
+            self._remove_lesson(lesson)
+            self._insert_lesson(to, name)
+            self._insert_words(to, 0, words)
+        return {'lesson': lesson, 'name': name, 'to': to}
+
+    def _op_delete_lesson(self, record):
+        lesson = self._lesson(record)
+        self._remove_words(lesson)
+        self._remove_lesson(lesson)
+        return {'lesson': lesson}
+
+    def _op_add_word(self, record):
+        lesson = self._lesson(record)
+        word = self._word(record.get('word'))
+        count = self._count(lesson)
+        position = self._index(record, 'position', count, count)
+        self._insert_word(lesson, position, word)
+        return {'lesson': lesson, 'position': position, 'word': word}
+
+    def _op_update_word(self, record):
+        lesson = self._lesson(record)
+        position = self._position(record, lesson)
+        changes = record.get('word') or {}
+        if not isinstance(changes, dict):
+            raise VocabEditError('word must be an object')
+        word = self._word(dict(self._get_word(lesson, position), **changes))
+        to_lesson = self._lesson(record, 'to_lesson') if record.get('to_lesson') is not None else lesson
+        # Positions in the target lesson count without the word being moved.
+        count = self._count(to_lesson) - (to_lesson == lesson)
+        to_position = self._index(record, 'to_position', position if to_lesson == lesson else count, count)
+        self._remove_word(lesson, position)
+        self._insert_word(to_lesson, to_position, word)
+        return {'lesson': lesson, 'position': position, 'word': word,
+                'to_lesson': to_lesson, 'to_position': to_position}
+
+    def _op_delete_word(self, record):
+        lesson = self._lesson(record)
+        position = self._position(record, lesson)
+        word = self._remove_word(lesson, position)
+        return {'lesson': lesson, 'position': position, 'word': word}
+
+    # Validation -------------------------------------------------------
+
+    @staticmethod
+    def _index(record, field, default, limit):
+        value = record.get(field)
+        if value is None:
+            return default
+        if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= limit:
+            raise VocabEditError('%s must be an integer from 0 to %d' % (field, limit))
+        return value
+
+    def _lesson(self, record, field='lesson'):
+        value = record.get(field)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise VocabEditError('%s must be an integer' % field)
+        if not 0 <= value < len(self._deck):
+            raise VocabEditError('no lesson %d' % value, 404)
+        return value
+
+    def _position(self, record, lesson):
+        value = record.get('position')
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise VocabEditError('position must be an integer')
+        if not 0 <= value < self._count(lesson):
+            raise VocabEditError('lesson %d has no word %d' % (lesson, value), 404)
+        return value
+
+    @staticmethod
+    def _name(name):
+        if not isinstance(name, str) or not name.strip() or '\0' in name:
+            raise VocabEditError('name must be a non-empty string')
+        return name
+
+    @staticmethod
+    def _word(word):
+        if not isinstance(word, dict):
+            raise VocabEditError('word must be an object')
+        unknown = sorted(set(word) - set(WORD_FIELDS))
+        if unknown:
+            raise VocabEditError('unknown word field %r' % unknown[0])
+        word = {'spanish': word.get('spanish'), 'czech': word.get('czech'),
+                'type': word.get('type') or 'Word', 'notes': word.get('notes') or ''}
+        errors = validate_vocabs([{'lesson_name': '', 'words': [word]}])
+        if errors:
+            raise VocabEditError(errors[0].split(': ', 1)[-1])
+        return word
+
+    # Deck access ------------------------------------------------------
+
+    def _count(self, lesson):
+        if self._table:
+            return self._deck.counts[lesson]
+        return len(self._deck[lesson].get('words', []))
+
+    def _lesson_name(self, lesson):
+        if self._table:
+            return self._deck.names[lesson]
+        return self._deck[lesson].get('lesson_name', '')
+
+    def _first(self, lesson):
+        if self._table:
+            return self._deck.firsts[lesson]
+        return sum(len(l.get('words', [])) for l in itertools.islice(self._deck, lesson))
+
+    def _get_word(self, lesson, position):
+        if self._table:
+            return dict(Word(self._deck, self._deck.firsts[lesson] + position))
+        return dict(self._deck[lesson]['words'][position])
+
+    def _writable(self):
+        """Copy the deck's containers before the first change."""
+        if self._copied:
+            return self._deck
+        d = self._deck
+        if self._table:
+            self._deck = WordTable(d.strings, d.spanish[:], d.czech[:], d.notes[:], bytearray(d.type_ids),
+                                   d.types[:], d.names[:], d.firsts[:], d.counts[:])
+        else:
+            self._deck = list(d)
+        self._copied = True
+        return self._deck
+
+    def _words(self, lesson):
+        """Writable word list of a plain-deck lesson."""
+        deck = self._writable()
+        if id(deck[lesson]) not in self._fresh:
+            deck[lesson] = dict(deck[lesson], words=list(deck[lesson].get('words', [])))
+            self._fresh.add(id(deck[lesson]))
+        return deck[lesson]['words']
+
+    def _insert_lesson(self, lesson, name):
+        deck = self._writable()
+        if self._table:
+            deck.names.insert(lesson, name)
+            deck.firsts.insert(lesson, deck.firsts[lesson] if lesson < len(deck.firsts) else len(deck.spanish))
+            deck.counts.insert(lesson, 0)
+        else:
+            entry = {'lesson_name': name, 'words': []}
+            deck.insert(lesson, entry)
+            self._fresh.add(id(entry))
+        self.steps.append(('insert_lesson', lesson))
+
+    def _rename_lesson(self, lesson, name):
+        deck = self._writable()
+        if self._table:
+            deck.names[lesson] = name
+        else:
+            self._words(lesson)
+            deck[lesson]['lesson_name'] = name
+
+    def _remove_lesson(self, lesson):
+        deck = self._writable()
+        if self._table:
+            del deck.names[lesson], deck.firsts[lesson], deck.counts[lesson]
+        else:
+            del deck[lesson]
+        self.steps.append(('remove_lesson', lesson))
+
+    def _insert_word(self, lesson, position, word):
+        self._insert_words(lesson, position, [word])
+
+    def _remove_word(self, lesson, position):
+        return self._remove_words(lesson, position, 1)[0]
+
+    def _insert_words(self, lesson, position, words):
+        wid = self._first(lesson) + position
+        deck = self._writable()
+        if self._table:
+            tids = []
+            for word in words:
+                try:
+                    tids.append(deck.types.index(word['type']))
+                except ValueError:
+                    if len(deck.types) == MAX_WORD_TYPES:
+                        raise VocabEditError('more than %d distinct word types' % MAX_WORD_TYPES) from None
+                    tids.append(len(deck.types))
+                    deck.types.append(word['type'])
+            strings = deck.strings
+            for column, field in ((deck.spanish, 'spanish'), (deck.czech, 'czech'), (deck.notes, 'notes')):
+                column[wid:wid] = array.array(_U32, range(len(strings), len(strings) + len(words)))
+                strings.extend(word[field] for word in words)
+            deck.type_ids[wid:wid] = bytes(tids)
+            deck.counts[lesson] += len(words)
+            for i in range(lesson + 1, len(deck.firsts)):
+                deck.firsts[i] += len(words)
+        else:
+            self._words(lesson)[position:position] = words
+        self.steps.extend(('insert', wid + i, lesson, word) for i, word in enumerate(words))
+
+    def _remove_words(self, lesson, position=0, count=None):
+        """Remove ``count`` words (all the rest by default) and return them."""
+        if count is None:
+            count = self._count(lesson) - position
+        wid = self._first(lesson) + position
+        words = [self._get_word(lesson, position + i) for i in range(count)]
+        deck = self._writable()
+        if self._table:
+            for column in (deck.spanish, deck.czech, deck.notes, deck.type_ids):
+                del column[wid:wid + count]
+            deck.counts[lesson] -= count
+            for i in range(lesson + 1, len(deck.firsts)):
+                deck.firsts[i] -= count
+        else:
+            del self._words(lesson)[position:position + count]
+        self.steps.extend(('remove', wid, lesson, word) for word in words)
+        return words
+
+
+# -------------------------------------------------------------------
+# Derived indexes (built once per vocabulary version)
+# -------------------------------------------------------------------
+_MISSING = object()
+_DELETED = object()
+
+
+class LayeredDict(collections.abc.MutableMapping):
+    """A dict shared by the versions of an edited index, plus one version's changes.
+
+    ``copy()`` copies only ``changes`` (removed keys map to _DELETED) and
+    folds them into a new shared dict once they outgrow a sixteenth of it,
+    so copying is cheap and a lookup is at most two probes. Whoever holds a
+    copy replaces values instead of mutating them.
+    """
+    __slots__ = ('base', 'changes', 'size')
+
+    def __init__(self, base=None):
+        self.base = {} if base is None else base
+        self.changes = {}
+        self.size = len(self.base)
+
+    def __getitem__(self, key):
+        value = self.changes.get(key, _MISSING)
+        if value is _MISSING:
+            return self.base[key]
+        if value is _DELETED:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self.changes.get(key, _MISSING)
+        if value is _MISSING:
+            return self.base.get(key, default)
+        return default if value is _DELETED else value
+
+    def __contains__(self, key):
+        value = self.changes.get(key, _MISSING)
+        if value is _MISSING:
+            return key in self.base
+        return value is not _DELETED
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.size += 1
+        self.changes[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.size -= 1
+        if key in self.base:
+            self.changes[key] = _DELETED
+        else:
+            del self.changes[key]
+
+    def __iter__(self):
+        changes = self.changes
+        for key in self.base:
+            if key not in changes:
+                yield key
+        for key, value in changes.items():
+            if value is not _DELETED:
+                yield key
+
+    def __len__(self):
+        return self.size
+
+    def copy(self):
+        if len(self.changes) > 64 + len(self.base) // 16:
+            base = dict(self.base)
+            for key, value in self.changes.items():
+                if value is _DELETED:
+                    del base[key]
+                else:
+                    base[key] = value
+            return LayeredDict(base)
+        new = LayeredDict(self.base)
+        new.changes = dict(self.changes)
+        new.size = self.size
+        return new
+
+
+def layered(mapping):
+    """A LayeredDict copy of ``mapping``; plain dicts become its shared base as is."""
+    return mapping.copy() if isinstance(mapping, LayeredDict) else LayeredDict(mapping)
+
+
+class TermPool:
+    """Insertion-ordered unique Spanish and Czech terms.
+
+    Each term also counts the words using it, so removing a word only drops
+    the terms no other word in the pool still has.
+    """
+    __slots__ = ('spanish', 'czech', '_uses_spanish', '_uses_czech')
+
+    def __init__(self):
+        self.spanish = []
+        self.czech = []
+        self._uses_spanish = {}
+        self._uses_czech = {}
+
+    def add(self, word):
+        es, cz = word['spanish'], word['czech']
+        uses = self._uses_spanish.get(es)
+        if uses is None:
+            self.spanish.append(es)
+        self._uses_spanish[es] = (uses or 0) + 1
+        uses = self._uses_czech.get(cz)
+        if uses is None:
+            self.czech.append(cz)
+        self._uses_czech[cz] = (uses or 0) + 1
+
+    def remove(self, word):
+        for term, terms, uses in ((word['spanish'], self.spanish, self._uses_spanish),
+                                  (word['czech'], self.czech, self._uses_czech)):
+            if uses[term] == 1:
+                del uses[term]
+                terms.remove(term)
+            else:
+                uses[term] -= 1
+
+    def copy(self):
+        pool = TermPool()
+        pool.spanish, pool.czech = self.spanish[:], self.czech[:]
+        pool._uses_spanish, pool._uses_czech = layered(self._uses_spanish), layered(self._uses_czech)
+        return pool
+
+    def terms(self, language):
+        return self.spanish if language == 'spanish' else self.czech
+
+
+class DistractorIndex:
+    """Unique terms for the whole deck, plus buckets by word type and lesson.
+
+    ``lessons`` is an iterable of ``(lesson_id, lesson)`` pairs.
+    """
+    __slots__ = ('all', 'by_type', 'by_lesson')
+
+    def __init__(self, lessons):
+        self.all = TermPool()
+        self.by_type = {}
+        self.by_lesson = {}
+        for idx, lesson in lessons:
+            lesson_pool = self.by_lesson[idx] = TermPool()
+            for w in lesson.get('words', []):
+                self.all.add(w)
+                lesson_pool.add(w)
+                wt = w.get('type', 'Other')
+                type_pool = self.by_type.get(wt)
+                if type_pool is None:
+                    type_pool = self.by_type[wt] = TermPool()
+                type_pool.add(w)
+
+    def edited(self, snapshot, steps):
+        """A copy with ``steps`` (see DeckEditor) applied; only the touched pools are copied."""
+        new = DistractorIndex(())
+        new.all = self.all.copy()
+        new.by_type = dict(self.by_type)
+        new.by_lesson = dict(self.by_lesson)
+        fresh = {}  # pools this edit already copied, by id
+
+        def writable(pools, key):
+            pool = pools.get(key)
+            if pool is None or id(pool) not in fresh:
+                pool = pools[key] = pool.copy() if pool is not None else TermPool()
+                fresh[id(pool)] = pool
+            return pool
+
+        for step in steps:
+            kind = step[0]
+            if kind == 'insert_lesson':
+                new.by_lesson = {(i + 1 if i >= step[1] else i): pool for i, pool in new.by_lesson.items()}
+                writable(new.by_lesson, step[1])
+            elif kind == 'remove_lesson':
+                new.by_lesson = {(i - 1 if i > step[1] else i): pool
+                                 for i, pool in new.by_lesson.items() if i != step[1]}
+            else:
+                _, _, lesson_id, word = step
+                for pool in (new.all, writable(new.by_type, word.get('type', 'Other')),
+                             writable(new.by_lesson, lesson_id)):
+                    if kind == 'insert':
+                        pool.add(word)
+                    else:
+                        pool.remove(word)
+        return new
+
+
+def flat_words(snapshot=None):
+    """Every word in the deck as ``(lesson_id, word)``; the list index is the word id."""
+    def build(snap):
+        if isinstance(snap.lessons, WordTable):
+            return snap.lessons.flat()
+        return [(idx, w) for idx, lesson in enumerate(snap.lessons) for w in lesson.get('words', [])]
+
+    snapshot = snapshot or vocab_store.snapshot()
+    return snapshot.derived('words', build)
+
+
+def distractor_index(snapshot=None):
+    snapshot = snapshot or vocab_store.snapshot()
+    return snapshot.derived('distractors', lambda snap: DistractorIndex(enumerate(snap.lessons)))
+
+
+def practice_distractors(snapshot, lesson_ids):
+    """Distractor index for a practice session over ``lesson_ids``.
+
+    Lazily loaded decks draw distractors from the selected lessons only, so a
+    practice page never forces the whole deck into memory.
+    """
+    if isinstance(snapshot.lessons, CompiledDeck):
+        return DistractorIndex((idx, snapshot.lessons[idx]) for idx in lesson_ids)
+    return distractor_index(snapshot)
+
+
+LessonSummary = collections.namedtuple('LessonSummary', 'lesson_name word_count')
+
+
+def lesson_summaries(snapshot=None):
+    """Name and word count per lesson, without touching lazily loaded words."""
+    def build(snap):
+        lessons = snap.lessons
+        if isinstance(lessons, (CompiledDeck, WordTable)):
+            return [LessonSummary(name, lessons.word_count(i)) for i, name in enumerate(lessons.names)]
+        return [LessonSummary(l.get('lesson_name', ''), len(l.get('words', []))) for l in lessons]
+
+    snapshot = snapshot or vocab_store.snapshot()
+    return snapshot.derived('summaries', build)
+
+
+def lesson_offsets(snapshot=None):
+    """Word id of each lesson's first word, plus the total as a final entry."""
+    def build(snap):
+        offsets = [0]
+        for summary in lesson_summaries(snap):
+            offsets.append(offsets[-1] + summary.word_count)
+        return offsets
+
+    snapshot = snapshot or vocab_store.snapshot()
+    return snapshot.derived('offsets', build)
+
+
+def lesson_words(snapshot, idx):
+    """Words of lesson ``idx``, or ``None`` if there is no such lesson."""
+    lessons = snapshot.lessons
+    if not 0 <= idx < len(lessons):
+        return None
+    if isinstance(lessons, (CompiledDeck, WordTable)):
+        return lessons.words(idx)
+    return lessons[idx].get('words', [])
+
+
+class DeckStats:
+    __slots__ = ('total', 'by_type')
+
+    def __init__(self, total, by_type):
+        self.total = total
+        self.by_type = by_type
+
+    def edited(self, snapshot, steps):
+        by_type = dict(self.by_type)
+        total = self.total
+        for step in steps:
+            if step[0] in ('insert', 'remove'):
+                wt = step[3].get('type', 'Other')
+                delta = 1 if step[0] == 'insert' else -1
+                total += delta
+                by_type[wt] = by_type.get(wt, 0) + delta
+                if not by_type[wt]:
+                    del by_type[wt]
+        return DeckStats(total, by_type)
+
+
+def deck_stats(snapshot=None):
+    def build(snap):
+        if isinstance(snap.lessons, (CompiledDeck, WordTable)):
+            return DeckStats(snap.lessons.total_words, snap.lessons.type_counts())
+        by_type = {}
+        for _, w in flat_words(snap):
+            wt = w.get('type', 'Other')
+            by_type[wt] = by_type.get(wt, 0) + 1
+        return DeckStats(len(flat_words(snap)), by_type)
+
+    snapshot = snapshot or vocab_store.snapshot()
+    return snapshot.derived('stats', build)
+
+
+def iter_words(snapshot, start=0, stop=None):
+    """Yield words ``start:stop`` in deck order without building a new list.
+
+    Lessons entirely outside the range are skipped by their word count, so
+    lazily loaded decks only decode the lessons the page actually shows.
+    """
+    pos = 0
+    for idx, summary in enumerate(lesson_summaries(snapshot)):
+        if stop is not None and pos >= stop:
+            return
+        end = pos + summary.word_count
+        if end > start:
+            words = lesson_words(snapshot, idx)
+            yield from words[max(0, start - pos):None if stop is None else stop - pos]
+        pos = end
+
+# -------------------------------------------------------------------
+# Dictionary search (accent-folding inverted index)
+# -------------------------------------------------------------------
+_TOKEN_RE = re.compile(r'\w+')
+
+# (field, weight) - translations rank above matches in the notes
+SEARCH_FIELDS = (('spanish', 3), ('czech', 3), ('notes', 1))
+
+
+def fold(text):
+    """Lowercase and strip diacritics, so 'nemecko' matches 'Německo'."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class SearchIndex:
+    """Token prefix and trigram substring index over the searchable fields.
+
+    Postings hold entry ids rather than word ids, so an edit that shifts
+    word ids only touches ``eids`` (word id -> entry id) instead of every
+    posting set. Until the first edit both are the identity and ``eids`` is
+    None. Edited versions share the postings built here: words added since
+    are posted in ``added_tokens`` / ``added_trigrams`` and removed entries
+    are listed in ``removed``.
+    """
+
+    def __init__(self, words):
+        self.words = words
+        self.folded = []
+        self.tokens = {}
+        self.trigrams = {}
+        self.added_tokens = self.added_trigrams = None
+        self.removed = frozenset()
+        self.eids = None
+        self._wids = None
+        for eid, (_, w) in enumerate(words):
+            fields = self._fold(w)
+            self.folded.append(fields)
+            self._post(eid, fields)
+        self.sorted_tokens = sorted(self.tokens)
+
+    @staticmethod
+    def _fold(word):
+        return tuple(fold(word.get(name) or '') for name, _ in SEARCH_FIELDS)
+
+    @staticmethod
+    def _keys(fields):
+        tokens, grams = set(), set()
+        for text in fields:
+            tokens.update(_TOKEN_RE.findall(text))
+            grams.update(text[i:i + 3] for i in range(len(text) - 2))
+        return tokens, grams
+
+    def _post(self, eid, fields):
+        tokens, grams = self._keys(fields)
+        for tok in tokens:
+            self.tokens.setdefault(tok, set()).add(eid)
+        for gram in grams:
+            self.trigrams.setdefault(gram, set()).add(eid)
+
+    @staticmethod
+    def _postings(index, added, key):
+        ids = index.get(key)
+        extra = added.get(key) if added is not None else None
+        if extra:
+            return ids | extra if ids else extra
+        return ids
+
+    def _wid_of(self):
+        """Entry id -> word id (rebuilt once after an edit)."""
+        if self.eids is None:
+            return None
+        wids = self._wids
+        if wids is None:
+            wids = array.array(_U32, bytes(len(self.folded) * array.array(_U32).itemsize))
+            for wid, eid in enumerate(self.eids):
+                wids[eid] = wid
+            self._wids = wids
+        return wids
+
+    def edited(self, snapshot, steps):
+        """A copy with ``steps`` (see DeckEditor) applied, sharing this one's postings.
+
+        ``folded`` is shared too: entries are only appended, and a version
+        never looks at entry ids it did not post.
+        """
+        new = SearchIndex(())
+        new.words = flat_words(snapshot)
+        new.folded = self.folded
+        new.tokens, new.trigrams = self.tokens, self.trigrams
+        new.added_tokens = layered(self.added_tokens or {})
+        new.added_trigrams = layered(self.added_trigrams or {})
+        new.removed = set(self.removed)
+        new.eids = self.eids[:] if self.eids is not None else array.array(_U32, range(len(self.folded)))
+        new.sorted_tokens = self.sorted_tokens
+        for step in steps:
+            kind = step[0]
+            if kind == 'remove':
+                new.removed.add(new.eids.pop(step[1]))
+            elif kind == 'insert':
+                _, wid, _, word = step
+                eid = len(new.folded)
+                fields = self._fold(word)
+                new.folded.append(fields)
+                new.eids.insert(wid, eid)
+                tokens, grams = self._keys(fields)
+                for tok in tokens:
+                    if tok not in new.tokens and tok not in new.added_tokens:
+                        if new.sorted_tokens is self.sorted_tokens:
+                            new.sorted_tokens = self.sorted_tokens[:]
+                        bisect.insort(new.sorted_tokens, tok)
+                    new.added_tokens[tok] = new.added_tokens.get(tok, frozenset()) | {eid}
+                for gram in grams:
+                    new.added_trigrams[gram] = new.added_trigrams.get(gram, frozenset()) | {eid}
+        return new
+
+    def _prefix_matches(self, term):
+        ids = set()
+        i = bisect.bisect_left(self.sorted_tokens, term)
+        while i < len(self.sorted_tokens) and self.sorted_tokens[i].startswith(term):
+            ids.update(self._postings(self.tokens, self.added_tokens, self.sorted_tokens[i]) or ())
+            i += 1
+        return ids
+
+    def _substring_matches(self, term):
+        # Terms shorter than a trigram are only matched as token prefixes.
+        if len(term) < 3:
+            return set()
+        grams = []
+        for i in range(len(term) - 2):
+            ids = self._postings(self.trigrams, self.added_trigrams, term[i:i + 3])
+            if not ids:
+                return set()
+            grams.append(ids)
+        grams.sort(key=len)
+        candidates = grams[0].intersection(*grams[1:])
+        return {eid for eid in candidates if any(term in text for text in self.folded[eid])}
+
+    def _score(self, eid, query, terms):
+        score = 0
+        for text, (_, weight) in zip(self.folded[eid], SEARCH_FIELDS):
+            if not text:
+                continue
+            if text == query:
+                score += 100 * weight
+            elif text.startswith(query):
+                score += 40 * weight
+            tokens = _TOKEN_RE.findall(text)
+            for term in terms:
+                if any(tok.startswith(term) for tok in tokens):
+                    score += 10 * weight
+                elif term in text:
+                    score += 3 * weight
+        return score
+
+    def search(self, query, word_type=None, lesson_id=None, limit=50, offset=0, order=None):
+        """Return ``(total, [word_id, ...])`` for one page of ranked matches.
+
+        With a DifficultyOrder as ``order``, matches are ranked hardest first
+        instead of by relevance.
+        """
+        query = fold(query.strip())
+        terms = _TOKEN_RE.findall(query)
+
+        if terms:
+            matched = None
+            for term in terms:
+                ids = self._prefix_matches(term) | self._substring_matches(term)
+                matched = ids if matched is None else matched & ids
+                if not matched:
+                    break
+            if self.removed:
+                matched -= self.removed
+            wid_of = self._wid_of()
+            eid_of = {eid if wid_of is None else wid_of[eid]: eid for eid in matched}
+            matched = eid_of.keys()
+        else:
+            matched = range(len(self.words))
+
+        if word_type is not None or lesson_id is not None:
+            matched = [
+                wid for wid in matched
+                if (lesson_id is None or self.words[wid][0] == lesson_id)
+                and (word_type is None or self.words[wid][1].get('type', 'Other') == word_type)
+            ]
+
+        if order is not None:
+            ranked = order.ids if isinstance(matched, range) else sorted(matched, key=order.rank.__getitem__)
+        elif terms:
+            ranked = sorted(matched, key=lambda wid: (-self._score(eid_of[wid], query, terms), wid))
+        else:
+            ranked = list(matched)
+        return len(ranked), ranked[offset:offset + limit]
+
+
+def search_index(snapshot=None):
+    snapshot = snapshot or vocab_store.snapshot()
+    return snapshot.derived('search', lambda snap: SearchIndex(flat_words(snap)))
+
+
+# -------------------------------------------------------------------
+# Byte-bounded caches
+# -------------------------------------------------------------------
+class ByteLRU:
+    """LRU mapping bounded by the total size of its values in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, size=None):
+        size = len(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._items)
+
+
+# Pages and practice fragments whose output depends only on the vocabulary
+# version (and the request arguments in the key) are rendered once and reused. Keys always
+# include the version, so stale entries simply age out of the LRU.
+PAGE_CACHE_BYTES = 16 * 1024 * 1024
+page_cache = ByteLRU(PAGE_CACHE_BYTES)
+
+
+def _text_size(value):
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    return sys.getsizeof(value) + sum(_text_size(v) for v in value)
+
+
+def cached_page(key, render):
+    value = page_cache.get(key)
+    if value is None:
+        with metrics.timer('page_render_seconds', page=key[0]):
+            value = render()
+        page_cache.put(key, value, _text_size(value))
+    return value
+
+
+# -------------------------------------------------------------------
+# Question generation
+# -------------------------------------------------------------------
+# Weighted session sampling: per-lesson weights are capped, and a word
+# answered wrongly before weighs 1 + MISSED_WORD_WEIGHT per miss (up to
+# MISSED_WORD_MAX_MISSES misses). Favoring hard words weighs each answered
+# word 1 + DIFFICULTY_WEIGHT * its difficulty score.
+MAX_SESSION_SIZE = 1000
+MAX_LESSON_WEIGHT = 1000.0
+MISSED_WORD_WEIGHT = 2.0
+MISSED_WORD_MAX_MISSES = 3
+DIFFICULTY_WEIGHT = 4.0
+# Distractor draws kept per word and direction (see practice_fragments).
+PRACTICE_VARIANTS = 8
+
+DIRECTIONS = {
+    'es-cz': ('spanish', 'czech'),
+    'cz-es': ('czech', 'spanish'),
+}
+
+
+def sample_distinct(pool, k, exclude=(), rng=random):
+    """Draw up to ``k`` distinct terms from ``pool`` that are not in ``exclude``.
+
+    Uses random probing, so the cost depends on ``k`` rather than on the size
+    of the pool; only small or heavily excluded pools fall back to a scan.
+    """
+    picked = []
+    if not pool or k <= 0:
+        return picked
+    seen = set(exclude)
+    for _ in range(4 * k + 8):
+        term = pool[rng.randrange(len(pool))]
+        if term not in seen:
+            seen.add(term)
+            picked.append(term)
+            if len(picked) == k:
+                return picked
+    rest = [t for t in pool if t not in seen]
+    picked.extend(rng.sample(rest, min(k - len(picked), len(rest))))
+    return picked
+
+
+def build_question(word, index, direction=None, choices=4, rng=random):
+    direction = direction or rng.choice(('es-cz', 'cz-es'))
+    prompt_lang, answer_lang = DIRECTIONS[direction]
+    answer = word[answer_lang]
+
+    # Prefer distractors of the same type (nouns for nouns, phrases for
+    # phrases...), topping up from the whole deck when the bucket is small.
+    wanted = choices - 1
+    bucket = index.by_type.get(word.get('type', 'Other'), index.all)
+    options = sample_distinct(bucket.terms(answer_lang), wanted, (answer,), rng)
+    if len(options) < wanted:
+        options += sample_distinct(index.all.terms(answer_lang), wanted - len(options),
+                                   [answer] + options, rng)
+    options.append(answer)
+    rng.shuffle(options)
+
+    return {
+        "direction": direction,
+        "prompt": word[prompt_lang],
+        "answer": answer,
+        "options": options,
+    }
+
+
+def encode_question(question):
+    return json.dumps(question, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def practice_fragments(snapshot, idx):
+    """Pre-serialized questions for lesson ``idx``: a tuple of alternatives per word.
+
+    Built once per vocabulary version, so a practice session is assembled
+    by picking and joining byte strings rather than by building and
+    encoding dicts on every request. Each word has both directions, each
+    with PRACTICE_VARIANTS independent draws of distractors; sessions pick
+    one alternative per question, so a word does not always come with the
+    same wrong answers.
+    """
+    def build():
+        offsets = lesson_offsets(snapshot)
+        index = practice_distractors(snapshot, [idx])
+        rng = random.Random('%d:%d' % (snapshot.version, idx))
+        return [
+            tuple(encode_question(dict(build_question(w, index, direction, rng=rng), word_id=wid))
+                  for direction in DIRECTIONS for _ in range(PRACTICE_VARIANTS))
+            for wid, w in enumerate(lesson_words(snapshot, idx), offsets[idx])
+        ]
+
+    return cached_page(('practice-fragments', snapshot.version, idx), build)
+
+
+def session_json(fragments, **fields):
+    """A practice session body: ``fields`` plus the already-encoded questions."""
+    head = json.dumps(dict(fields, questions=None), separators=(',', ':'))
+    head = head[:head.rindex('null')].encode('utf-8')
+    return b''.join((head, b'[', b','.join(fragments), b']}'))
+
+
+class AliasTable:
+    """Vose's alias method: O(n) to build, then O(1) per weighted draw."""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if not n or total <= 0:
+            raise ValueError('need at least one positive weight')
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s], self.alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def draw(self, rng=random):
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+def sample_words(lessons, size, rng=random, boosts=None):
+    """Draw up to ``size`` distinct ``(lesson_id, position)`` pairs, weighted.
+
+    ``lessons`` is ``[(lesson_id, word_count, weight), ...]``. A word's
+    chance is its lesson's weight times its own, which is 1 plus
+    ``boosts[lesson_id][position]`` if given. Small samples pick a lesson from
+    an alias table and then a word in it, rejecting repeats: O(size) after
+    O(len(lessons)) setup, without touching the words themselves. Samples of
+    more than half the selection (or very skewed weights) fall back to
+    weighted reservoir sampling over every word.
+    """
+    boosts = boosts or {}
+    parts = []
+    for lesson_id, count, weight in lessons:
+        extra = boosts.get(lesson_id, {})
+        extra_total = sum(extra.values())
+        if count and weight > 0:
+            boosted = sorted(extra)
+            cumulative = list(itertools.accumulate(extra[pos] for pos in boosted))
+            parts.append((lesson_id, count, weight, extra, extra_total, boosted, cumulative))
+    total = sum(part[1] for part in parts)
+    size = min(size, total)
+    if not size:
+        return []
+
+    if size * 2 <= total:
+        table = AliasTable([weight * (count + extra_total)
+                            for _, count, weight, _, extra_total, _, _ in parts])
+        picked, seen = [], set()
+        for _ in range(20 * size):
+            lesson_id, count, _, _, extra_total, boosted, cumulative = parts[table.draw(rng)]
+            r = rng.random() * (count + extra_total)
+            if r < count:
+                pos = int(r)
+            else:
+                pos = boosted[min(bisect.bisect_right(cumulative, r - count), len(boosted) - 1)]
+            if (lesson_id, pos) not in seen:
+                seen.add((lesson_id, pos))
+                picked.append((lesson_id, pos))
+                if len(picked) == size:
+                    return picked
+
+    # Efraimidis-Spirakis: keep the ``size`` largest u ** (1 / weight).
+    keyed = ((rng.random() ** (1.0 / (weight * (1 + extra.get(pos, 0)))), lesson_id, pos)
+             for lesson_id, count, weight, extra, _, _, _ in parts
+             for pos in range(count))
+    return [(lesson_id, pos) for _, lesson_id, pos in heapq.nlargest(size, keyed)]
+
+
+def missed_word_boosts(snapshot, user_id):
+    """Per-lesson ``{position: extra weight}`` for words the user got wrong before."""
+    lookup = card_lookup(snapshot)
+    offsets = lesson_offsets(snapshot)
+    boosts = collections.defaultdict(dict)
+    for key, misses in db_store('answer_log').missed(user_id).items():
+        wid = lookup.get(key)
+        if wid is not None:
+            idx = bisect.bisect_right(offsets, wid) - 1
+            boosts[idx][wid - offsets[idx]] = MISSED_WORD_WEIGHT * min(misses, MISSED_WORD_MAX_MISSES)
+    return boosts
+
+
+def difficulty_boosts(snapshot, lesson_ids):
+    """Per-lesson ``{position: extra weight}`` for words people often get wrong."""
+    table = db_store('difficulty_stats').table(snapshot)
+    offsets = lesson_offsets(snapshot)
+    boosts = {}
+    for idx in lesson_ids:
+        first = offsets[idx]
+        boosts[idx] = {wid - first: DIFFICULTY_WEIGHT * table.difficulty[wid]
+                       for wid in range(first, offsets[idx + 1]) if wid in table.attempted}
+    return boosts
+
+
+def parse_lesson_weights(values):
+    """``['3:2.5', ...]`` (lesson id, weight) into a dict; bad entries are ignored."""
+    weights = {}
+    for value in values:
+        idx, _, weight = value.partition(':')
+        try:
+            weights[int(idx)] = min(max(0.0, float(weight)), MAX_LESSON_WEIGHT)
+        except ValueError:
+            continue
+    return weights
+
+
+# -------------------------------------------------------------------
+# Typed answers (fuzzy grading)
+# -------------------------------------------------------------------
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_PAREN_RE = re.compile(r'\([^)]*\)')
+_ALTERNATES_RE = re.compile(r'[/;]')
+MAX_TYPED_LENGTH = 64
+
+
+def normalize_answer(text, keep_accents=False):
+    """Case-fold, drop punctuation and collapse whitespace (and accents, by default)."""
+    text = text.casefold() if keep_accents else fold(text)
+    return ' '.join(_PUNCT_RE.sub(' ', text).split())
+
+
+def accepted_forms(answer, keep_accents=False):
+    """``answer`` plus its '/'- or ';'-separated alternates, with and without parentheticals."""
+    forms = set()
+    for part in _ALTERNATES_RE.split(answer):
+        for variant in (part, _PAREN_RE.sub(' ', part)):
+            form = normalize_answer(variant, keep_accents)
+            if form:
+                forms.add(form)
+    return forms
+
+
+def typo_budget(form):
+    """Edits tolerated for an answer of this length."""
+    return 0 if len(form) <= 3 else 1 if len(form) <= 7 else 2
+
+
+def bounded_distance(a, b, limit):
+    """Optimal-string-alignment (Damerau) distance, capped at ``limit + 1``.
+
+    Stops as soon as a whole row exceeds ``limit``, so comparing against a
+    clearly different word costs a row or two, not the full matrix.
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        ca = a[i - 1]
+        for j in range(1, len(b) + 1):
+            cb = b[j - 1]
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return min(prev[-1], limit + 1)
+
+
+class TypoIndex:
+    """Deck terms within one edit of a typed string.
+
+    A symmetric-delete index: every term is stored under itself and each
+    single-character deletion of it, so a lookup is ``len(text) + 1`` dict
+    probes plus a bounded distance check per candidate. That stays well
+    under a millisecond on 100k-term decks, where walking a BK-tree would
+    still visit thousands of nodes.
+
+    Terms are only ever added: GradingIndex versions created by edits share
+    one TypoIndex and ignore terms their deck no longer has.
+    """
+
+    def __init__(self, terms):
+        self.terms = []
+        self.forms = []
+        self._index = {}
+        for term in terms:
+            self.add(term)
+
+    def add(self, term):
+        # Stored before it is indexed, so a concurrent lookup never finds a
+        # tid without its term.
+        tid = len(self.terms)
+        form = normalize_answer(term)
+        self.forms.append(form)
+        self.terms.append(term)
+        for key in self._deletes(form):
+            hit = self._index.get(key)
+            if hit is None:
+                self._index[key] = tid
+            elif isinstance(hit, int):
+                if hit != tid:
+                    self._index[key] = [hit, tid]
+            elif hit[-1] != tid:
+                hit.append(tid)
+
+    @staticmethod
+    def _deletes(form):
+        yield form
+        for i in range(len(form)):
+            yield form[:i] + form[i + 1:]
+
+    def lookup(self, text, max_distance=1):
+        """Return ``[(distance, term), ...]``, closest first."""
+        form = normalize_answer(text[:MAX_TYPED_LENGTH])
+        found = {}
+        for key in set(self._deletes(form)):
+            hit = self._index.get(key)
+            for tid in (hit,) if isinstance(hit, int) else hit or ():
+                if tid not in found:
+                    found[tid] = bounded_distance(form, self.forms[tid], max_distance)
+        return sorted({(d, self.terms[tid]) for tid, d in found.items() if d <= max_distance})
+
+
+class GradingIndex:
+    """Per-version data for grading typed answers."""
+
+    def __init__(self, words):
+        # term -> translations in the other language, in deck order
+        self.translations = {'spanish': {}, 'czech': {}}
+        # (spanish, czech) -> how many more words repeat that pair
+        self.duplicates = {}
+        spanish, czech = self.translations['spanish'], self.translations['czech']
+        for _, w in words:
+            es, cz = w['spanish'], w['czech']
+            targets = spanish.setdefault(es, [])
+            if cz in targets:
+                self.duplicates[es, cz] = self.duplicates.get((es, cz), 0) + 1
+                continue
+            targets.append(cz)
+            czech.setdefault(cz, []).append(es)
+        self.typos = {lang: TypoIndex(terms) for lang, terms in self.translations.items()}
+
+    def edited(self, snapshot, steps):
+        """A copy with ``steps`` (see DeckEditor) applied, sharing the typo indexes."""
+        new = GradingIndex(())
+        new.translations = {lang: layered(terms) for lang, terms in self.translations.items()}
+        new.duplicates = dict(self.duplicates)
+        new.typos = self.typos
+        for step in steps:
+            if step[0] not in ('insert', 'remove'):
+                continue
+            word = step[3]
+            pair = (word['spanish'], word['czech'])
+            known = pair[1] in new.translations['spanish'].get(pair[0], ())
+            if step[0] == 'insert' and known:
+                new.duplicates[pair] = new.duplicates.get(pair, 0) + 1
+                continue
+            if step[0] == 'remove' and new.duplicates.get(pair):
+                new.duplicates[pair] -= 1
+                if not new.duplicates[pair]:
+                    del new.duplicates[pair]
+                continue
+            for lang, term, other in (('spanish',) + pair, ('czech',) + pair[::-1]):
+                terms = new.translations[lang]
+                targets = terms.get(term)
+                # Lists are replaced, never changed, since older versions share them.
+                if step[0] == 'insert':
+                    if targets is None:
+                        new.typos[lang].add(term)
+                    terms[term] = (targets or []) + [other]
+                elif known:
+                    targets = [t for t in targets if t != other]
+                    if targets:
+                        terms[term] = targets
+                    else:
+                        del terms[term]
+        return new
+
+    def grade(self, word, direction, text, final=True):
+        prompt_lang, answer_lang = DIRECTIONS[direction]
+        text = text[:MAX_TYPED_LENGTH]
+        typed = normalize_answer(text)
+        # Any translation the deck gives for this prompt is accepted.
+        answers = self.translations[prompt_lang].get(word[prompt_lang]) or [word[answer_lang]]
+        forms = set().union(*(accepted_forms(a) for a in answers))
+
+        distance, best = None, None
+        for form in forms:
+            d = bounded_distance(typed, form, typo_budget(form))
+            if d <= typo_budget(form) and (distance is None or d < distance):
+                distance, best = d, form
+        result = {
+            "verdict": "wrong" if best is None else "correct" if distance == 0 else "typo",
+            "distance": distance,
+            "on_track": bool(typed) and any(form.startswith(typed) for form in forms),
+        }
+        if distance == 0:
+            strict = set().union(*(accepted_forms(a, keep_accents=True) for a in answers))
+            result["accents"] = normalize_answer(text, keep_accents=True) not in strict
+        if final:
+            result["expected"] = word[answer_lang]
+            if best is None:
+                # The typo index may still hold terms that edits removed.
+                live = [term for _, term in self.typos[answer_lang].lookup(text)
+                        if term in self.translations[answer_lang]]
+                result["did_you_mean"] = [
+                    {"term": term, "means": self.translations[answer_lang][term]}
+                    for term in live[:3]
+                    if normalize_answer(term) not in forms
+                ]
+        return result
+
+
+def grading_index(snapshot=None):
+    snapshot = snapshot or vocab_store.snapshot()
+    return snapshot.derived('grading', lambda snap: GradingIndex(flat_words(snap)))
+
+
+# -------------------------------------------------------------------
+# Progress tracking (completed lessons per user)
+# -------------------------------------------------------------------
+class ProgressStore:
+    """Where completed lessons are kept. Lesson ids are ints."""
+
+    def completed(self, user_id):
+        """Return the user's completed lesson ids as a set."""
+        raise NotImplementedError
+
+    def mark(self, user_id, lesson_id, done=True):
+        raise NotImplementedError
+
+    def reset(self, user_id):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+
+class MemoryProgressStore(ProgressStore):
+    """Process-local progress; for development and tests."""
+
+    def __init__(self):
+        self._users = collections.defaultdict(set)
+        self._lock = threading.Lock()
+
+    def completed(self, user_id):
+        with self._lock:
+            return set(self._users.get(user_id, ()))
+
+    def mark(self, user_id, lesson_id, done=True):
+        with self._lock:
+            if done:
+                self._users[user_id].add(lesson_id)
+            else:
+                self._users[user_id].discard(lesson_id)
+
+    def reset(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+
+class SQLiteConnections:
+    """One SQLite connection per thread (and per process after a fork)."""
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            import sqlite3
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(self.schema)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+
+class SQLiteProgressStore(ProgressStore):
+    """Progress in a SQLite database in WAL mode, with coalesced writes.
+
+    Changes go into an in-memory overlay and a background thread commits
+    them in one transaction every ``flush_interval`` seconds (sooner once
+    ``max_pending`` users are waiting). Repeated toggles of the same lesson
+    collapse into a single row change. Reads merge the overlay over the
+    database, so a user always sees their own writes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS completed_lessons (
+            user_id TEXT NOT NULL,
+            lesson_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, lesson_id)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path, flush_interval=0.5, max_pending=500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._conns = SQLiteConnections(path, self.SCHEMA)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # user_id -> [reset_first, {lesson_id: done}]
+        self._pending = {}
+        self._flushing = {}
+        self._wake = threading.Event()
+        self._writer_pid = None
+        atexit.register(self.flush)
+
+    def _ensure_writer(self):
+        # Started lazily (and again after a fork) so importing the module
+        # or running a CLI command never spawns threads.
+        if self._writer_pid != os.getpid():
+            self._writer_pid = os.getpid()
+            threading.Thread(target=self._writer, name='progress-writer', daemon=True).start()
+
+    def _writer(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _change(self, user_id):
+        entry = self._pending.get(user_id)
+        if entry is None:
+            entry = self._pending[user_id] = [False, {}]
+        return entry
+
+    def mark(self, user_id, lesson_id, done=True):
+        with self._lock:
+            self._change(user_id)[1][lesson_id] = done
+            backlog = len(self._pending)
+        self._ensure_writer()
+        if backlog >= self.max_pending:
+            self._wake.set()
+
+    def reset(self, user_id):
+        with self._lock:
+            self._pending[user_id] = [True, {}]
+        self._ensure_writer()
+
+    def completed(self, user_id):
+        with self._lock:
+            overlays = [layer[user_id] for layer in (self._flushing, self._pending) if user_id in layer]
+            overlays = [(reset, dict(changes)) for reset, changes in overlays]
+        resets = [i for i, (reset, _) in enumerate(overlays) if reset]
+        if resets:
+            done = set()
+            overlays = overlays[resets[-1]:]
+        else:
+            rows = self._conns.get().execute(
+                'SELECT lesson_id FROM completed_lessons WHERE user_id = ?', (user_id,))
+            done = {row[0] for row in rows}
+        for _, changes in overlays:
+            for lesson_id, is_done in changes.items():
+                if is_done:
+                    done.add(lesson_id)
+                else:
+                    done.discard(lesson_id)
+        return done
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                self._flushing, self._pending = self._pending, {}
+            batch = self._flushing
+            resets = [(user_id,) for user_id, (reset, _) in batch.items() if reset]
+            added, removed = [], []
+            for user_id, (_, changes) in batch.items():
+                for lesson_id, done in changes.items():
+                    (added if done else removed).append((user_id, lesson_id))
+            import sqlite3
+            try:
+                conn = self._conns.get()
+                with conn:
+                    conn.executemany('DELETE FROM completed_lessons WHERE user_id = ?', resets)
+                    conn.executemany('INSERT OR IGNORE INTO completed_lessons VALUES (?, ?)', added)
+                    conn.executemany(
+                        'DELETE FROM completed_lessons WHERE user_id = ? AND lesson_id = ?', removed)
+            except sqlite3.Error as e:
+                print('Warning: saving progress to %s failed, will retry: %s' % (self.path, e),
+                      file=sys.stderr)
+                with self._lock:
+                    self._pending = self._merged(batch, self._pending)
+                    self._flushing = {}
+                return
+            with self._lock:
+                self._flushing = {}
+
+    @staticmethod
+    def _merged(older, newer):
+        """Pending changes ``older`` followed by ``newer``, as one layer."""
+        merged = {}
+        for user_id, (reset, changes) in older.items():
+            merged[user_id] = [reset, dict(changes)]
+        for user_id, (reset, changes) in newer.items():
+            entry = merged.get(user_id)
+            if entry is None or reset:
+                merged[user_id] = [reset, changes]
+            else:
+                entry[1].update(changes)
+        return merged
+
+
+
+# -------------------------------------------------------------------
+# Spaced repetition (SM-2 with a per-user due index)
+# -------------------------------------------------------------------
+REVIEW_SESSION_SIZE = 20
+REVIEW_NEW_PER_SESSION = 10
+DAY = 86400.0
+
+
+def card_key(word):
+    """Stable identity of a word across deck versions."""
+    return '%s\t%s' % (word['spanish'], word['czech'])
+
+
+class CardLookup(collections.abc.Mapping):
+    """Card key -> word id of the last word with that key.
+
+    Like SearchIndex, keys map to entry ids, and ``eids`` (word id -> entry
+    id) absorbs the shift of word ids on an edit, so edits never touch the
+    keys of words they did not change. Until the first edit entry ids are
+    word ids and ``eids`` is None; after it the entry -> word id map is
+    rebuilt once, on first lookup. An entry is an int, or a tuple of them
+    for a key more than one word has.
+    """
+    __slots__ = ('entries', 'eids', 'next_eid', '_wids')
+
+    def __init__(self, words):
+        entries = self.entries = {}
+        for wid, (_, w) in enumerate(words):
+            key = card_key(w)
+            eids = entries.get(key)
+            entries[key] = wid if eids is None else self._with(eids, wid)
+        self.eids = None
+        self.next_eid = len(words)
+        self._wids = None
+
+    @staticmethod
+    def _with(eids, eid):
+        return (eids if isinstance(eids, tuple) else (eids,)) + (eid,)
+
+    @staticmethod
+    def _without(eids, eid):
+        rest = tuple(e for e in eids if e != eid) if isinstance(eids, tuple) else ()
+        return rest[0] if len(rest) == 1 else rest or None
+
+    def _wid_of(self):
+        if self.eids is None:
+            return None
+        wids = self._wids
+        if wids is None:
+            wids = array.array(_U32, bytes(self.next_eid * array.array(_U32).itemsize))
+            for wid, eid in enumerate(self.eids):
+                wids[eid] = wid
+            self._wids = wids
+        return wids
+
+    def __getitem__(self, key):
+        eids = self.entries[key]
+        wid_of = self._wid_of()
+        if not isinstance(eids, tuple):
+            return eids if wid_of is None else wid_of[eids]
+        return max(eids if wid_of is None else (wid_of[eid] for eid in eids))
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def edited(self, snapshot, steps):
+        """A copy with ``steps`` (see DeckEditor) applied, sharing this one's keys."""
+        new = CardLookup(())
+        new.entries = layered(self.entries)
+        new.eids = self.eids[:] if self.eids is not None else array.array(_U32, range(self.next_eid))
+        new.next_eid = self.next_eid
+        for step in steps:
+            kind = step[0]
+            if kind == 'remove':
+                key = card_key(step[3])
+                rest = self._without(new.entries[key], new.eids.pop(step[1]))
+                if rest is None:
+                    del new.entries[key]
+                else:
+                    new.entries[key] = rest
+            elif kind == 'insert':
+                key = card_key(step[3])
+                eids = new.entries.get(key)
+                new.entries[key] = new.next_eid if eids is None else self._with(eids, new.next_eid)
+                new.eids.insert(step[1], new.next_eid)
+                new.next_eid += 1
+        return new
+
+
+def card_lookup(snapshot=None):
+    """Map card keys to word ids (a CardLookup)."""
+    snapshot = snapshot or vocab_store.snapshot()
+    return snapshot.derived('cards', lambda snap: CardLookup(flat_words(snap)))
+
+
+def sm2(reps, interval, ease, quality):
+    """One SM-2 step. ``quality`` is 0-5; returns (reps, interval_days, ease)."""
+    if quality < 3:
+        reps, interval = 0, 1.0
+    else:
+        reps += 1
+        if reps == 1:
+            interval = 1.0
+        elif reps == 2:
+            interval = 6.0
+        else:
+            interval = round(interval * ease)
+    ease = max(1.3, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return reps, interval, ease
+
+
+class ReviewScheduler:
+    """Per-user card state in SQLite.
+
+    ``(user_id, due)`` is indexed, so fetching the next k due cards is an
+    index range scan (O(log n + k)) however many cards a user has. New
+    cards are introduced in deck order from a per-user cursor, so finding
+    them never scans the cards a user has already seen. The cursor is the
+    last card passed, by key and position, so edits that move words do not
+    make it skip or repeat any; it only moves when a card is answered.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS review_cards (
+            user_id TEXT NOT NULL,
+            card_key TEXT NOT NULL,
+            due REAL NOT NULL,
+            interval REAL NOT NULL,
+            ease REAL NOT NULL,
+            reps INTEGER NOT NULL,
+            lapses INTEGER NOT NULL,
+            PRIMARY KEY (user_id, card_key)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS review_cards_due ON review_cards (user_id, due);
+        DROP TABLE IF EXISTS review_users;
+        CREATE TABLE IF NOT EXISTS review_cursors (
+            user_id TEXT PRIMARY KEY,
+            card_key TEXT NOT NULL,
+            position INTEGER NOT NULL
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path):
+        self._conns = SQLiteConnections(path, self.SCHEMA)
+
+    def due(self, user_id, snapshot, limit=REVIEW_SESSION_SIZE,
+            new_limit=REVIEW_NEW_PER_SESSION, now=None):
+        """Return up to ``limit`` ``(word_id, word)`` pairs: due cards first, then new ones.
+
+        Fetching a session does not use anything up: new cards stay new
+        until ``grade()`` records an answer for them.
+        """
+        now = time.time() if now is None else now
+        conn = self._conns.get()
+        cards = card_lookup(snapshot)
+        words, stale = [], []
+        rows = conn.execute(
+            'SELECT card_key FROM review_cards WHERE user_id = ? AND due <= ? ORDER BY due LIMIT ?',
+            (user_id, now, limit))
+        for (key,) in rows:
+            wid = cards.get(key)
+            if wid is None:
+                stale.append((user_id, key))
+            else:
+                words.append((wid, flat_words(snapshot)[wid][1]))
+        if stale:
+            # Words removed from the deck; drop them so they stop taking slots.
+            with conn:
+                conn.executemany('DELETE FROM review_cards WHERE user_id = ? AND card_key = ?', stale)
+
+        wanted = min(limit - len(words), new_limit)
+        if wanted > 0:
+            start = self._cursor(conn, user_id, snapshot)
+            words.extend(itertools.islice(self._new_cards(conn, user_id, snapshot, start), wanted))
+        return words
+
+    def _cursor(self, conn, user_id, snapshot):
+        """Word id of the first card after the user's cursor."""
+        row = conn.execute('SELECT card_key, position FROM review_cursors WHERE user_id = ?',
+                           (user_id,)).fetchone()
+        if row is None:
+            return 0
+        key, position = row
+        words = flat_words(snapshot)
+        if position < len(words) and card_key(words[position][1]) == key:
+            return position + 1
+        # The deck was edited under the cursor: find the card by its key.
+        wid = card_lookup(snapshot).get(key)
+        return 0 if wid is None else wid + 1
+
+    def _new_cards(self, conn, user_id, snapshot, start, batch_size=REVIEW_NEW_PER_SESSION):
+        """Yield ``(word_id, word)`` for unseen cards from ``start`` on, in deck order."""
+        total = deck_stats(snapshot).total
+        seen = set()
+        while start < total:
+            batch = list(iter_words(snapshot, start, start + batch_size))
+            keys = [card_key(w) for w in batch]
+            known = {k for (k,) in conn.execute(
+                'SELECT card_key FROM review_cards WHERE user_id = ? AND card_key IN (%s)'
+                % ','.join('?' * len(keys)), [user_id] + keys)}
+            for offset, (key, word) in enumerate(zip(keys, batch)):
+                if key not in known and key not in seen:
+                    seen.add(key)
+                    yield start + offset, word
+            start += len(batch)
+
+    def grade(self, user_id, key, quality, snapshot=None, now=None):
+        now = time.time() if now is None else now
+        conn = self._conns.get()
+        row = conn.execute(
+            'SELECT interval, ease, reps, lapses FROM review_cards WHERE user_id = ? AND card_key = ?',
+            (user_id, key)).fetchone()
+        interval, ease, reps, lapses = row if row else (0.0, 2.5, 0, 0)
+        reps, interval, ease = sm2(reps, interval, ease, quality)
+        if quality < 3:
+            lapses += 1
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO review_cards VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (user_id, key, now + interval * DAY, interval, ease, reps, lapses))
+            if row is None:
+                self._advance(conn, user_id, snapshot or vocab_store.snapshot())
+        return now + interval * DAY
+
+    def _advance(self, conn, user_id, snapshot):
+        # Move the cursor over the cards answered since it last moved; a new
+        # card answered out of order is passed once the ones before it are.
+        start = self._cursor(conn, user_id, snapshot)
+        nxt = next(self._new_cards(conn, user_id, snapshot, start), None)
+        last = (nxt[0] if nxt is not None else deck_stats(snapshot).total) - 1
+        if last >= start:
+            word = flat_words(snapshot)[last][1]
+            conn.execute('INSERT OR REPLACE INTO review_cursors VALUES (?, ?, ?)',
+                         (user_id, card_key(word), last))
+
+    def due_count(self, user_id, now=None):
+        now = time.time() if now is None else now
+        return self._conns.get().execute(
+            'SELECT COUNT(*) FROM review_cards WHERE user_id = ? AND due <= ?', (user_id, now)).fetchone()[0]
+
+
+
+# -------------------------------------------------------------------
+# Answer events (write-behind log)
+# -------------------------------------------------------------------
+ANSWER_QUEUE_SIZE = 10000
+ANSWER_BATCH_SIZE = 500
+ANSWER_MAX_LATENCY_MS = 10 * 60 * 1000
+MISSED_CARDS_LIMIT = 1000
+
+
+class AnswerLog:
+    """Per-answer events, persisted in bulk by a background writer.
+
+    ``submit()`` only enqueues, so request latency does not depend on the
+    database. The queue is bounded: once it is full further events are
+    refused and counted as dropped, and the API tells the client to retry
+    later. ``close()`` (run at exit) stops the writer and drains whatever
+    is still queued.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS answer_events (
+            id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            ts REAL NOT NULL,
+            version INTEGER NOT NULL,
+            word_id INTEGER NOT NULL,
+            card_key TEXT,
+            direction TEXT NOT NULL,
+            correct INTEGER NOT NULL,
+            latency_ms INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS answer_events_missed ON answer_events (user_id, card_key)
+            WHERE correct = 0;
+    """
+
+    def __init__(self, path, max_queue=ANSWER_QUEUE_SIZE, batch_size=ANSWER_BATCH_SIZE,
+                 flush_interval=1.0):
+        self._conns = SQLiteConnections(path, self.SCHEMA)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.counters = {'accepted': 0, 'dropped': 0, 'written': 0, 'batches': 0, 'errors': 0}
+        self._counter_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer_thread = None
+        self._writer_pid = None
+        atexit.register(self.close)
+
+    def _count(self, name, n=1):
+        with self._counter_lock:
+            self.counters[name] += n
+
+    def stats(self):
+        with self._counter_lock:
+            return dict(self.counters, queued=self._queue.qsize())
+
+    def submit(self, rows):
+        """Enqueue event rows; returns how many were accepted (a prefix)."""
+        self._ensure_writer()
+        accepted = 0
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                break
+            accepted += 1
+        self._count('accepted', accepted)
+        if accepted < len(rows):
+            self._count('dropped', len(rows) - accepted)
+        return accepted
+
+    def _ensure_writer(self):
+        if self._writer_pid != os.getpid():
+            self._writer_pid = os.getpid()
+            self._writer_thread = threading.Thread(target=self._writer, name='answer-writer', daemon=True)
+            self._writer_thread.start()
+
+    def _drain(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows):
+        if not rows:
+            return
+        import sqlite3
+        with self._write_lock:
+            conn = self._conns.get()
+            try:
+                with conn:
+                    conn.executemany(
+                        'INSERT INTO answer_events (user_id, ts, version, word_id, card_key, '
+                        'direction, correct, latency_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            except sqlite3.Error:
+                self._count('errors')
+                self._count('dropped', len(rows))
+                return
+        self._count('written', len(rows))
+        self._count('batches')
+
+    def _writer(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._write([first] + self._drain(self.batch_size - 1))
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        while True:
+            rows = self._drain(self.batch_size)
+            if not rows:
+                return
+            self._write(rows)
+
+    def missed(self, user_id, limit=MISSED_CARDS_LIMIT):
+        """``{card_key: wrong answers}`` for the user's most-missed cards."""
+        rows = self._conns.get().execute(
+            'SELECT card_key, COUNT(*) AS misses FROM answer_events'
+            ' WHERE user_id = ? AND correct = 0 AND card_key IS NOT NULL'
+            ' GROUP BY card_key ORDER BY misses DESC LIMIT ?', (user_id, limit))
+        return dict(rows)
+
+    def close(self):
+        self._stop.set()
+        if self._writer_thread is not None and self._writer_pid == os.getpid():
+            self._writer_thread.join(self.flush_interval + 5)
+        self.flush()
+
+
+
+def parse_answer_events(payload, user_id, snapshot, now):
+    """Validate an /api/answers payload into rows for the answer log.
+
+    Returns ``(rows, error)``. Card keys are resolved only when the client's
+    deck version is the one being served, since word ids can shift between
+    versions.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('events'), list):
+        return None, 'expected {"version": ..., "events": [...]}'
+    events = payload['events']
+    if len(events) > ANSWER_BATCH_SIZE:
+        return None, 'at most %d events per request' % ANSWER_BATCH_SIZE
+    version = payload.get('version')
+    words = flat_words(snapshot) if version == snapshot.version else None
+    rows = []
+    for ev in events:
+        if not isinstance(ev, dict):
+            return None, 'events must be objects'
+        wid, direction = ev.get('word_id'), ev.get('direction')
+        latency = ev.get('latency_ms')
+        if (not isinstance(wid, int) or wid < 0 or direction not in DIRECTIONS
+                or not isinstance(ev.get('correct'), bool)
+                or not isinstance(latency, (int, float)) or latency < 0):
+            return None, 'invalid event: %r' % (ev,)
+        key = card_key(words[wid][1]) if words is not None and wid < len(words) else None
+        rows.append((user_id, now, version if isinstance(version, int) else -1, wid, key,
+                     direction, int(ev['correct']), int(min(latency, ANSWER_MAX_LATENCY_MS))))
+    return rows, None
+
+
+# -------------------------------------------------------------------
+# Word difficulty (answer aggregates, folded in incrementally)
+# -------------------------------------------------------------------
+# Error rates decay with this half-life, so words someone has since learned
+# stop counting as hard. Scores are smoothed towards DIFFICULTY_PRIOR_RATE
+# as if each word had DIFFICULTY_PRIOR_ATTEMPTS extra answers.
+DIFFICULTY_HALF_LIFE = float(os.environ.get('DUOVOCAB_DIFFICULTY_HALF_LIFE_DAYS', '14')) * DAY
+DIFFICULTY_PRIOR_RATE = 0.2
+DIFFICULTY_PRIOR_ATTEMPTS = 2.0
+DIFFICULTY_REFRESH_INTERVAL = 2.0
+DIFFICULTY_CHECKPOINT_INTERVAL = 60.0
+DIFFICULTY_FOLD_BATCH = 10000
+DIRECTION_SLOTS = {direction: i for i, direction in enumerate(DIRECTIONS)}
+
+
+def decay(dt, half_life=DIFFICULTY_HALF_LIFE):
+    return 0.5 ** (max(0.0, dt) / half_life)
+
+
+class AnswerCounters:
+    """Answer aggregates for ``size`` slots, one compact array per field.
+
+    ``decayed_attempts`` and ``decayed_errors`` are exponentially decayed
+    counts as of ``updated[slot]``. Both decay at the same rate, so their
+    ratio (the recent error rate) can be read in O(1) without bringing
+    them up to date first.
+    """
+    FIELDS = (('attempts', 'I'), ('errors', 'I'), ('latency_ms', 'd'),
+              ('decayed_attempts', 'f'), ('decayed_errors', 'f'), ('updated', 'd'))
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+    def __init__(self, size):
+        for name, typecode in self.FIELDS:
+            setattr(self, name, array.array(typecode, bytes(size * array.array(typecode).itemsize)))
+
+    def add(self, slot, correct, latency_ms, ts):
+        self.attempts[slot] += 1
+        self.errors[slot] += not correct
+        self.latency_ms[slot] += latency_ms
+        last = self.updated[slot]
+        factor = decay(ts - last) if last else 0.0
+        self.decayed_attempts[slot] = self.decayed_attempts[slot] * factor + 1.0
+        self.decayed_errors[slot] = self.decayed_errors[slot] * factor + (not correct)
+        self.updated[slot] = max(ts, last)
+
+    def merge(self, slot, values):
+        """Add a ``values()`` tuple (e.g. another slot, or a checkpoint row) into ``slot``."""
+        attempts, errors, latency_ms, decayed_attempts, decayed_errors, updated = values
+        if not attempts:
+            return
+        self.attempts[slot] += attempts
+        self.errors[slot] += errors
+        self.latency_ms[slot] += latency_ms
+        last = self.updated[slot]
+        ts = max(last, updated)
+        mine, theirs = (decay(ts - last) if last else 0.0), decay(ts - updated)
+        self.decayed_attempts[slot] = self.decayed_attempts[slot] * mine + decayed_attempts * theirs
+        self.decayed_errors[slot] = self.decayed_errors[slot] * mine + decayed_errors * theirs
+        self.updated[slot] = ts
+
+    def values(self, slot):
+        return tuple(getattr(self, name)[slot] for name, _ in self.FIELDS)
+
+    def row(self, slot):
+        attempts = self.attempts[slot]
+        decayed = self.decayed_attempts[slot]
+        return {
+            "attempts": attempts,
+            "errors": self.errors[slot],
+            "mean_latency_ms": round(self.latency_ms[slot] / attempts) if attempts else None,
+            "error_rate": self.decayed_errors[slot] / decayed if decayed else None,
+        }
+
+
+def difficulty_score(decayed_attempts, decayed_errors):
+    """Smoothed recent error rate in [0, 1]."""
+    return ((decayed_errors + DIFFICULTY_PRIOR_RATE * DIFFICULTY_PRIOR_ATTEMPTS)
+            / (decayed_attempts + DIFFICULTY_PRIOR_ATTEMPTS))
+
+
+class DifficultyOrder:
+    """Word ids hardest first (then unanswered words in deck order), and each id's rank."""
+    __slots__ = ('ids', 'rank', 'answered')
+
+    def __init__(self, difficulty, attempted):
+        answered = sorted(attempted, key=lambda wid: (-difficulty[wid], wid))
+        self.ids = array.array(_U32, answered)
+        self.ids.extend(wid for wid in range(len(difficulty)) if wid not in attempted)
+        self.rank = array.array(_U32, bytes(len(self.ids) * array.array(_U32).itemsize))
+        for pos, wid in enumerate(self.ids):
+            self.rank[wid] = pos
+        self.answered = len(answered)
+
+
+class DifficultyTable:
+    """Aggregates for one deck version, indexed by word id and lesson id.
+
+    Word and lesson slots are ``2 * id + direction``. ``difficulty[wid]``
+    combines both directions and is kept current on every update, so
+    sorting or weighting by it costs O(1) per word.
+    """
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.lookup = card_lookup(snapshot)
+        self.flat = flat_words(snapshot)
+        self.offsets = lesson_offsets(snapshot)
+        n_words, n_lessons = self.offsets[-1], len(self.offsets) - 1
+        self.words = AnswerCounters(2 * n_words)
+        self.lessons = AnswerCounters(2 * n_lessons)
+        self.difficulty = array.array('f', bytes(4 * n_words))
+        self.attempted = set()
+        self.generation = 0
+        self._order = None
+
+    def lesson_of(self, wid):
+        return bisect.bisect_right(self.offsets, wid) - 1
+
+    def add(self, wid, direction, correct, latency_ms, ts):
+        slot = 2 * wid + DIRECTION_SLOTS[direction]
+        self.words.add(slot, correct, latency_ms, ts)
+        self.lessons.add(2 * self.lesson_of(wid) + DIRECTION_SLOTS[direction], correct, latency_ms, ts)
+        self._rescore(wid)
+
+    def load(self, wid, rows):
+        """Merge checkpointed ``(es-cz values, cz-es values)`` for ``wid``."""
+        lesson_id = self.lesson_of(wid)
+        for d, values in enumerate(rows):
+            self.words.merge(2 * wid + d, values)
+            self.lessons.merge(2 * lesson_id + d, values)
+        self._rescore(wid)
+
+    def _rescore(self, wid):
+        words = self.words
+        a, b = 2 * wid, 2 * wid + 1
+        if not words.attempts[a] + words.attempts[b]:
+            return
+        # Bring both directions to the same point in time before adding them up.
+        ts = max(words.updated[a], words.updated[b])
+        fa, fb = decay(ts - words.updated[a]), decay(ts - words.updated[b])
+        self.difficulty[wid] = difficulty_score(
+            words.decayed_attempts[a] * fa + words.decayed_attempts[b] * fb,
+            words.decayed_errors[a] * fa + words.decayed_errors[b] * fb)
+        self.attempted.add(wid)
+
+    def export(self):
+        """``{card_key: (es-cz values, cz-es values)}`` for every answered word."""
+        # Only answered words are visited, so moving the counts to a new
+        # deck version costs O(answered words), not O(deck).
+        return {card_key(self.flat[wid][1]): (self.words.values(2 * wid), self.words.values(2 * wid + 1))
+                for wid in self.attempted}
+
+    def order(self):
+        """A DifficultyOrder for the current counts, rebuilt after new answers."""
+        order = self._order
+        if order is None or order[0] != self.generation:
+            order = self._order = (self.generation, DifficultyOrder(self.difficulty, self.attempted))
+        return order[1]
+
+    def word_row(self, wid):
+        row = {direction: self.words.row(2 * wid + d) for direction, d in DIRECTION_SLOTS.items()}
+        row["difficulty"] = self.difficulty[wid] if wid in self.attempted else None
+        return row
+
+    def lesson_row(self, lesson_id):
+        row = {direction: self.lessons.row(2 * lesson_id + d) for direction, d in DIRECTION_SLOTS.items()}
+        lessons = self.lessons
+        a, b = 2 * lesson_id, 2 * lesson_id + 1
+        ts = max(lessons.updated[a], lessons.updated[b])
+        fa, fb = decay(ts - lessons.updated[a]), decay(ts - lessons.updated[b])
+        decayed = lessons.decayed_attempts[a] * fa + lessons.decayed_attempts[b] * fb
+        row["difficulty"] = difficulty_score(
+            decayed, lessons.decayed_errors[a] * fa + lessons.decayed_errors[b] * fb) if decayed else None
+        return row
+
+
+class DifficultyStats:
+    """Per-word, per-lesson and per-direction answer aggregates.
+
+    Every process folds new rows of ``answer_events`` into its in-memory
+    DifficultyTable (at most every ``refresh_interval`` seconds, reading
+    only rows past the last id it has seen), so workers agree without
+    sharing memory and no request ever rescans the history. Word counters
+    are checkpointed by card key together with that event id, so a restart
+    or a deck change resumes from the checkpoint instead of from the first
+    answer. Answers for cards that are not in the deck are kept aside and
+    come back if the card does.
+    """
+
+    SCHEMA = AnswerLog.SCHEMA + """
+        CREATE TABLE IF NOT EXISTS difficulty_checkpoint (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_event_id INTEGER NOT NULL,
+            saved REAL NOT NULL,
+            data BLOB NOT NULL
+        );
+    """
+
+    def __init__(self, path, refresh_interval=DIFFICULTY_REFRESH_INTERVAL,
+                 checkpoint_interval=DIFFICULTY_CHECKPOINT_INTERVAL):
+        self._conns = SQLiteConnections(path, self.SCHEMA)
+        self.refresh_interval = refresh_interval
+        self.checkpoint_interval = checkpoint_interval
+        self._lock = threading.Lock()
+        self._table = None
+        self._detached = {}
+        self.directions = AnswerCounters(len(DIRECTIONS))
+        self.last_event_id = 0
+        self._checkpointed_id = None
+        self._next_refresh = 0.0
+        self._next_checkpoint = time.monotonic() + checkpoint_interval
+        atexit.register(self.checkpoint)
+
+    def table(self, snapshot):
+        """The DifficultyTable for ``snapshot``, with recent answers folded in."""
+        table = self._table
+        now = time.monotonic()
+        if table is not None and table.version == snapshot.version and now < self._next_refresh:
+            return table
+        if table is not None and table.version == snapshot.version:
+            # Someone else is already folding: serve the counts we have.
+            if not self._lock.acquire(blocking=False):
+                return table
+        else:
+            self._lock.acquire()
+        try:
+            self._next_refresh = now + self.refresh_interval
+            if self._table is None or self._table.version != snapshot.version:
+                self._rebuild(snapshot)
+            self._fold()
+            if now >= self._next_checkpoint:
+                self._next_checkpoint = now + self.checkpoint_interval
+                self._save()
+            return self._table
+        finally:
+            self._lock.release()
+
+    def _rebuild(self, snapshot):
+        if self._table is None:
+            rows = self._load()
+        else:
+            rows = self._detached
+            rows.update(self._table.export())
+        table = DifficultyTable(snapshot)
+        self._detached = {}
+        for key, values in rows.items():
+            wid = table.lookup.get(key)
+            if wid is None:
+                self._detached[key] = values
+            else:
+                table.load(wid, values)
+        self._table = table
+
+    def _load(self):
+        row = self._conns.get().execute(
+            'SELECT last_event_id, data FROM difficulty_checkpoint WHERE id = 1').fetchone()
+        if row is None:
+            return {}
+        data = json.loads(zlib.decompress(row[1]))
+        self.last_event_id = self._checkpointed_id = row[0]
+        for d, values in enumerate(data['directions']):
+            self.directions.merge(d, values)
+        return {key: tuple(map(tuple, values)) for key, values in data['cards'].items()}
+
+    def _fold(self):
+        table, conn = self._table, self._conns.get()
+        while True:
+            rows = conn.execute(
+                'SELECT id, ts, card_key, direction, correct, latency_ms FROM answer_events'
+                ' WHERE id > ? ORDER BY id LIMIT ?', (self.last_event_id, DIFFICULTY_FOLD_BATCH)).fetchall()
+            for event_id, ts, key, direction, correct, latency_ms in rows:
+                if direction not in DIRECTION_SLOTS:
+                    continue
+                self.directions.add(DIRECTION_SLOTS[direction], correct, latency_ms, ts)
+                # Events recorded against an older deck version carry no card
+                # key; their word ids may point at other words by now.
+                wid = table.lookup.get(key) if key is not None else None
+                if wid is not None:
+                    table.add(wid, direction, correct, latency_ms, ts)
+            if rows:
+                self.last_event_id = rows[-1][0]
+                table.generation += 1
+            if len(rows) < DIFFICULTY_FOLD_BATCH:
+                return
+
+    def _save(self):
+        if self._table is None or self.last_event_id == self._checkpointed_id:
+            return
+        cards = dict(self._detached)
+        cards.update(self._table.export())
+        data = zlib.compress(json.dumps({
+            'directions': [self.directions.values(d) for d in range(len(DIRECTIONS))],
+            'cards': cards,
+        }, separators=(',', ':')).encode('utf-8'))
+        import sqlite3
+        try:
+            with self._conns.get() as conn:
+                # Several workers checkpoint the same history; keep the newest.
+                conn.execute(
+                    'INSERT INTO difficulty_checkpoint (id, last_event_id, saved, data) VALUES (1, ?, ?, ?)'
+                    ' ON CONFLICT (id) DO UPDATE SET last_event_id = excluded.last_event_id,'
+                    ' saved = excluded.saved, data = excluded.data'
+                    ' WHERE excluded.last_event_id > difficulty_checkpoint.last_event_id',
+                    (self.last_event_id, time.time(), data))
+        except sqlite3.Error:
+            return
+        self._checkpointed_id = self.last_event_id
+
+    def checkpoint(self):
+        """Save the current counters now (also run at exit)."""
+        with self._lock:
+            self._save()
+
+
+# The process-wide stores in progress.db. Each is created by db_store() (or
+# on first access as ``vocab.<name>``) when something first needs it, so
+# commands that never read progress, like `drill`, don't set them up.
+_DB_STORES = {
+    'progress_store': lambda: SQLiteProgressStore(PROGRESS_DB),
+    'review_scheduler': lambda: ReviewScheduler(PROGRESS_DB),
+    'answer_log': lambda: AnswerLog(PROGRESS_DB),
+    'difficulty_stats': lambda: DifficultyStats(PROGRESS_DB),
+}
+_db_store_lock = threading.Lock()
+
+
+def db_store(name):
+    """The store ``name`` (a key of _DB_STORES), created on first use."""
+    store = globals().get(name)
+    if store is None:
+        with _db_store_lock:
+            store = globals().get(name)
+            if store is None:
+                store = globals()[name] = _DB_STORES[name]()
+    return store
+
+
+# -------------------------------------------------------------------
+# Command line
+# -------------------------------------------------------------------
+def cmd_run(args):
+    host = getattr(args, 'host', None) or settings.host
+    port = getattr(args, 'port', None) or settings.port
+    print("==================================================")
+    print("🟩 DuoVocab Replica is starting!")
+    print("🟩 Make sure 'vocabs.txt' is in:", BASE_DIR)
+    print("🟩 Open http://%s:%d/ in your browser" % (host, port))
+    print("==================================================")
+
+    from vocab_web import app
+    app.run(debug=True, host=host, port=port)
+
+
+def preload():
+    """Load the vocabulary and build the shared indexes in this process.
+
+    `serve` calls this in the master before forking (and again on SIGHUP),
+    so workers inherit everything copy-on-write instead of each parsing the
+    deck. gc.freeze() keeps the collector from writing to those pages.
+    """
+    from vocab_web import app, syllabus_parts
+    gc.unfreeze()
+    snapshot = vocab_store.reload()
+    for build in (flat_words, lesson_summaries, lesson_offsets, deck_stats,
+                  distractor_index, search_index, card_lookup, grading_index):
+        build(snapshot)
+    db_store('difficulty_stats').table(snapshot)
+    with app.app_context():
+        syllabus_parts(snapshot)
+    gc.collect()
+    gc.freeze()
+    return snapshot
+
+
+def cmd_serve(args):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("`vocab.py serve` needs gunicorn: pip install gunicorn", file=sys.stderr)
+        return 1
+
+    if not args.watch:
+        # Workers share the master's snapshot; reload explicitly with SIGHUP.
+        vocab_store.check_interval = float('inf')
+
+    def on_reload(arbiter):
+        snapshot = preload()
+        arbiter.log.info("Reloaded vocabulary: version %d, %d lessons",
+                         snapshot.version, len(snapshot.lessons))
+
+    options = {
+        'bind': '%s:%d' % (args.host or settings.host, args.port or settings.port),
+        'workers': args.workers or settings.workers,
+        'threads': args.threads or settings.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'graceful_timeout': 30,
+        'on_reload': on_reload,
+        'accesslog': '-' if args.access_log else None,
+    }
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            snapshot = preload()
+            print("Preloaded %d lessons (version %d)" % (len(snapshot.lessons), snapshot.version))
+            from vocab_web import app
+            return app
+
+    Server().run()
+
+
+def cmd_live(args):
+    import vocab_live
+    return vocab_live.run(args.host or settings.host, args.port or settings.live_port)
+
+
+def cmd_export(args):
+    global vocab_store
+    vocab_store = VocabStore(args.source, args.compiled, lazy=LAZY_LESSONS)
+    snapshot = vocab_store.snapshot()
+    if not len(snapshot.lessons):
+        print("No lessons to export in %s" % args.source, file=sys.stderr)
+        return 1
+    from vocab_web import export_site
+    start = time.perf_counter()
+    try:
+        result = export_site(args.output, jobs=max(1, args.jobs))
+    except OSError as e:
+        print("Cannot export to %s: %s" % (args.output, e), file=sys.stderr)
+        return 1
+    print("Exported %d lessons to %s: %d files, %.1f MB written, %d stale files removed (%.1f s)" % (
+        result['lessons'], args.output, result['files'], result['bytes'] / 1e6, result['pruned'],
+        time.perf_counter() - start))
+    return 0
+
+
+def fold_journal(path):
+    """Compact pending edits into ``path`` before a command reads or replaces it."""
+    folded = VocabStore(path, None).compact() if os.path.exists(path + '.journal') else 0
+    if folded:
+        print("Folded %d pending edits into %s" % (folded, path), file=sys.stderr)
+
+
+def cmd_compact(args):
+    try:
+        folded = VocabStore(args.source, None).compact()
+    except OSError as e:
+        print("Cannot compact %s: %s" % (args.source, e), file=sys.stderr)
+        return 1
+    if folded:
+        print("Folded %d edits into %s" % (folded, args.source))
+    else:
+        print("No pending edits for %s" % args.source)
+    return 0
+
+
+def cmd_compile(args):
+    try:
+        fold_journal(args.source)
+        with open(args.source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print("Cannot read %s: %s" % (args.source, e), file=sys.stderr)
+        return 1
+    errors = validate_vocabs(data)
+    if errors:
+        for err in errors[:50]:
+            print("%s: %s" % (args.source, err), file=sys.stderr)
+        if len(errors) > 50:
+            print("... and %d more" % (len(errors) - 50), file=sys.stderr)
+        return 1
+    try:
+        counts = compile_vocabs(data, args.output)
+    except VocabFormatError as e:
+        print("%s: %s" % (args.source, e), file=sys.stderr)
+        return 1
+    print("Wrote %s: %d lessons, %d words, %d unique strings, %d types" % (
+        args.output, counts['lessons'], counts['words'], counts['strings'], counts['types']))
+    return 0
+
+
+def cmd_import(args):
+    fmt_name = args.format
+    if fmt_name is None:
+        ext = os.path.splitext(args.source)[1].lower()
+        fmt_name = {'.csv': 'csv', '.tsv': 'tsv', '.tab': 'tsv'}.get(ext)
+        if fmt_name is None:
+            with open(args.source, 'rb') as f:
+                fmt_name = 'anki' if f.read(64).lstrip(b'\xef\xbb\xbf').startswith(b'#') else 'tsv'
+    columns = args.columns.split(',') if args.columns else None
+
+    existing = []
+    to_stdout = args.output == '-'
+    if not to_stdout:
+        fold_journal(args.output)
+    if not to_stdout and os.path.exists(args.output):
+        if not (args.append or args.force):
+            print("%s exists; use --append to add to it or --force to replace it" % args.output,
+                  file=sys.stderr)
+            return 1
+        if args.append:
+            with open(args.output, 'r', encoding='utf-8') as f:
+                existing = json.load(f)
+            errors = validate_vocabs(existing)
+            if errors:
+                print("%s: %s" % (args.output, errors[0]), file=sys.stderr)
+                return 1
+
+    tmp = None if to_stdout else '%s.import-%d' % (args.output, os.getpid())
+    out = sys.stdout if to_stdout else open(tmp, 'w', encoding='utf-8')
+    bad_rows = 0
+    error_file = open(args.errors, 'w', encoding='utf-8', newline='') if args.errors else None
+    error_writer = csv.writer(error_file) if error_file else None
+    if error_writer:
+        error_writer.writerow(['line', 'problem'])
+    try:
+        writer = DeckWriter(out, args.lesson_size)
+        for lesson in existing:
+            writer.add_lesson(lesson)
+        del existing
+        for line, record, problem in import_rows(args.source, fmt_name, columns, args.header,
+                                                 args.default_type, max(1, args.jobs)):
+            if record is None:
+                bad_rows += 1
+                if bad_rows <= 20:
+                    print("%s:%d: %s" % (args.source, line, problem), file=sys.stderr)
+                if error_writer:
+                    error_writer.writerow([line, problem])
+                continue
+            lesson, spanish, czech, word_type, notes = record
+            writer.add(lesson, {'spanish': spanish, 'czech': czech, 'type': word_type, 'notes': notes})
+        writer.close()
+    except (OSError, ValueError, UnicodeDecodeError, csv.Error) as e:
+        print("Cannot import %s: %s" % (args.source, e), file=sys.stderr)
+        if tmp:
+            out.close()
+            os.unlink(tmp)
+        return 1
+    finally:
+        if error_file:
+            error_file.close()
+    if tmp:
+        out.close()
+        # Atomic swap: a running server never sees a half-written deck.
+        os.replace(tmp, args.output)
+
+    if bad_rows > 20:
+        print("... and %d more bad rows" % (bad_rows - 20), file=sys.stderr)
+    for name in sorted(writer.split_lessons):
+        print("Warning: rows of lesson %r are not contiguous; written as separate lessons" % name,
+              file=sys.stderr)
+    print("Imported %d words into %d lessons (%d duplicates skipped, %d bad rows)" % (
+        writer.words, writer.lessons, writer.duplicates, bad_rows), file=sys.stderr)
+    return 1 if bad_rows and args.strict else 0
+
+
+def cmd_drill(args):
+    """Practice in the terminal: the same questions as the practice page."""
+    try:
+        lessons = load_lessons(args.lessons, args.source, args.compiled)
+    except (OSError, ValueError) as e:
+        print("Cannot read %s: %s" % (args.source, e), file=sys.stderr)
+        return 1
+    missing = [idx for idx in args.lessons if idx not in lessons]
+    if missing:
+        print("No lesson %s in %s" % (', '.join(map(str, missing)), args.source), file=sys.stderr)
+        return 1
+    errors = validate_vocabs(list(lessons.values()))
+    if errors:
+        print("%s: %s" % (args.source, errors[0]), file=sys.stderr)
+        return 1
+
+    rng = random.Random(args.seed)
+    pairs = [(idx, w) for idx in dict.fromkeys(args.lessons) for w in lessons[idx].get('words', [])]
+    if not pairs:
+        print("Nothing to practice", file=sys.stderr)
+        return 1
+    index = DistractorIndex(lessons.items())
+    grading = GradingIndex(pairs) if args.typed else None
+    rng.shuffle(pairs)
+    if args.limit:
+        pairs = pairs[:max(1, args.limit)]
+    # Like the practice page: one question per word, and a wrong answer
+    # sends the same question to the back of the queue.
+    pending = collections.deque((w, build_question(w, index, args.direction, rng=rng), True) for _, w in pairs)
+    total, first_try = len(pending), 0
+
+    print("%s: %d words. Type 'q' to stop." % (
+        ', '.join(lessons[idx].get('lesson_name', '') for idx in dict.fromkeys(args.lessons)), total))
+    while pending:
+        word, question, fresh = pending[0]
+        print()
+        print("[%d left] %s" % (len(pending), question['prompt']))
+        if grading is None:
+            for n, option in enumerate(question['options'], 1):
+                print("  %d) %s" % (n, option))
+        try:
+            while True:
+                reply = input('> ').strip()
+                if reply == 'q' or grading is not None or (
+                        reply.isdigit() and 1 <= int(reply) <= len(question['options'])):
+                    break
+                print("Answer with 1-%d" % len(question['options']))
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if reply == 'q':
+            break
+
+        if grading is None:
+            correct = question['options'][int(reply) - 1] == question['answer']
+            note = ''
+        else:
+            result = grading.grade(word, question['direction'], reply)
+            correct = result['verdict'] != 'wrong'
+            note = (' (typo)' if result['verdict'] == 'typo'
+                    else ' (mind the accents)' if result.get('accents') else '')
+        pending.popleft()
+        if correct:
+            print("Correct%s: %s" % (note, question['answer']))
+            first_try += fresh
+        else:
+            print("Wrong, it's: %s" % question['answer'])
+            pending.append((word, question, False))
+
+    print()
+    print("%d/%d right on the first try, %d left" % (first_try, total, len(pending)))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='vocab.py', description='DuoVocab practice app')
+    commands = parser.add_subparsers(dest='command')
+
+    p = commands.add_parser('run', help='run the development server (default)')
+    p.add_argument('--host')
+    p.add_argument('--port', type=int)
+
+    p = commands.add_parser('serve', help='run the production server (needs gunicorn)')
+    p.add_argument('--host')
+    p.add_argument('--port', type=int)
+    p.add_argument('--workers', type=int, help='worker processes (DUOVOCAB_WORKERS)')
+    p.add_argument('--threads', type=int, help='threads per worker (DUOVOCAB_THREADS)')
+    p.add_argument('--watch', action='store_true',
+                   help='let each worker reload vocabs.txt when it changes (instead of only on SIGHUP)')
+    p.add_argument('--access-log', action='store_true', help='log every request to stdout')
+
+    p = commands.add_parser('live', help='host live classroom quizzes over WebSockets (no Flask)')
+    p.add_argument('--host')
+    p.add_argument('--port', type=int, help='default: DUOVOCAB_LIVE_PORT or 5001')
+
+    p = commands.add_parser('compile', help='validate vocabs.txt and write the binary vocabs.bin')
+    p.add_argument('--source', default=VOCABS_PATH)
+    p.add_argument('--output', default=COMPILED_PATH)
+
+    p = commands.add_parser('compact', help='fold the edit journal into vocabs.txt')
+    p.add_argument('--source', default=VOCABS_PATH)
+
+    p = commands.add_parser('export', help='write the syllabus, dictionary and lessons as a static site')
+    p.add_argument('output', metavar='DIR')
+    p.add_argument('--source', default=VOCABS_PATH)
+    p.add_argument('--compiled', default=COMPILED_PATH)
+    p.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='processes rendering lessons')
+
+    p = commands.add_parser('import', help='import words from a CSV, TSV or Anki plain-text export')
+    p.add_argument('source')
+    p.add_argument('--format', choices=('csv', 'tsv', 'anki'), help='default: guessed from the file')
+    p.add_argument('--columns', help="comma-separated field of each column: spanish, czech, type, notes, "
+                                     "lesson or '-' to skip (default: the header row, or spanish,czech,type,notes)")
+    p.add_argument('--header', action='store_true', help='the first row is a header')
+    p.add_argument('--lesson-size', type=int, default=50, help='words per lesson when there is no lesson column')
+    p.add_argument('--default-type', default='Word')
+    p.add_argument('-o', '--output', default=VOCABS_PATH, help="vocabs.txt to write ('-' for stdout)")
+    p.add_argument('--append', action='store_true', help='keep the lessons already in the output')
+    p.add_argument('--force', action='store_true', help='replace an existing output file')
+    p.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='parser processes for large files')
+    p.add_argument('--errors', help='also write every rejected row to this CSV file')
+    p.add_argument('--strict', action='store_true', help='exit with status 1 if any row was rejected')
+
+    p = commands.add_parser('drill', help='practice lessons in the terminal (no web server)')
+    p.add_argument('lessons', type=int, nargs='+', metavar='LESSON_ID', help="lesson ids, as in the app's /practice URLs")
+    p.add_argument('--typed', action='store_true', help='type the answers instead of choosing one')
+    p.add_argument('--direction', choices=tuple(DIRECTIONS), help='default: random for each word')
+    p.add_argument('--limit', type=int, help='ask at most this many words')
+    p.add_argument('--seed', type=int, help='make the order and the options reproducible')
+    p.add_argument('--source', default=VOCABS_PATH)
+    p.add_argument('--compiled', default=COMPILED_PATH)
+
+    args = parser.parse_args(argv)
+    handler = {'compile': cmd_compile, 'serve': cmd_serve, 'import': cmd_import,
+               'drill': cmd_drill, 'compact': cmd_compact, 'live': cmd_live,
+               'export': cmd_export}.get(args.command, cmd_run)
+    return handler(args) or 0
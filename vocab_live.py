@@ -0,0 +1,751 @@
+"""Live quiz rooms: a teacher asks, the class answers, everyone sees the board.
+
+One asyncio process holds every room. Questions are built from the same
+lessons and distractors as the practice page; each one is encoded into a
+WebSocket frame once and that frame is written to every player, and the
+leaderboard goes out at most a few times a second however fast answers come
+in. The WebSocket side is a minimal RFC 6455 server on asyncio streams, so
+this needs neither Flask nor a WebSocket package. Started by `vocab.py live`.
+"""
+import asyncio
+import base64
+import hashlib
+import heapq
+import html as html_lib
+import json
+import random
+import secrets
+import struct
+import sys
+import time
+
+import vocab
+from vocab import (
+    CompiledDeck, build_question, card_key, distractor_index, lesson_offsets, lesson_summaries,
+    lesson_words, practice_distractors, sample_words,
+)
+
+# -------------------------------------------------------------------
+# WebSocket framing (RFC 6455)
+# -------------------------------------------------------------------
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+MAX_REQUEST_BYTES = 8192
+MAX_MESSAGE_BYTES = 4096  # players only send small JSON objects
+HANDSHAKE_TIMEOUT = 10.0
+# A peer with this much unsent data is not reading; it is dropped rather
+# than letting one slow phone hold a room's broadcasts in memory.
+WRITE_BUFFER_LIMIT = 256 * 1024
+
+
+class ProtocolError(Exception):
+    def __init__(self, message, code=1002):
+        super().__init__(message)
+        self.code = code
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode('ascii')).digest()).decode('ascii')
+
+
+def apply_mask(data, mask):
+    if not data:
+        return data
+    n = len(data)
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, 'little') ^ int.from_bytes(key, 'little')).to_bytes(n, 'little')
+
+
+def encode_frame(payload, opcode=OP_TEXT, mask=None):
+    """A single final frame. Servers send unmasked; clients pass a 4-byte ``mask``."""
+    n = len(payload)
+    masked = 0x80 if mask else 0
+    if n < 126:
+        head = struct.pack('!BB', 0x80 | opcode, masked | n)
+    elif n < 65536:
+        head = struct.pack('!BBH', 0x80 | opcode, masked | 126, n)
+    else:
+        head = struct.pack('!BBQ', 0x80 | opcode, masked | 127, n)
+    if mask:
+        return head + mask + apply_mask(payload, mask)
+    return head + payload
+
+
+def encode_json(message):
+    return encode_frame(json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+async def read_frame(reader, max_size=MAX_MESSAGE_BYTES, masked=True):
+    """``(fin, opcode, payload)`` of the next frame; ``masked`` is what the peer must send."""
+    b0, b1 = await reader.readexactly(2)
+    if b0 & 0x70:
+        raise ProtocolError('reserved bits set')
+    if bool(b1 & 0x80) != masked:
+        raise ProtocolError('client frames must be masked' if masked else 'server frames must not be masked')
+    opcode, n = b0 & 0x0f, b1 & 0x7f
+    if n == 126:
+        n, = struct.unpack('!H', await reader.readexactly(2))
+    elif n == 127:
+        n, = struct.unpack('!Q', await reader.readexactly(8))
+    if opcode >= OP_CLOSE and (n > 125 or not b0 & 0x80):
+        raise ProtocolError('bad control frame')
+    if n > max_size:
+        raise ProtocolError('message too big', 1009)
+    mask = await reader.readexactly(4) if masked else None
+    payload = await reader.readexactly(n)
+    return bool(b0 & 0x80), opcode, apply_mask(payload, mask) if masked else payload
+
+
+class Client:
+    """One WebSocket peer. Sending never waits: frames go to the transport's buffer."""
+
+    __slots__ = ('reader', 'writer', 'transport', 'closed', 'room', 'player')
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.transport = writer.transport
+        self.closed = False
+        self.room = None
+        self.player = None
+
+    def send(self, frame):
+        if self.closed or self.transport.is_closing():
+            return False
+        if self.transport.get_write_buffer_size() > WRITE_BUFFER_LIMIT:
+            self.close(1008, abort=True)
+            return False
+        self.writer.write(frame)
+        return True
+
+    def send_json(self, message):
+        return self.send(encode_json(message))
+
+    def close(self, code=1000, abort=False):
+        if self.closed:
+            return
+        self.closed = True
+        if abort:
+            self.transport.abort()
+            return
+        self.writer.write(encode_frame(struct.pack('!H', code), OP_CLOSE))
+        self.writer.close()
+
+    async def receive(self):
+        """The next text message, or ``None`` once the peer has closed."""
+        parts, size = [], 0
+        while True:
+            fin, opcode, payload = await read_frame(self.reader)
+            if opcode == OP_PING:
+                self.send(encode_frame(payload, OP_PONG))
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                return None
+            if opcode not in (OP_TEXT, OP_CONTINUATION) or (opcode == OP_TEXT) == bool(parts):
+                raise ProtocolError('expected a text message', 1003)
+            size += len(payload)
+            if size > MAX_MESSAGE_BYTES:
+                raise ProtocolError('message too big', 1009)
+            parts.append(payload)
+            if fin:
+                return b''.join(parts)
+
+
+# -------------------------------------------------------------------
+# Rooms
+# -------------------------------------------------------------------
+ROOM_CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+ROOM_CODE_LENGTH = 5
+MAX_ROOMS = 1000
+MAX_ROOM_PLAYERS = 500
+MAX_QUESTIONS = 100
+MAX_NAME_LENGTH = 24
+DEFAULT_SECONDS = 20
+MIN_SECONDS, MAX_SECONDS = 5, 300
+POINTS = 1000  # a correct answer is worth half of this, plus up to half again for speed
+LEADERBOARD_SIZE = 10
+LEADERBOARD_INTERVAL = 0.25
+
+
+class LiveError(ValueError):
+    pass
+
+
+class Player:
+    __slots__ = ('uid', 'name', 'client', 'score', 'order')
+
+    def __init__(self, name, client, order):
+        self.uid = secrets.token_hex(8)
+        self.name = name
+        self.client = client
+        self.score = 0
+        self.order = order
+
+
+def pick_questions(snapshot, lesson_ids, count, rng):
+    """``[(word_id, word)]`` drawn from the lessons, and the distractors to go with them."""
+    summaries, offsets = lesson_summaries(snapshot), lesson_offsets(snapshot)
+    picks = sample_words([(idx, summaries[idx].word_count, 1.0) for idx in lesson_ids], count, rng)
+    rng.shuffle(picks)
+    words = {idx: lesson_words(snapshot, idx) for idx in {idx for idx, _ in picks}}
+    return ([(offsets[idx] + pos, words[idx][pos]) for idx, pos in picks],
+            practice_distractors(snapshot, lesson_ids))
+
+
+class Room:
+    """A quiz: the host's connection, the players, and the question that is open.
+
+    Everything runs on the event loop, so there is no locking; the only
+    per-player work per question is writing the shared frames and one small
+    ack, so a room's cost is dominated by socket writes.
+    """
+
+    def __init__(self, code, host, snapshot, words, distractors, seconds, rng):
+        self.loop = asyncio.get_running_loop()
+        self.code, self.host = code, host
+        self.snapshot = snapshot
+        self.words, self.distractors = words, distractors
+        self.seconds = seconds
+        self.rng = rng
+        self.players = {}  # name -> Player, kept after a disconnect so a rejoin keeps the score
+        self.n = 0
+        self.question = None
+        self.question_frame = None
+        self.asked_at = 0.0
+        self.answers = {}  # uid -> (option, ms, correct)
+        self.counts = []
+        self.deadline = None
+        self.board_timer = None
+        self.finished = False
+
+    def connected(self):
+        return [p for p in self.players.values() if p.client is not None]
+
+    def all_answered(self):
+        # Only players still here count: one who answered and then left
+        # must not stand in for one who has not answered yet.
+        live = self.connected()
+        answered = sum(p.uid in self.answers for p in live)
+        return answered > 0 and answered >= len(live)
+
+    def broadcast(self, frame):
+        self.host.send(frame)
+        for player in self.players.values():
+            if player.client is not None:
+                player.client.send(frame)
+
+    def join(self, client, name, token=None):
+        if self.finished:
+            raise LiveError('this quiz is over')
+        player = self.players.get(name)
+        # A dropped player takes their seat back with the token (their uid)
+        # that only they were sent in 'joined'.
+        if player is not None and (player.client is not None or not isinstance(token, str)
+                                   or not secrets.compare_digest(token.encode(), player.uid.encode())):
+            raise LiveError('that name is taken')
+        if player is None:
+            if len(self.players) >= MAX_ROOM_PLAYERS:
+                raise LiveError('the room is full')
+            player = self.players[name] = Player(name, client, len(self.players))
+        player.client = client
+        client.room, client.player = self, player
+        client.send_json({'type': 'joined', 'code': self.code, 'name': name, 'score': player.score,
+                          'questions': len(self.words), 'token': player.uid})
+        if self.question_frame is not None and player.uid not in self.answers:
+            client.send(self.question_frame)
+        self.board_changed()
+
+    def leave(self, player):
+        player.client = None
+        if self.question is not None and self.all_answered():
+            self.reveal()
+        self.board_changed()
+
+    def ask(self):
+        if self.question is not None:
+            raise LiveError('reveal the current question first')
+        if self.n >= len(self.words):
+            self.finish()
+            return
+        wid, word = self.words[self.n]
+        self.n += 1
+        question = build_question(word, self.distractors, rng=self.rng)
+        self.question = dict(question, word_id=wid, card_key=card_key(word))
+        self.answers = {}
+        self.counts = [0] * len(question['options'])
+        # Encoded once: every player gets the very same bytes.
+        self.question_frame = encode_json({
+            'type': 'question', 'n': self.n, 'of': len(self.words), 'direction': question['direction'],
+            'prompt': question['prompt'], 'options': question['options'], 'seconds': self.seconds,
+        })
+        self.asked_at = self.loop.time()
+        self.broadcast(self.question_frame)
+        self.deadline = self.loop.call_later(self.seconds, self.reveal)
+
+    def answer(self, player, n, option):
+        question = self.question
+        if question is None or n != self.n:
+            raise LiveError('this question is closed')
+        if player.uid in self.answers:
+            raise LiveError('already answered')
+        if type(option) is not int or not 0 <= option < len(question['options']):
+            raise LiveError('no such option')
+        ms = int((self.loop.time() - self.asked_at) * 1000)
+        correct = question['options'][option] == question['answer']
+        points = 0
+        if correct:
+            speed = max(0.0, 1.0 - ms / (self.seconds * 1000.0))
+            points = int(round(POINTS / 2 * (1 + speed)))
+            player.score += points
+        self.answers[player.uid] = (option, ms, correct)
+        self.counts[option] += 1
+        player.client.send_json({'type': 'ack', 'n': n, 'ms': ms, 'correct': correct,
+                                 'points': points, 'score': player.score})
+        if self.all_answered():
+            self.reveal()
+        else:
+            self.board_changed()
+
+    def reveal(self):
+        question = self.question
+        if question is None:
+            return
+        self.question = self.question_frame = None
+        self.deadline.cancel()
+        self.cancel_board()
+        ranked = self.ranked()
+        self.broadcast(encode_json(dict(self.board(ranked), type='reveal', answer=question['answer'],
+                                        counts=self.counts)))
+        self.send_ranks(ranked, 'rank')
+        self.log_answers(question)
+
+    def finish(self):
+        if self.question is not None:
+            self.reveal()
+        self.finished = True
+        self.cancel_board()
+        ranked = self.ranked()
+        self.broadcast(encode_json(dict(self.board(ranked), type='finished')))
+        self.send_ranks(ranked, 'final')
+
+    def ranked(self):
+        return sorted(self.players.values(), key=lambda p: (-p.score, p.order))
+
+    def send_ranks(self, ranked, kind):
+        rank, previous = 0, None
+        for i, player in enumerate(ranked, 1):
+            if player.score != previous:
+                rank, previous = i, player.score
+            if player.client is not None:
+                player.client.send_json({'type': kind, 'n': self.n, 'rank': rank,
+                                         'of': len(ranked), 'score': player.score})
+
+    def board(self, ranked=None):
+        top = ranked[:LEADERBOARD_SIZE] if ranked is not None else heapq.nsmallest(
+            LEADERBOARD_SIZE, self.players.values(), key=lambda p: (-p.score, p.order))
+        return {'type': 'board', 'n': self.n, 'of': len(self.words), 'answered': len(self.answers),
+                'players': len(self.connected()), 'top': [[p.name, p.score] for p in top]}
+
+    def board_changed(self):
+        # Coalesced: a burst of answers costs one board per interval.
+        if self.board_timer is None:
+            self.board_timer = self.loop.call_later(LEADERBOARD_INTERVAL, self.send_board)
+
+    def cancel_board(self):
+        if self.board_timer is not None:
+            self.board_timer.cancel()
+            self.board_timer = None
+
+    def send_board(self):
+        self.board_timer = None
+        if not self.finished:
+            self.broadcast(encode_json(self.board()))
+
+    def log_answers(self, question):
+        # Into the same answer log as the practice page, so a class's
+        # mistakes count towards each word's difficulty.
+        by_uid = {p.uid: p for p in self.players.values()}
+        now = time.time()
+        rows = [('live:' + uid, now, self.snapshot.version, question['word_id'], question['card_key'],
+                 question['direction'], int(correct), ms)
+                for uid, (_, ms, correct) in self.answers.items() if uid in by_uid]
+        if rows:
+            vocab.answer_log.submit(rows)
+
+    def close(self):
+        self.finished = True
+        self.question = self.question_frame = None
+        if self.deadline is not None:
+            self.deadline.cancel()
+        self.cancel_board()
+        frame = encode_json({'type': 'closed'})
+        for player in self.players.values():
+            if player.client is not None:
+                player.client.room = None
+                player.client.send(frame)
+                player.client.close(1001)
+
+
+# -------------------------------------------------------------------
+# Server
+# -------------------------------------------------------------------
+class LiveServer:
+    """Serves the live page at ``/`` and the rooms over ``/ws``."""
+
+    def __init__(self):
+        self.rooms = {}
+        self.rng = random.Random()
+        self._page = (None, None)
+        self.handlers = {
+            'create': self.on_create, 'join': self.on_join, 'next': self.on_next,
+            'reveal': self.on_reveal, 'end': self.on_end, 'answer': self.on_answer,
+        }
+
+    async def start(self, host, port):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST_BYTES, backlog=1024)
+
+    async def handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), HANDSHAKE_TIMEOUT)
+            request_line, *lines = head.decode('latin-1').split('\r\n')
+            method, target, _ = request_line.split(' ', 2)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                ConnectionError, ValueError):
+            writer.close()
+            return
+        headers = {}
+        for line in lines:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        path = target.split('?', 1)[0]
+
+        if path == '/ws' and 'websocket' in headers.get('upgrade', '').lower():
+            key = headers.get('sec-websocket-key')
+            if method != 'GET' or not key or headers.get('sec-websocket-version') != '13':
+                self.respond(writer, '400 Bad Request', 'text/plain', b'bad websocket handshake')
+                return
+            writer.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n'
+                          'Connection: Upgrade\r\nSec-WebSocket-Accept: %s\r\n\r\n' % accept_key(key)).encode())
+            await self.serve_client(Client(reader, writer))
+        elif method != 'GET':
+            self.respond(writer, '405 Method Not Allowed', 'text/plain', b'method not allowed')
+        elif path in ('/', '/live'):
+            self.respond(writer, '200 OK', 'text/html; charset=utf-8', self.page())
+        elif path == '/healthz':
+            body = json.dumps({'status': 'ok', 'rooms': len(self.rooms),
+                               'players': sum(len(r.connected()) for r in self.rooms.values())})
+            self.respond(writer, '200 OK', 'application/json', body.encode())
+        else:
+            self.respond(writer, '404 Not Found', 'text/plain', b'not found')
+
+    def respond(self, writer, status, content_type, body):
+        writer.write(('HTTP/1.1 %s\r\nContent-Type: %s\r\nContent-Length: %d\r\n'
+                      'Cache-Control: no-cache\r\nConnection: close\r\n\r\n'
+                      % (status, content_type, len(body))).encode() + body)
+        writer.close()
+
+    def page(self):
+        # Rendered once per deck version: the lesson list is the only variable part.
+        snapshot = vocab.vocab_store.snapshot()
+        version, body = self._page
+        if version != snapshot.version:
+            options = ''.join('<option value="%d">%s (%d)</option>' % (
+                idx, html_lib.escape(summary.lesson_name), summary.word_count)
+                for idx, summary in enumerate(lesson_summaries(snapshot)) if summary.word_count)
+            body = LIVE_PAGE.replace('<!--lessons-->', options).encode('utf-8')
+            self._page = (snapshot.version, body)
+        return body
+
+    async def serve_client(self, client):
+        try:
+            while True:
+                message = await client.receive()
+                if message is None:
+                    break
+                try:
+                    data = json.loads(message)
+                    handler = self.handlers.get(data.get('type')) if isinstance(data, dict) else None
+                    if handler is None:
+                        raise LiveError('unknown message')
+                    result = handler(client, data)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except (LiveError, ValueError) as e:
+                    client.send_json({'type': 'error', 'error': str(e)})
+        except ProtocolError as e:
+            client.close(e.code)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.disconnect(client)
+            client.close()
+
+    def disconnect(self, client):
+        room = client.room
+        if room is None:
+            return
+        client.room = None
+        if client is room.host:
+            room.close()
+            self.rooms.pop(room.code, None)
+        elif client.player is not None and client.player.client is client:
+            room.leave(client.player)
+
+    def hosted(self, client):
+        if client.room is None or client is not client.room.host:
+            raise LiveError('only the host can do that')
+        return client.room
+
+    async def on_create(self, client, data):
+        if client.room is not None:
+            raise LiveError('already in a room')
+        if len(self.rooms) >= MAX_ROOMS:
+            raise LiveError('too many rooms')
+        snapshot = vocab.vocab_store.snapshot()
+        lesson_ids = data.get('lessons')
+        if (not isinstance(lesson_ids, list) or not lesson_ids
+                or not all(type(i) is int and 0 <= i < len(snapshot.lessons) for i in lesson_ids)):
+            raise LiveError('lessons must be a list of lesson ids')
+        count, seconds = data.get('questions', 10), data.get('seconds', DEFAULT_SECONDS)
+        if type(count) is not int or not 1 <= count <= MAX_QUESTIONS:
+            raise LiveError('questions must be 1-%d' % MAX_QUESTIONS)
+        if type(seconds) not in (int, float) or not MIN_SECONDS <= seconds <= MAX_SECONDS:
+            raise LiveError('seconds must be %d-%d' % (MIN_SECONDS, MAX_SECONDS))
+
+        rng = random.Random(self.rng.random())
+        # Index builds can take a while on a big deck; keep the other rooms moving.
+        words, distractors = await asyncio.get_running_loop().run_in_executor(
+            None, pick_questions, snapshot, list(dict.fromkeys(lesson_ids)), count, rng)
+        if not words:
+            raise LiveError('those lessons have no words')
+        if client.closed:
+            return
+        code = ''.join(self.rng.choice(ROOM_CODE_ALPHABET) for _ in range(ROOM_CODE_LENGTH))
+        while code in self.rooms:
+            code = ''.join(self.rng.choice(ROOM_CODE_ALPHABET) for _ in range(ROOM_CODE_LENGTH))
+        room = self.rooms[code] = Room(code, client, snapshot, words, distractors, seconds, rng)
+        client.room = room
+        client.send_json({'type': 'created', 'code': code, 'questions': len(words), 'seconds': seconds})
+
+    def on_join(self, client, data):
+        if client.room is not None:
+            raise LiveError('already in a room')
+        code, name = data.get('code'), data.get('name')
+        room = self.rooms.get(code.strip().upper()) if isinstance(code, str) else None
+        if room is None:
+            raise LiveError('no such room')
+        name = ' '.join(name.split())[:MAX_NAME_LENGTH] if isinstance(name, str) else ''
+        if not name:
+            raise LiveError('pick a name')
+        room.join(client, name, data.get('token'))
+
+    def on_next(self, client, data):
+        self.hosted(client).ask()
+
+    def on_reveal(self, client, data):
+        self.hosted(client).reveal()
+
+    def on_end(self, client, data):
+        self.hosted(client).finish()
+
+    def on_answer(self, client, data):
+        if client.player is None:
+            raise LiveError('join a room first')
+        client.room.answer(client.player, data.get('n'), data.get('option'))
+
+
+def run(host, port):
+    snapshot = vocab.vocab_store.snapshot()
+    if not isinstance(snapshot.lessons, CompiledDeck):
+        distractor_index(snapshot)
+    print("🟩 DuoVocab live quiz: %d lessons, open http://%s:%d/" % (len(snapshot.lessons), host, port))
+
+    async def serve():
+        server = await LiveServer().start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print("Cannot listen on %s:%d: %s" % (host, port, e), file=sys.stderr)
+        return 1
+    return 0
+
+
+# -------------------------------------------------------------------
+# Page
+# -------------------------------------------------------------------
+LIVE_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>DuoVocab Live</title>
+<style>
+body { font-family: 'Nunito', sans-serif; color: #4b4b4b; margin: 0; }
+.navbar { padding: 15px 40px; border-bottom: 2px solid #e5e5e5; }
+.navbar h1 { margin: 0; font-size: 24px; color: #58cc02; font-weight: 800; }
+.container { max-width: 800px; margin: 0 auto; padding: 30px 20px; }
+.panel { border: 2px solid #e5e5e5; border-radius: 16px; padding: 20px; margin-bottom: 20px; }
+input, select { font: inherit; padding: 8px; border: 2px solid #e5e5e5; border-radius: 12px; margin: 4px 0; }
+select[multiple] { width: 100%; height: 160px; }
+.btn { background: #58cc02; color: white; border: none; padding: 12px 24px; border-radius: 16px;
+       font: inherit; font-weight: 700; cursor: pointer; box-shadow: 0 4px 0 #58a700; text-transform: uppercase; }
+.btn.blue { background: #1cb0f6; box-shadow: 0 4px 0 #1899d6; }
+.code { font-size: 48px; font-weight: 800; letter-spacing: 6px; color: #1cb0f6; }
+.prompt { font-size: 32px; font-weight: 800; margin: 10px 0 20px; }
+.options { display: grid; grid-template-columns: 1fr 1fr; gap: 12px; }
+.option { padding: 18px; border: 2px solid #e5e5e5; border-radius: 16px; background: white; font: inherit;
+          font-size: 18px; font-weight: 700; cursor: pointer; }
+.option.picked { border-color: #1cb0f6; }
+.option.right { border-color: #58cc02; background: #d7ffb8; }
+.option.wrong { border-color: #ff4b4b; background: #ffdfe0; }
+.muted { color: #afafaf; }
+ol.board li { font-weight: 700; padding: 4px 0; }
+.hidden { display: none; }
+</style>
+</head>
+<body>
+<div class="navbar"><h1>DuoVocab Live</h1></div>
+<div class="container">
+  <div id="start">
+    <div class="panel">
+      <h2>Join a quiz</h2>
+      <input id="code" placeholder="Room code" maxlength="5" style="text-transform: uppercase">
+      <input id="name" placeholder="Your name" maxlength="24">
+      <button class="btn" onclick="join()">Join</button>
+    </div>
+    <div class="panel">
+      <h2>Host a quiz</h2>
+      <select id="lessons" multiple><!--lessons--></select>
+      <label>Questions <input id="questions" type="number" value="10" min="1" max="100"></label>
+      <label>Seconds each <input id="seconds" type="number" value="20" min="5" max="300"></label>
+      <button class="btn blue" onclick="host()">Create room</button>
+    </div>
+  </div>
+  <div id="room" class="hidden">
+    <div id="host-bar" class="panel hidden">
+      Room code <div class="code" id="room-code"></div>
+      <button class="btn" onclick="send({type: 'next'})">Next question</button>
+      <button class="btn blue" onclick="send({type: 'reveal'})">Reveal</button>
+      <button class="btn blue" onclick="send({type: 'end'})">End</button>
+    </div>
+    <div id="status" class="muted"></div>
+    <div id="question" class="hidden">
+      <div class="muted" id="q-info"></div>
+      <div class="prompt" id="q-prompt"></div>
+      <div class="options" id="q-options"></div>
+    </div>
+    <h3>Leaderboard</h3>
+    <ol class="board" id="board"></ol>
+  </div>
+</div>
+<script>
+let ws = null, isHost = false, current = 0, picked = -1;
+const $ = (id) => document.getElementById(id);
+
+function connect(first) {
+    ws = new WebSocket((location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + '/ws');
+    ws.onopen = () => send(first);
+    ws.onmessage = (e) => handle(JSON.parse(e.data));
+    ws.onclose = () => { $('status').textContent = 'Disconnected.'; };
+}
+
+function send(message) { ws.send(JSON.stringify(message)); }
+
+function join() {
+    // The token from the last join of this room lets a dropped player keep their name and score.
+    const code = $('code').value.trim().toUpperCase();
+    connect({type: 'join', code: code, name: $('name').value, token: sessionStorage.getItem('live-' + code)});
+}
+
+function host() {
+    isHost = true;
+    const lessons = Array.from($('lessons').selectedOptions, (o) => parseInt(o.value));
+    connect({type: 'create', lessons: lessons, questions: parseInt($('questions').value),
+             seconds: parseFloat($('seconds').value)});
+}
+
+function show() {
+    $('start').classList.add('hidden');
+    $('room').classList.remove('hidden');
+}
+
+function showQuestion(m) {
+    current = m.n;
+    picked = -1;
+    $('question').classList.remove('hidden');
+    $('q-info').textContent = 'Question ' + m.n + ' of ' + m.of + ' · ' + m.seconds + ' s';
+    $('q-prompt').textContent = m.prompt;
+    const grid = $('q-options');
+    grid.innerHTML = '';
+    m.options.forEach((text, i) => {
+        const b = document.createElement('button');
+        b.className = 'option';
+        b.textContent = text;
+        b.dataset.text = text;
+        b.disabled = isHost;
+        b.onclick = () => {
+            if (picked >= 0) return;
+            picked = i;
+            b.classList.add('picked');
+            send({type: 'answer', n: current, option: i});
+        };
+        grid.appendChild(b);
+    });
+}
+
+function showBoard(m) {
+    const board = $('board');
+    board.innerHTML = '';
+    m.top.forEach(([name, score]) => {
+        const li = document.createElement('li');
+        li.textContent = name + ' — ' + score;
+        board.appendChild(li);
+    });
+    if (m.answered !== undefined && isHost) {
+        $('status').textContent = m.players + ' players · ' + m.answered + ' answered';
+    }
+}
+
+function handle(m) {
+    if (m.type === 'error') { alert(m.error); return; }
+    if (m.type === 'created') {
+        show();
+        $('host-bar').classList.remove('hidden');
+        $('room-code').textContent = m.code;
+        $('status').textContent = m.questions + ' questions. Waiting for players...';
+    } else if (m.type === 'joined') {
+        sessionStorage.setItem('live-' + m.code, m.token);
+        show();
+        $('status').textContent = 'Joined ' + m.code + ' as ' + m.name + '. Waiting for the host...';
+    } else if (m.type === 'question') {
+        showQuestion(m);
+    } else if (m.type === 'ack') {
+        $('status').textContent = (m.correct ? 'Correct! +' + m.points : 'Wrong') + ' (' + (m.ms / 1000).toFixed(1) + ' s)';
+    } else if (m.type === 'board') {
+        showBoard(m);
+    } else if (m.type === 'reveal' || m.type === 'finished') {
+        showBoard(m);
+        Array.from($('q-options').children).forEach((b, i) => {
+            b.disabled = true;
+            if (b.dataset.text === m.answer) b.classList.add('right');
+            else if (i === picked) b.classList.add('wrong');
+            if (m.type === 'reveal') b.textContent = b.dataset.text + ' (' + m.counts[i] + ')';
+        });
+        if (m.type === 'finished') $('question').classList.add('hidden');
+    } else if (m.type === 'rank' || m.type === 'final') {
+        $('status').textContent = (m.type === 'final' ? 'Final: ' : '') + 'you are #' + m.rank + ' of ' + m.of + ' with ' + m.score + ' points';
+    } else if (m.type === 'closed') {
+        $('status').textContent = 'The host closed the room.';
+    }
+}
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,1645 @@
+"""The DuoVocab web app: static assets, templates and routes.
+
+The vocabulary, indexes, question logic and storage live in vocab_core.py;
+this module only turns them into pages and JSON. It is imported on demand
+(by `vocab.py run` / `serve`, or through ``vocab.app``) so the command-line
+tools never pay for Flask.
+"""
+import os
+import re
+import time
+import threading
+import uuid
+import random
+import gzip
+import hashlib
+import hmac
+import json
+
+from flask import Flask, render_template, stream_template, request, session, redirect, url_for, jsonify, g
+from jinja2 import DictLoader
+from markupsafe import Markup
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import vocab
+from vocab import (
+    ByteLRU, CompiledDeck, DAY, DIFFICULTY_HALF_LIFE, DIRECTION_SLOTS, DIRECTIONS, MAX_SESSION_SIZE,
+    PROFILE_DIR, REVIEW_SESSION_SIZE, StackSampler, VocabEditError, build_question, cached_page,
+    card_key, card_lookup, deck_stats, difficulty_boosts, distractor_index, encode_question,
+    flat_words, grading_index, iter_words, lesson_summaries, lesson_words, metrics,
+    missed_word_boosts, page_cache,
+    parse_answer_events, parse_lesson_weights, practice_fragments, sample_words, search_index,
+    session_json, settings,
+)
+
+app = Flask(__name__, static_folder=None)
+app.secret_key = settings.secret_key
+
+DICTIONARY_PAGE_SIZE = 100
+
+
+# -------------------------------------------------------------------
+# Static assets (shared CSS / JS, served with content-hash URLs)
+# -------------------------------------------------------------------
+APP_CSS = """
+@import url('https://fonts.googleapis.com/css2?family=Nunito:wght@400;700;800&display=swap');
+
+:root {
+    --primary: #58cc02;
+    --primary-shadow: #58a700;
+    --secondary: #e5e5e5;
+    --secondary-shadow: #cccccc;
+    --text-main: #4b4b4b;
+    --text-muted: #afafaf;
+    --danger: #ff4b4b;
+    --danger-shadow: #ea2b2b;
+    --blue: #1cb0f6;
+    --blue-shadow: #1899d6;
+}
+
+body {
+    font-family: 'Nunito', sans-serif;
+    background-color: #ffffff;
+    color: var(--text-main);
+    margin: 0;
+    padding: 0;
+    display: flex;
+    flex-direction: column;
+    min-height: 100vh;
+}
+
+.navbar {
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+    padding: 15px 40px;
+    border-bottom: 2px solid var(--secondary);
+}
+
+.navbar h1 { margin: 0; font-size: 24px; color: var(--primary); font-weight: 800; cursor: pointer;}
+
+.nav-links a {
+    text-decoration: none;
+    color: var(--text-muted);
+    font-weight: 700;
+    margin-left: 20px;
+    text-transform: uppercase;
+    font-size: 14px;
+    transition: color 0.2s;
+}
+
+.nav-links a:hover, .nav-links a.active { color: var(--blue); }
+
+.container {
+    flex: 1;
+    max-width: 800px;
+    margin: 0 auto;
+    padding: 40px 20px;
+    width: 100%;
+    box-sizing: border-box;
+}
+
+.btn {
+    background: var(--primary);
+    color: white;
+    border: none;
+    padding: 12px 24px;
+    border-radius: 16px;
+    font-size: 16px;
+    font-weight: 700;
+    cursor: pointer;
+    box-shadow: 0 4px 0 var(--primary-shadow);
+    text-transform: uppercase;
+    text-decoration: none;
+    display: inline-block;
+    text-align: center;
+    transition: transform 0.1s, box-shadow 0.1s;
+}
+
+.btn:active {
+    transform: translateY(4px);
+    box-shadow: 0 0 0 transparent;
+}
+
+.btn-outline {
+    background: white;
+    color: var(--text-muted);
+    border: 2px solid var(--secondary);
+    box-shadow: 0 4px 0 var(--secondary);
+}
+
+.btn-outline:active { transform: translateY(4px); box-shadow: 0 0 0 transparent; }
+
+.btn-blue { background: var(--blue); box-shadow: 0 4px 0 var(--blue-shadow); }
+.btn-danger { background: var(--danger); box-shadow: 0 4px 0 var(--danger-shadow); }
+
+.title { text-align: center; margin-bottom: 30px; font-size: 28px; font-weight: 800;}
+
+/* Badges */
+.badge {
+    font-size: 12px; padding: 4px 8px; border-radius: 8px; font-weight: bold; text-transform: uppercase;
+    background: #eee; color: #888;
+}
+.badge.phrase { background: #dceefc; color: #1cb0f6; }
+.badge.noun { background: #fce4e4; color: #ff4b4b; }
+.badge.verb { background: #e4fce4; color: #58cc02; }
+.badge.adjective { background: #fcf4e4; color: #ffc800; }
+
+/* Dictionary elements */
+.stats-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(150px, 1fr)); gap: 15px; margin-bottom: 30px;}
+.stat-card { border: 2px solid var(--secondary); border-radius: 16px; padding: 20px; text-align: center; }
+.stat-card h3 { margin: 0 0 10px 0; font-size: 32px; color: var(--blue); }
+.stat-card p { margin: 0; color: var(--text-muted); font-weight: bold; text-transform: uppercase; font-size: 12px;}
+
+.search-box { width: 100%; padding: 15px; border: 2px solid var(--secondary); border-radius: 16px; font-size: 16px; margin-bottom: 20px; box-sizing: border-box; font-family: inherit;}
+.search-box:focus { outline: none; border-color: var(--blue); }
+
+table { width: 100%; border-collapse: separate; border-spacing: 0 10px; }
+th { text-align: left; padding: 10px 15px; color: var(--text-muted); text-transform: uppercase; font-size: 14px;}
+td { padding: 15px; background: white; border-top: 2px solid var(--secondary); border-bottom: 2px solid var(--secondary); }
+td:first-child { border-left: 2px solid var(--secondary); border-top-left-radius: 16px; border-bottom-left-radius: 16px; font-weight: bold;}
+td:last-child { border-right: 2px solid var(--secondary); border-top-right-radius: 16px; border-bottom-right-radius: 16px; }
+
+/* Syllabus */
+.lesson-card {
+    border: 2px solid var(--secondary);
+    border-radius: 20px;
+    padding: 20px 25px;
+    margin-bottom: 20px;
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+    background: white;
+}
+.lesson-info h2 { margin: 0 0 5px 0; font-size: 20px; }
+.lesson-info p { margin: 0; color: var(--text-muted); font-size: 14px; font-weight: bold;}
+.lesson-actions { display: flex; gap: 10px; }
+.completed { background-color: #f7f7f7; border-color: #eee; }
+.completed .lesson-info h2 { color: var(--text-muted); text-decoration: line-through; }
+
+/* Custom training */
+.grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(250px, 1fr)); gap: 15px; margin-bottom: 30px;}
+.custom-label {
+    display: block; border: 2px solid var(--secondary); border-radius: 16px; padding: 15px; 
+    cursor: pointer; font-weight: bold; transition: all 0.2s;
+}
+.custom-label:hover { border-color: var(--blue); }
+.custom-label input { margin-right: 10px; transform: scale(1.2); }
+
+/* Practice */
+.progress-bar-bg { width: 100%; height: 16px; background: var(--secondary); border-radius: 8px; margin-bottom: 40px; overflow: hidden;}
+.progress-bar-fill { height: 100%; background: var(--primary); width: 0%; transition: width 0.3s ease; }
+
+.question-box { text-align: center; margin-bottom: 40px; }
+.question-title { font-size: 20px; color: var(--text-muted); font-weight: bold; text-transform: uppercase; margin-bottom: 10px;}
+.question-word { font-size: 32px; font-weight: 800; }
+
+.options-grid { display: flex; flex-direction: column; gap: 15px; }
+.option-btn {
+    background: white; border: 2px solid var(--secondary); border-radius: 16px; padding: 15px 20px;
+    font-size: 18px; font-weight: bold; color: var(--text-main); cursor: pointer; text-align: left;
+    box-shadow: 0 4px 0 var(--secondary); transition: all 0.1s;
+}
+.option-btn:hover { background: #f7f7f7; }
+.option-btn:active { transform: translateY(4px); box-shadow: 0 0 0 transparent; }
+
+.option-btn.correct { border-color: var(--primary); background: #eaffd0; color: #58a700; box-shadow: 0 4px 0 var(--primary-shadow); }
+.option-btn.wrong { border-color: var(--danger); background: #ffebeb; color: #ea2b2b; box-shadow: 0 4px 0 var(--danger-shadow); }
+.option-btn:disabled { cursor: not-allowed; }
+
+.bottom-bar {
+    position: fixed; bottom: 0; left: 0; width: 100%; padding: 20px; background: white;
+    border-top: 2px solid var(--secondary); display: flex; justify-content: space-between; align-items: center;
+    box-sizing: border-box; display: none;
+}
+.bottom-bar.active { display: flex; }
+.bottom-bar.correct-bar { background: #d7ffb8; border-color: #c0f296; color: #58a700;}
+.bottom-bar.wrong-bar { background: #ffdfe0; border-color: #ffc4c5; color: #ea2b2b;}
+
+.bottom-msg { font-size: 24px; font-weight: 800; display: flex; align-items: center; gap: 10px; margin-left: 20px;}
+.bottom-btn { max-width: 200px; width: 100%; }
+
+.end-screen { text-align: center; display: none; padding: 40px 0;}
+.end-screen h2 { font-size: 36px; color: var(--primary); }
+
+#quiz-area { display: block; }
+
+.answer-input {
+    width: 100%; padding: 15px 20px; border: 2px solid var(--secondary); border-radius: 16px;
+    font-size: 18px; font-family: inherit; box-sizing: border-box;
+}
+.answer-input:focus { outline: none; border-color: var(--blue); }
+.answer-input.on-track { border-color: var(--primary); }
+.answer-input.off-track { border-color: var(--danger); }
+"""
+
+DICTIONARY_JS = """
+const PAGE_SIZE = 50;
+let searchTimer = null;
+let searchOffset = Number(document.getElementById("vocabTable").dataset.nextOffset);
+const searchSort = document.getElementById("vocabTable").dataset.sort;
+// Static site: the whole word list, fetched on the first search
+const wordsUrl = document.getElementById("vocabTable").dataset.words;
+let allWords = null;
+
+function filterTable() {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => runSearch(true), 150);
+}
+
+function renderRow(word) {
+    let row = document.createElement("tr");
+    [word.spanish, word.czech, null, word.notes].forEach((text, i) => {
+        let cell = document.createElement("td");
+        if (i === 2) {
+            let badge = document.createElement("span");
+            badge.className = "badge " + word.type.toLowerCase();
+            badge.textContent = word.type;
+            cell.appendChild(badge);
+        } else {
+            cell.textContent = text;
+        }
+        if (i === 3) cell.style.cssText = "color: var(--text-muted); font-size: 14px;";
+        row.appendChild(cell);
+    });
+    return row;
+}
+
+function runSearch(reset) {
+    let query = document.getElementById("searchInput").value.trim();
+    if (reset) searchOffset = 0;
+    let params = new URLSearchParams({ q: query, limit: PAGE_SIZE, offset: searchOffset });
+    if (searchSort) params.set('sort', searchSort);
+
+    const search = wordsUrl ? searchLocally(query, searchOffset) : fetch('/api/search?' + params).then(r => r.json());
+    search.then(data => {
+        // Drop responses for a query the user has already typed past
+        if (query !== document.getElementById("searchInput").value.trim()) return;
+        let body = document.querySelector("#vocabTable tbody");
+        if (reset) body.innerHTML = "";
+        data.results.forEach(word => body.appendChild(renderRow(word)));
+        searchOffset = data.offset + data.results.length;
+        document.getElementById("loadMore").style.display = searchOffset < data.total ? "" : "none";
+    });
+}
+
+function fold(text) {
+    return text.toLowerCase().normalize("NFD").replace(/[\\u0300-\\u036f]/g, "");
+}
+
+function searchLocally(query, offset) {
+    if (!allWords) {
+        allWords = fetch(wordsUrl).then(r => r.json()).then(words => words.map(w => ({
+            spanish: w[0], czech: w[1], type: w[2], notes: w[3], text: fold(w[0] + "\\n" + w[1] + "\\n" + w[3])
+        })));
+    }
+    const folded = fold(query);
+    return allWords.then(words => {
+        const hits = folded ? words.filter(w => w.text.includes(folded)) : words;
+        return { total: hits.length, offset: offset, results: hits.slice(offset, offset + PAGE_SIZE) };
+    });
+}
+"""
+
+PRACTICE_JS = """
+let sessionData = null;
+let currentIndex = 0;
+let currentOptions = [];
+let correctAnswer = "";
+let questionShownAt = 0;
+
+// Answer events are buffered and sent in batches; whatever the server
+// could not take yet stays in the buffer for the next attempt.
+let answerBuffer = [];
+let answersInFlight = false;
+
+function recordAnswer(question, isCorrect) {
+    if (staticSite) return;
+    answerBuffer.push({
+        word_id: question.word_id,
+        direction: question.direction,
+        correct: isCorrect,
+        latency_ms: Math.round(performance.now() - questionShownAt)
+    });
+    if (answerBuffer.length >= 10) sendAnswers();
+}
+
+function sendAnswers() {
+    if (answersInFlight || answerBuffer.length === 0) return;
+    const events = answerBuffer.slice(0, 500);
+    answersInFlight = true;
+    fetch('/api/answers', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ version: sessionData.version, events: events })
+    }).then(r => r.json()).then(data => {
+        answerBuffer.splice(0, data.accepted || 0);
+    }).catch(() => {}).finally(() => { answersInFlight = false; });
+}
+
+window.addEventListener('pagehide', () => {
+    if (answerBuffer.length === 0) return;
+    const body = JSON.stringify({ version: sessionData.version, events: answerBuffer.slice(0, 500) });
+    navigator.sendBeacon('/api/answers', new Blob([body], { type: 'application/json' }));
+    answerBuffer = [];
+});
+
+function loadQuestion() {
+    if (currentIndex >= sessionData.questions.length) {
+        showEndScreen();
+        return;
+    }
+
+    let question = sessionData.questions[currentIndex];
+    correctAnswer = question.answer;
+
+    document.getElementById('q-title').innerText = question.direction === 'es-cz' ? 'Translate to Czech' : 'Translate to Spanish';
+    document.getElementById('q-word').innerText = question.prompt;
+
+    if (typedMode) {
+        renderTypedInput(question);
+    } else {
+        currentOptions = shuffle(question.options.slice());
+        renderOptions();
+    }
+    updateProgress();
+    hideBottomBar();
+    questionShownAt = performance.now();
+}
+
+function renderOptions() {
+    const grid = document.getElementById('options-grid');
+    grid.innerHTML = '';
+    currentOptions.forEach((opt, index) => {
+        let btn = document.createElement('button');
+        btn.className = 'option-btn';
+        btn.innerText = opt;
+        btn.onclick = () => checkAnswer(opt, btn);
+        grid.appendChild(btn);
+    });
+}
+
+// Typed mode: graded on the server, with live hints while typing
+const typedMode = new URLSearchParams(location.search).get('mode') === 'typed';
+let hintTimer = null;
+
+function gradeUrl(question, text, final) {
+    return '/api/grade?' + new URLSearchParams({
+        word_id: question.word_id, direction: question.direction, version: sessionData.version,
+        answer: text, final: final ? '1' : '0'
+    });
+}
+
+function renderTypedInput(question) {
+    const grid = document.getElementById('options-grid');
+    grid.innerHTML = '';
+    const input = document.createElement('input');
+    input.className = 'answer-input';
+    input.placeholder = 'Type the translation...';
+    input.autocomplete = 'off';
+    input.oninput = () => {
+        clearTimeout(hintTimer);
+        hintTimer = setTimeout(() => showHint(question, input), 100);
+    };
+    input.onkeydown = (e) => { if (e.key === 'Enter') submitTyped(question, input, btn); };
+    const btn = document.createElement('button');
+    btn.className = 'btn';
+    btn.innerText = 'Check';
+    btn.onclick = () => submitTyped(question, input, btn);
+    grid.appendChild(input);
+    grid.appendChild(btn);
+    input.focus();
+}
+
+function showHint(question, input) {
+    const text = input.value;
+    if (!text.trim() || staticSite) { input.className = 'answer-input'; return; }
+    fetch(gradeUrl(question, text, false)).then(r => r.json()).then(result => {
+        if (input.value !== text || input.disabled) return;
+        input.className = 'answer-input ' + (result.on_track || result.verdict !== 'wrong' ? 'on-track' : 'off-track');
+    }).catch(() => {});
+}
+
+function submitTyped(question, input, btn) {
+    if (input.disabled || !input.value.trim()) return;
+    input.disabled = true;
+    btn.disabled = true;
+    clearTimeout(hintTimer);
+    const graded = staticSite ? Promise.reject(new Error('no server')) : fetch(gradeUrl(question, input.value, true));
+    graded.then(r => {
+        if (!r.ok) throw new Error('grading unavailable');
+        return r.json();
+    }).catch(() => {
+        // No server, or the deck changed under us: compare as typed,
+        // ignoring case, and accept missing accents with a note
+        const plain = (text) => text.trim().toLowerCase();
+        const bare = (text) => plain(text).normalize('NFD').replace(/[\\u0300-\\u036f]/g, '');
+        if (plain(input.value) === plain(correctAnswer)) return { verdict: 'correct' };
+        return bare(input.value) === bare(correctAnswer) ? { verdict: 'correct', accents: true } : { verdict: 'wrong' };
+    }).then(result => {
+        const isCorrect = result.verdict !== 'wrong';
+        input.className = 'answer-input ' + (isCorrect ? 'on-track' : 'off-track');
+        gradeCard(question, isCorrect);
+        recordAnswer(question, isCorrect);
+        let message = null;
+        if (result.verdict === 'typo') {
+            message = '✔ Almost! Watch the spelling: ' + correctAnswer;
+        } else if (result.verdict === 'correct' && result.accents) {
+            message = '✔ Correct! With accents: ' + correctAnswer;
+        } else if (!isCorrect && result.did_you_mean && result.did_you_mean.length) {
+            const other = result.did_you_mean[0];
+            message = '✘ "' + other.term + '" means "' + other.means.join(', ') + '". Correct answer: ' + correctAnswer;
+        }
+        showBottomBar(isCorrect, message);
+        if (!isCorrect) sessionData.questions.push(question);
+    });
+}
+
+function checkAnswer(selected, btnElement) {
+    const btns = document.querySelectorAll('.option-btn');
+    btns.forEach(b => b.disabled = true);
+
+    const isCorrect = (selected === correctAnswer);
+    gradeCard(sessionData.questions[currentIndex], isCorrect);
+    recordAnswer(sessionData.questions[currentIndex], isCorrect);
+
+    if (isCorrect) {
+        btnElement.classList.add('correct');
+        showBottomBar(true);
+    } else {
+        btnElement.classList.add('wrong');
+        btns.forEach(b => {
+            if (b.innerText === correctAnswer) b.classList.add('correct');
+        });
+        showBottomBar(false);
+        sessionData.questions.push(sessionData.questions[currentIndex]); 
+    }
+}
+
+// Review sessions report each card's first answer to the scheduler
+const gradedCards = new Set();
+function gradeCard(question, isCorrect) {
+    if (!question.card || gradedCards.has(question.card)) return;
+    gradedCards.add(question.card);
+    fetch('/api/review', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ card: question.card, correct: isCorrect })
+    });
+}
+
+function showBottomBar(isCorrect, message) {
+    const bar = document.getElementById('bottom-bar');
+    const msg = document.getElementById('bottom-msg');
+
+    bar.className = 'bottom-bar active';
+    if (message) {
+        bar.classList.add(isCorrect ? 'correct-bar' : 'wrong-bar');
+        msg.textContent = message;
+    } else if (isCorrect) {
+        bar.classList.add('correct-bar');
+        msg.innerHTML = '✔ Excellent!';
+    } else {
+        bar.classList.add('wrong-bar');
+        msg.innerHTML = '✘ Correct answer: ' + correctAnswer;
+    }
+}
+
+function hideBottomBar() {
+    document.getElementById('bottom-bar').className = 'bottom-bar';
+}
+
+function nextQuestion() {
+    currentIndex++;
+    loadQuestion();
+}
+
+function updateProgress() {
+    const fill = document.getElementById('progress-fill');
+    const percentage = (currentIndex / sessionData.questions.length) * 100;
+    fill.style.width = percentage + '%';
+}
+
+function showEndScreen() {
+    document.getElementById('quiz-area').style.display = 'none';
+    document.getElementById('progress-container').style.display = 'none';
+    document.getElementById('end-screen').style.display = 'block';
+    hideBottomBar();
+    sendAnswers();
+
+    if (sessionData.is_single_lesson && staticSite) {
+        const completed = loadCompleted();
+        completed.add(sessionData.lesson_id);
+        saveCompleted(completed);
+    } else if (sessionData.is_single_lesson) {
+        fetch('/mark_complete/' + sessionData.lesson_id, { method: 'POST' });
+    }
+}
+
+// Shuffle helper
+function shuffle(array) {
+    let currentIndex = array.length, randomIndex;
+    while (currentIndex !== 0) {
+        randomIndex = Math.floor(Math.random() * currentIndex);
+        currentIndex--;
+        [array[currentIndex], array[randomIndex]] = [array[randomIndex], array[currentIndex]];
+    }
+    return array;
+}
+
+// Static site: sessions are put together here from per-lesson bundles of
+// pre-built questions (one per direction for every word)
+const lessonBundles = document.getElementById('lesson-bundles');
+const staticSite = lessonBundles !== null;
+
+function staticSession(params) {
+    const urls = JSON.parse(lessonBundles.textContent);
+    const lessonId = params.get('lesson_id');
+    const selected = Array.from(new Set(lessonId !== null ? [lessonId] : params.getAll('custom_lessons')))
+        .map(Number).filter(i => urls[i]);
+    if (!selected.length) return Promise.reject(new Error('no session'));
+    return Promise.all(selected.map(i => fetch(urls[i]).then(r => {
+        if (!r.ok) throw new Error('no lesson');
+        return r.json();
+    }))).then(lessons => {
+        let questions = shuffle(lessons.flatMap(l => l.questions.map(choices => choices[Math.floor(Math.random() * choices.length)])));
+        const size = parseInt(params.get('size') || params.get('limit'));
+        if (size > 0) questions = questions.slice(0, size);
+        return { questions: questions, is_single_lesson: lessonId !== null, lesson_id: Number(lessonId) };
+    });
+}
+
+// The page is a static shell; fetch the session for this URL's parameters
+const sessionParams = new URLSearchParams(location.search);
+if (location.pathname === '/review') sessionParams.set('review', '1');
+(staticSite ? staticSession(sessionParams) : fetch('/api/practice?' + sessionParams).then(r => {
+    if (!r.ok) throw new Error('no session');
+    return r.json();
+})).then(data => {
+    sessionData = data;
+    loadQuestion();
+}).catch(() => { window.location.href = '/'; });
+"""
+
+PROGRESS_JS = """
+// Static site: completed lessons are kept in this browser, not on a server
+const PROGRESS_KEY = 'duovocab.completed';
+
+function loadCompleted() {
+    try {
+        return new Set(JSON.parse(localStorage.getItem(PROGRESS_KEY)) || []);
+    } catch (e) {
+        return new Set();
+    }
+}
+
+function saveCompleted(completed) {
+    localStorage.setItem(PROGRESS_KEY, JSON.stringify(Array.from(completed)));
+}
+
+function showProgress() {
+    const completed = loadCompleted();
+    document.querySelectorAll('.lesson-card form').forEach(form => {
+        const id = Number(new URL(form.action, location.href).pathname.split('/').pop());
+        const done = completed.has(id);
+        form.action = (done ? '/unskip/' : '/skip/') + id;
+        form.querySelector('button').textContent = done ? 'Undo' : 'Skip';
+        form.closest('.lesson-card').classList.toggle('completed', done);
+    });
+}
+
+// The syllabus forms post to the server's progress routes; handle them here
+document.addEventListener('submit', (e) => {
+    const match = new URL(e.target.action, location.href).pathname.match(/^\\/(skip|unskip|reset)(?:\\/(\\d+))?$/);
+    if (!match) return;
+    e.preventDefault();
+    const completed = loadCompleted();
+    if (match[1] === 'reset') completed.clear();
+    else if (match[1] === 'skip') completed.add(Number(match[2]));
+    else completed.delete(Number(match[2]));
+    saveCompleted(completed);
+    showProgress();
+});
+
+showProgress();
+"""
+
+
+COMPRESS_MIN_BYTES = 512
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'application/javascript', 'application/json')
+
+
+def compress(body, encoding, static=False):
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if static else 5)
+    return gzip.compress(body, compresslevel=9 if static else 6, mtime=0)
+
+
+def negotiate_encoding(accept_encodings):
+    """Pick 'br' or 'gzip' from a parsed Accept-Encoding header, or None."""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def hashed_name(name, body):
+    """``name`` with a hash of ``body`` before the extension: ``app.<hash>.css``."""
+    stem, ext = os.path.splitext(name)
+    return '%s.%s%s' % (stem, hashlib.blake2b(body, digest_size=8).hexdigest(), ext)
+
+
+class StaticAsset:
+    """One asset with its content hash and precompressed variants."""
+
+    def __init__(self, name, text, mimetype):
+        self.mimetype = mimetype
+        identity = text.lstrip('\n').encode('utf-8')
+        self.etag = hashlib.blake2b(identity, digest_size=8).hexdigest()
+        self.filename = hashed_name(name, identity)
+        self.variants = {None: identity, 'gzip': compress(identity, 'gzip', static=True)}
+        if brotli is not None:
+            self.variants['br'] = compress(identity, 'br', static=True)
+
+
+STATIC_ASSETS = {
+    name: StaticAsset(name, text, mimetype) for name, text, mimetype in (
+        ('app.css', APP_CSS, 'text/css'),
+        ('dictionary.js', DICTIONARY_JS, 'application/javascript'),
+        ('practice.js', PRACTICE_JS, 'application/javascript'),
+        ('progress.js', PROGRESS_JS, 'application/javascript'),
+    )
+}
+ASSETS_BY_FILENAME = {asset.filename: asset for asset in STATIC_ASSETS.values()}
+
+
+def asset_url(name):
+    return '/assets/' + STATIC_ASSETS[name].filename
+
+
+# Compressed HTML/JSON bodies, keyed by (content hash, encoding). Cleared
+# whenever the vocabulary version changes, since pages built from the old
+# deck will not be asked for again.
+COMPRESSED_CACHE_BYTES = 32 * 1024 * 1024
+compressed_cache = ByteLRU(COMPRESSED_CACHE_BYTES)
+_compressed_cache_version = [0]
+
+
+def compressed_variant(version, digest, encoding, body):
+    if _compressed_cache_version[0] != version:
+        compressed_cache.clear()
+        _compressed_cache_version[0] = version
+    key = (digest, encoding)
+    data = compressed_cache.get(key)
+    if data is None:
+        data = compress(body, encoding)
+        compressed_cache.put(key, data)
+    return data
+
+
+# -------------------------------------------------------------------
+# HTML / CSS / JS Templates (Embedded cleanly via DictLoader)
+# -------------------------------------------------------------------
+BASE_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>DuoVocab Practice</title>
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
+    {% if static_site %}<script defer src="{{ asset_url('progress.js') }}"></script>{% endif %}
+</head>
+<body>
+    <div class="navbar">
+        <h1 onclick="window.location.href='/'">DuoVocab</h1>
+        <div class="nav-links">
+            <a href="/">Learn</a>
+            <a href="/dictionary">Dictionary</a>
+            <a href="/custom">Custom Training</a>
+            {% if not static_site %}
+            <a href="/review">Review</a>
+            <a href="/stats">Stats</a>
+            {% endif %}
+        </div>
+    </div>
+    
+    <div class="container">
+        {% block content %}{% endblock %}
+    </div>
+</body>
+</html>
+"""
+
+INDEX_TEMPLATE = """
+{% extends "base.html" %}
+{% block content %}
+<div style="display: flex; justify-content: space-between; align-items: center;">
+    <h2 class="title" style="margin: 0;">Syllabus</h2>
+    <form method="POST" action="/reset" style="margin:0;">
+        <button type="submit" class="btn btn-outline" style="padding: 8px 15px; font-size: 12px;">Reset Progress</button>
+    </form>
+</div>
+<br>
+
+{% if not lessons %}
+    <div style="text-align:center; padding: 50px; border: 2px dashed var(--secondary); border-radius: 20px;">
+        <h3 style="color: var(--danger);">vocabs.txt not found!</h3>
+        <p>Please place the <b>vocabs.txt</b> file in the same directory as this script and refresh.</p>
+    </div>
+{% endif %}
+
+{{ lesson_cards }}
+{% endblock %}
+"""
+
+# Rendered once per lesson and completion state, then shared by all users
+LESSON_CARD_TEMPLATE = """
+    <div class="lesson-card {% if done %}completed{% endif %}">
+        <div class="lesson-info">
+            <h2>{{ lesson.lesson_name }}</h2>
+            <p>{{ lesson.word_count }} Words / Phrases</p>
+        </div>
+        <div class="lesson-actions">
+            {% if not done %}
+                <form method="POST" action="/skip/{{ i }}"><button class="btn btn-outline" type="submit">Skip</button></form>
+            {% else %}
+                <form method="POST" action="/unskip/{{ i }}"><button class="btn btn-outline" type="submit">Undo</button></form>
+            {% endif %}
+            <a href="/practice?lesson_id={{ i }}&mode=typed" class="btn btn-outline" title="Type the answers">Type</a>
+            <a href="/practice?lesson_id={{ i }}" class="btn">Start</a>
+        </div>
+    </div>
+"""
+
+DICTIONARY_TEMPLATE = """
+{% extends "base.html" %}
+{% block content %}
+<h2 class="title">Dictionary & Glossary</h2>
+
+<div class="stats-grid">
+    <div class="stat-card">
+        <h3>{{ total_words }}</h3>
+        <p>Total Items</p>
+    </div>
+    <div class="stat-card">
+        <h3>{{ stats.Phrase | default(0) }}</h3>
+        <p>Phrases</p>
+    </div>
+    <div class="stat-card">
+        <h3>{{ stats.Noun | default(0) }}</h3>
+        <p>Nouns</p>
+    </div>
+    <div class="stat-card">
+        <h3>{{ stats.Verb | default(0) }}</h3>
+        <p>Verbs</p>
+    </div>
+</div>
+
+<input type="text" id="searchInput" class="search-box" placeholder="Search in Spanish, Czech, or Notes..." oninput="filterTable()">
+{% if not static_site %}
+<p style="text-align: right; margin-top: 0;">
+    {% if sort == 'difficulty' %}<a href="/dictionary">Deck order</a>{% else %}<a href="/dictionary?sort=difficulty">Hardest first</a>{% endif %}
+</p>
+{% endif %}
+
+<table id="vocabTable" data-next-offset="{{ next_offset }}" data-sort="{{ sort or '' }}" data-words="{{ words_url or '' }}">
+    <thead>
+        <tr>
+            <th>Spanish</th>
+            <th>Czech</th>
+            <th>Type</th>
+            <th>Notes</th>
+        </tr>
+    </thead>
+    <tbody>
+        {% for word in all_words %}
+        <tr>
+            <td>{{ word.spanish }}</td>
+            <td>{{ word.czech }}</td>
+            <td><span class="badge {{ word.type.lower() }}">{{ word.type }}</span></td>
+            <td style="color: var(--text-muted); font-size: 14px;">{{ word.notes }}</td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+
+<div style="text-align: center;">
+    <button id="loadMore" class="btn btn-outline" {% if next_offset >= total_words %}style="display: none;"{% endif %} onclick="runSearch(false)">Load more</button>
+</div>
+
+<script src="{{ asset_url('dictionary.js') }}"></script>
+{% endblock %}
+"""
+
+CUSTOM_TRAINING_TEMPLATE = """
+{% extends "base.html" %}
+{% block content %}
+<h2 class="title">Custom Training</h2>
+<p style="text-align:center; color: var(--text-muted); margin-bottom: 30px;">Select specific lessons to combine into one ultimate practice session.</p>
+
+<form action="/practice" method="GET">
+    <div class="grid">
+        {% for i, lesson in lessons %}
+        <label class="custom-label">
+            <input type="checkbox" name="custom_lessons" value="{{ i }}">
+            {{ lesson.lesson_name.split(':')[0] }}
+        </label>
+        {% endfor %}
+    </div>
+    <div style="text-align: center;">
+        <label class="custom-label" style="display: inline-flex; margin-bottom: 20px;">
+            Questions
+            <select name="size">
+                <option value="20">20</option>
+                <option value="50" selected>50</option>
+                <option value="100">100</option>
+                <option value="">All</option>
+            </select>
+        </label>
+        {% if not static_site %}
+        <label class="custom-label" style="display: inline-flex; margin-bottom: 20px;">
+            Focus on
+            <select name="favor">
+                <option value="" selected>Nothing</option>
+                <option value="missed">Words I missed</option>
+                <option value="hard">Hard words</option>
+            </select>
+        </label>
+        {% endif %}
+        <label class="custom-label" style="display: inline-flex; margin-bottom: 20px;">
+            <input type="checkbox" name="mode" value="typed">
+            Type the answers
+        </label>
+        <br>
+        <button type="submit" class="btn btn-blue" style="width: 100%; max-width: 300px;">Start Custom Practice</button>
+    </div>
+</form>
+{% endblock %}
+"""
+
+PRACTICE_TEMPLATE = """
+{% extends "base.html" %}
+{% block content %}
+<div class="progress-bar-bg" id="progress-container">
+    <div class="progress-bar-fill" id="progress-fill"></div>
+</div>
+
+<div id="quiz-area">
+    <div class="question-box">
+        <div class="question-title" id="q-title">Translate this</div>
+        <div class="question-word" id="q-word">Word</div>
+    </div>
+    <div class="options-grid" id="options-grid">
+        <!-- Buttons injected by JS -->
+    </div>
+</div>
+
+<div id="end-screen" class="end-screen">
+    <h2>Lesson Complete! 🎉</h2>
+    <p>Great job! You have completed this practice session.</p>
+    <br>
+    <a href="/" class="btn">Continue</a>
+</div>
+
+<div class="bottom-bar" id="bottom-bar">
+    <div class="bottom-msg" id="bottom-msg"></div>
+    <button class="btn bottom-btn" id="next-btn" onclick="nextQuestion()">Continue</button>
+</div>
+
+{% if static_site %}<script id="lesson-bundles" type="application/json">{{ bundles | tojson }}</script>{% endif %}
+<script src="{{ asset_url('practice.js') }}"></script>
+{% endblock %}
+"""
+
+STATS_TEMPLATE = """
+{% extends "base.html" %}
+{% block content %}
+<h2 class="title">Word Difficulty</h2>
+
+<div class="stats-grid">
+    <div class="stat-card">
+        <h3>{{ report.answers }}</h3>
+        <p>Answers</p>
+    </div>
+    {% for direction, row in report.directions.items() %}
+    <div class="stat-card">
+        <h3>{{ row.error_rate | percent }}</h3>
+        <p>Recent errors {{ direction }}</p>
+    </div>
+    {% endfor %}
+</div>
+
+<h3>Hardest words</h3>
+{% if not report.words %}
+<p style="color: var(--text-muted);">No answers yet. Practice a lesson and come back.</p>
+{% else %}
+<table>
+    <thead>
+        <tr><th>Spanish</th><th>Czech</th><th>Difficulty</th><th>Answers</th><th>Errors</th><th>Avg time</th></tr>
+    </thead>
+    <tbody>
+        {% for word in report.words %}
+        <tr>
+            <td>{{ word.spanish }}</td>
+            <td>{{ word.czech }}</td>
+            <td>{{ word.difficulty | percent }}</td>
+            <td>{{ word.attempts }}</td>
+            <td>{{ word.errors }}</td>
+            <td>{{ word.mean_latency_ms | seconds }}</td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+<p style="text-align: center;"><a href="/dictionary?sort=difficulty">All words, hardest first</a></p>
+{% endif %}
+
+{% if report.lessons %}
+<h3>Lessons</h3>
+<table>
+    <thead>
+        <tr><th>Lesson</th><th>Difficulty</th><th>Answers</th><th>Errors</th><th>Avg time</th></tr>
+    </thead>
+    <tbody>
+        {% for lesson in report.lessons %}
+        <tr>
+            <td><a href="/stats?lesson={{ lesson.lesson_id }}">{{ lesson.lesson_name }}</a></td>
+            <td>{{ lesson.difficulty | percent }}</td>
+            <td>{{ lesson.attempts }}</td>
+            <td>{{ lesson.errors }}</td>
+            <td>{{ lesson.mean_latency_ms | seconds }}</td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+{% endif %}
+{% endblock %}
+"""
+
+# Register all templates cleanly inside Jinja2's DictLoader
+app.jinja_loader = DictLoader({
+    "base.html": BASE_TEMPLATE,
+    "index.html": INDEX_TEMPLATE,
+    "lesson_card.html": LESSON_CARD_TEMPLATE,
+    "dictionary.html": DICTIONARY_TEMPLATE,
+    "custom.html": CUSTOM_TRAINING_TEMPLATE,
+    "practice.html": PRACTICE_TEMPLATE,
+    "stats.html": STATS_TEMPLATE
+})
+app.jinja_env.globals['asset_url'] = asset_url
+app.jinja_env.filters['percent'] = lambda v: '-' if v is None else '%.0f%%' % (100 * v)
+app.jinja_env.filters['seconds'] = lambda ms: '-' if ms is None else '%.1f s' % (ms / 1000.0)
+
+CARDS_MARKER = '<!--lesson-cards-->'
+
+
+def syllabus_parts(snapshot):
+    """``(head, [(card, completed_card), ...], tail)`` for the syllabus page.
+
+    The per-user part of the page is only which variant of each card is
+    used, so everything here is shared by all users.
+    """
+    def render():
+        summaries = lesson_summaries(snapshot)
+        card = app.jinja_env.get_template('lesson_card.html')
+        cards = [tuple(card.render(i=i, lesson=lesson, done=done) for done in (False, True))
+                 for i, lesson in enumerate(summaries)]
+        page = render_template('index.html', lessons=summaries, lesson_cards=Markup(CARDS_MARKER))
+        head, tail = page.split(CARDS_MARKER)
+        return head, cards, tail
+
+    return cached_page(('index.html', snapshot.version), render)
+
+
+# -------------------------------------------------------------------
+# Sessions
+# -------------------------------------------------------------------
+def current_user_id():
+    """The visitor's progress id, created on first use.
+
+    Visitors who still carry the old cookie ``completed`` list have it moved
+    into the progress store.
+    """
+    user_id = session.get('uid')
+    if user_id is None:
+        user_id = session['uid'] = uuid.uuid4().hex
+        for lesson_id in session.pop('completed', None) or ():
+            vocab.progress_store.mark(user_id, int(lesson_id))
+    return user_id
+
+
+# -------------------------------------------------------------------
+# Routes
+# -------------------------------------------------------------------
+
+@app.route('/assets/<filename>')
+def static_asset(filename):
+    asset = ASSETS_BY_FILENAME.get(filename)
+    if asset is None:
+        return "Not found", 404
+    encoding = negotiate_encoding(request.accept_encodings)
+    response = app.response_class(asset.variants[encoding], mimetype=asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    # The URL changes whenever the content does, so it never needs revalidating.
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.set_etag(asset.etag + ('.' + encoding if encoding else ''))
+    return response.make_conditional(request)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILE_DIR and request.headers.get('X-Profile') == '1':
+        g.profiler = StackSampler(threading.get_ident()).start()
+
+# Registered before add_etag_and_compress so it runs after it (Flask calls
+# after_request hooks in reverse) and sees the final, compressed body.
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started, route=route)
+    metrics.inc('http_requests_total', route=route, method=request.method, status=response.status_code)
+    if response.content_length:
+        metrics.inc('http_response_bytes_total', response.content_length, route=route)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        name = '%d-%s%s.folded' % (time.time_ns(), request.method, re.sub(r'\W+', '_', route))
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, name), 'w', encoding='utf-8') as f:
+            f.write(profiler.folded())
+        response.headers['X-Profile-Stacks'] = name
+    return response
+
+@app.after_request
+def add_etag_and_compress(response):
+    """Strong ETag, 304 handling and gzip/brotli for HTML and JSON responses."""
+    if (request.method not in ('GET', 'HEAD') or response.status_code != 200
+            or response.is_streamed or response.direct_passthrough
+            or response.get_etag()[0] or 'Content-Encoding' in response.headers):
+        return response
+
+    body = response.get_data()
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    etag = digest
+    if response.mimetype in COMPRESSIBLE_TYPES:
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(request.accept_encodings)
+        if encoding and len(body) >= COMPRESS_MIN_BYTES:
+            if response.cache_control.no_store:
+                response.set_data(compress(body, encoding))
+            else:
+                response.set_data(compressed_variant(vocab.vocab_store.version, digest, encoding, body))
+            response.headers['Content-Encoding'] = encoding
+            etag = '%s.%s' % (digest, encoding)
+    response.headers.setdefault('Cache-Control', 'no-cache')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+@app.route('/')
+def index():
+    completed = vocab.progress_store.completed(current_user_id())
+    head, cards, tail = syllabus_parts(vocab.vocab_store.snapshot())
+    body = ''.join([card[i in completed] for i, card in enumerate(cards)])
+    return head + body + tail
+
+@app.route('/skip/<int:lesson_id>', methods=['POST'])
+def skip_lesson(lesson_id):
+    vocab.progress_store.mark(current_user_id(), lesson_id)
+    return redirect(url_for('index'))
+
+@app.route('/unskip/<int:lesson_id>', methods=['POST'])
+def unskip_lesson(lesson_id):
+    vocab.progress_store.mark(current_user_id(), lesson_id, done=False)
+    return redirect(url_for('index'))
+
+@app.route('/reset', methods=['POST'])
+def reset_progress():
+    vocab.progress_store.reset(current_user_id())
+    return redirect(url_for('index'))
+
+@app.route('/mark_complete/<int:lesson_id>', methods=['POST'])
+def mark_complete(lesson_id):
+    vocab.progress_store.mark(current_user_id(), lesson_id)
+    return jsonify({"status": "success"})
+
+@app.route('/dictionary')
+def dictionary():
+    snapshot = vocab.vocab_store.snapshot()
+    stats = deck_stats(snapshot)
+    per_page = max(1, min(request.args.get('per_page', DICTIONARY_PAGE_SIZE, type=int), 1000))
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        offset = (max(1, request.args.get('page', 1, type=int)) - 1) * per_page
+    offset = max(0, min(offset, stats.total))
+
+    # Streaming mode sends every remaining row as it is rendered; otherwise
+    # only one page is rendered and the rest is fetched from /api/search.
+    streaming = request.args.get('stream') == '1'
+    stop = stats.total if streaming else min(offset + per_page, stats.total)
+    sort = 'difficulty' if request.args.get('sort') == 'difficulty' else None
+    if sort:
+        table = vocab.difficulty_stats.table(snapshot)
+        words = flat_words(snapshot)
+        all_words = (words[wid][1] for wid in table.order().ids[offset:stop])
+        generation = table.generation
+    else:
+        all_words, generation = iter_words(snapshot, offset, stop), None
+    context = dict(
+        all_words=all_words,
+        total_words=stats.total,
+        stats=stats.by_type,
+        next_offset=stop,
+        sort=sort,
+    )
+    if streaming:
+        return app.response_class(stream_template('dictionary.html', **context), mimetype='text/html')
+    return cached_page(('dictionary.html', snapshot.version, offset, stop, generation),
+                       lambda: render_template('dictionary.html', **context))
+
+@app.route('/api/search')
+def api_search():
+    snapshot = vocab.vocab_store.snapshot()
+    words = flat_words(snapshot)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    order = None
+    if request.args.get('sort') == 'difficulty':
+        order = vocab.difficulty_stats.table(snapshot).order()
+    total, page = search_index(snapshot).search(
+        request.args.get('q', ''),
+        word_type=request.args.get('type') or None,
+        lesson_id=request.args.get('lesson', type=int),
+        limit=limit,
+        offset=offset,
+        order=order,
+    )
+    results = []
+    for wid in page:
+        lesson_id, w = words[wid]
+        results.append({
+            "id": wid,
+            "lesson_id": lesson_id,
+            "spanish": w['spanish'],
+            "czech": w['czech'],
+            "type": w.get('type', 'Other'),
+            "notes": w.get('notes', ''),
+        })
+    return jsonify({"total": total, "offset": offset, "limit": limit, "results": results})
+
+@app.route('/custom')
+def custom_training():
+    snapshot = vocab.vocab_store.snapshot()
+    return cached_page(('custom.html', snapshot.version), lambda: render_template(
+        'custom.html', lessons=list(enumerate(lesson_summaries(snapshot)))))
+
+@app.route('/practice')
+@app.route('/review')
+def practice():
+    # Static shell: the session itself comes from /api/practice, so the page
+    # is identical for every lesson and user and can be cached.
+    response = app.make_response(cached_page(('practice.html',), lambda: render_template('practice.html')))
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+@app.route('/api/practice')
+def api_practice():
+    """A practice session as JSON.
+
+    Sources: ``lesson_id``, repeated ``custom_lessons`` or ``review=1``.
+    ``limit`` caps the number of questions and ``seed`` makes directions
+    and order reproducible (the seed used is returned either way).
+
+    For lessons, ``size`` (or ``limit``) draws that many distinct words with
+    sample_words(): repeated ``weight=<lesson_id>:<weight>`` scales a lesson,
+    ``favor=missed`` boosts words the user has answered wrongly before and
+    ``favor=hard`` boosts words with a high difficulty score.
+    """
+    snapshot = vocab.vocab_store.snapshot()
+    seed = request.args.get('seed', type=int)
+    fixed_seed = seed is not None
+    if not fixed_seed:
+        seed = random.randrange(2 ** 31)
+    rng = random.Random(seed)
+    limit = request.args.get('limit', type=int)
+
+    fragments = []
+    is_single = False
+    l_id = -1
+    if request.args.get('review') == '1':
+        limit = max(1, min(limit or REVIEW_SESSION_SIZE, 200))
+        index = distractor_index(snapshot)
+        fragments = [
+            encode_question(dict(build_question(w, index, rng=rng), card=card_key(w), word_id=wid))
+            for wid, w in vocab.review_scheduler.due(current_user_id(), snapshot, limit=limit)
+        ]
+    else:
+        lesson_id = request.args.get('lesson_id', type=int)
+        if lesson_id is not None:
+            selected = [lesson_id]
+        else:
+            selected = request.args.getlist('custom_lessons', type=int)
+        selected = [idx for idx in dict.fromkeys(selected) if 0 <= idx < len(snapshot.lessons)]
+        size = request.args.get('size', type=int) or limit
+        if size and selected:
+            # Only the sampled words are looked at, so the cost follows the
+            # session length rather than the size of the selection.
+            summaries = lesson_summaries(snapshot)
+            weights = parse_lesson_weights(request.args.getlist('weight'))
+            boosts = None
+            if request.args.get('favor') == 'missed':
+                boosts = missed_word_boosts(snapshot, current_user_id())
+            elif request.args.get('favor') == 'hard':
+                boosts = difficulty_boosts(snapshot, selected)
+            picks = sample_words([(idx, summaries[idx].word_count, weights.get(idx, 1.0)) for idx in selected],
+                                 min(max(1, size), MAX_SESSION_SIZE), rng, boosts)
+            fragments = [rng.choice(practice_fragments(snapshot, idx)[pos]) for idx, pos in picks]
+        else:
+            for idx in selected:
+                fragments.extend(rng.choice(choices) for choices in practice_fragments(snapshot, idx))
+        if lesson_id is not None and selected:
+            is_single, l_id = True, lesson_id
+
+    if not fragments:
+        return jsonify({"status": "error", "error": "nothing to practice"}), 404
+
+    rng.shuffle(fragments)
+    if limit:
+        fragments = fragments[:max(1, limit)]
+    response = app.response_class(session_json(
+        fragments, is_single_lesson=is_single, lesson_id=l_id, version=snapshot.version, seed=seed,
+    ), mimetype='application/json')
+    if not fixed_seed:
+        # A one-off random session: not worth keeping compressed copies of.
+        response.cache_control.no_store = True
+    return response
+
+@app.route('/api/grade')
+def api_grade():
+    """Grade a typed answer; cheap enough to call on every keystroke.
+
+    ``final=0`` (live hints) omits the expected answer and suggestions.
+    """
+    snapshot = vocab.vocab_store.snapshot()
+    words = flat_words(snapshot)
+    wid = request.args.get('word_id', type=int)
+    direction = request.args.get('direction')
+    if request.args.get('version', type=int) != snapshot.version:
+        return jsonify({"status": "error", "error": "vocabulary changed"}), 409
+    if wid is None or not 0 <= wid < len(words) or direction not in DIRECTIONS:
+        return jsonify({"status": "error", "error": "unknown question"}), 400
+    result = grading_index(snapshot).grade(words[wid][1], direction, request.args.get('answer', ''),
+                                           final=request.args.get('final') != '0')
+    return jsonify(result)
+
+@app.route('/api/answers', methods=['POST'])
+def api_answers():
+    rows, error = parse_answer_events(request.get_json(silent=True), current_user_id(),
+                                      vocab.vocab_store.snapshot(), time.time())
+    if error:
+        return jsonify({"status": "error", "error": error}), 400
+    accepted = vocab.answer_log.submit(rows)
+    body = {"status": "success", "accepted": accepted, "dropped": len(rows) - accepted}
+    if accepted < len(rows):
+        # Queue is full: tell the client to keep the rest and retry later.
+        body["status"] = "partial"
+        return jsonify(body), 503, {"Retry-After": "1"}
+    return jsonify(body), 202
+
+metrics.gauge('vocab_version', 'Version of the vocabulary snapshot being served.',
+              lambda: vocab.vocab_store.version)
+metrics.gauge('cache_bytes', 'Bytes held by in-process caches.',
+              lambda: {(('cache', 'page'),): page_cache.nbytes, (('cache', 'compressed'),): compressed_cache.nbytes})
+metrics.gauge('cache_lookups_total', 'Cache lookups, by cache and result.', lambda: {
+    (('cache', name), ('result', result)): getattr(lru, result)
+    for name, lru in (('page', page_cache), ('compressed', compressed_cache))
+    for result in ('hits', 'misses')}, kind='counter')
+metrics.gauge('answer_events_total', 'Answer events, by what happened to them.', lambda: {
+    (('state', k),): v for k, v in vocab.answer_log.stats().items() if k != 'queued'}, kind='counter')
+metrics.gauge('answer_queue_depth', 'Answer events waiting for the writer.',
+              lambda: vocab.answer_log.stats()['queued'])
+
+@app.route('/healthz')
+def healthz():
+    snapshot = vocab.vocab_store.snapshot()
+    response = jsonify(status='ok', pid=os.getpid(), version=snapshot.version,
+                       lessons=len(snapshot.lessons))
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    response = app.response_class(metrics.render(), mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/api/answers/stats')
+def api_answer_stats():
+    return jsonify(vocab.answer_log.stats())
+
+def difficulty_report(snapshot, limit=50, lesson_id=None):
+    """Aggregates for /stats and /api/stats: totals, hardest words, and lessons."""
+    table = vocab.difficulty_stats.table(snapshot)
+    words = flat_words(snapshot)
+    if lesson_id is None:
+        order = table.order()
+        hardest = order.ids[:min(limit, order.answered)]
+    else:
+        offsets = table.offsets
+        hardest = sorted((wid for wid in range(offsets[lesson_id], offsets[lesson_id + 1])
+                          if wid in table.attempted), key=lambda wid: -table.difficulty[wid])[:limit]
+
+    def word_entry(wid):
+        lesson, w = words[wid]
+        row = table.word_row(wid)
+        both = [row[direction] for direction in DIRECTIONS]
+        attempts = sum(r['attempts'] for r in both)
+        latency = [r['mean_latency_ms'] * r['attempts'] for r in both if r['attempts']]
+        return dict(row, id=wid, lesson_id=lesson, spanish=w['spanish'], czech=w['czech'],
+                    card=card_key(w), attempts=attempts, errors=sum(r['errors'] for r in both),
+                    mean_latency_ms=round(sum(latency) / attempts) if attempts else None)
+
+    lessons = []
+    for idx, summary in enumerate(lesson_summaries(snapshot)):
+        if lesson_id is not None and idx != lesson_id:
+            continue
+        row = table.lesson_row(idx)
+        both = [row[direction] for direction in DIRECTIONS]
+        attempts = sum(r['attempts'] for r in both)
+        if attempts:
+            latency = sum(r['mean_latency_ms'] * r['attempts'] for r in both if r['attempts'])
+            lessons.append(dict(row, lesson_id=idx, lesson_name=summary.lesson_name, attempts=attempts,
+                                errors=sum(r['errors'] for r in both),
+                                mean_latency_ms=round(latency / attempts)))
+    lessons.sort(key=lambda l: -l['difficulty'])
+
+    directions = vocab.difficulty_stats.directions
+    return {
+        "version": snapshot.version,
+        "last_event_id": vocab.difficulty_stats.last_event_id,
+        "half_life_days": DIFFICULTY_HALF_LIFE / DAY,
+        "answers": sum(directions.attempts),
+        "directions": {direction: directions.row(d) for direction, d in DIRECTION_SLOTS.items()},
+        "lessons": lessons,
+        "words": [word_entry(wid) for wid in hardest],
+    }
+
+@app.route('/stats')
+def stats():
+    snapshot = vocab.vocab_store.snapshot()
+    lesson_id = request.args.get('lesson', type=int)
+    if lesson_id is not None and not 0 <= lesson_id < len(snapshot.lessons):
+        lesson_id = None
+    return render_template('stats.html', report=difficulty_report(snapshot, 50, lesson_id))
+
+@app.route('/api/stats')
+def api_stats():
+    """Word, lesson and direction difficulty. ``limit`` caps the word list; ``lesson`` narrows it."""
+    snapshot = vocab.vocab_store.snapshot()
+    lesson_id = request.args.get('lesson', type=int)
+    if lesson_id is not None and not 0 <= lesson_id < len(snapshot.lessons):
+        return jsonify({"status": "error", "error": "unknown lesson"}), 404
+    limit = max(1, min(request.args.get('limit', 50, type=int), 1000))
+    return jsonify(difficulty_report(snapshot, limit, lesson_id))
+
+@app.route('/api/review', methods=['POST'])
+def api_review():
+    payload = request.get_json(silent=True) or {}
+    key = payload.get('card')
+    snapshot = vocab.vocab_store.snapshot()
+    if not isinstance(key, str) or key not in card_lookup(snapshot):
+        return jsonify({"status": "error", "error": "unknown card"}), 400
+    # Multiple choice only tells us right/wrong: map it onto SM-2 grades.
+    quality = 4 if payload.get('correct') else 1
+    due = vocab.review_scheduler.grade(current_user_id(), key, quality, snapshot)
+    return jsonify({"status": "success", "due": due})
+
+def edit_denied():
+    """The error response for a request that may not edit the deck, or None."""
+    if not settings.edit_token:
+        return jsonify({"status": "error", "error": "editing is disabled; set DUOVOCAB_EDIT_TOKEN"}), 403
+    expected = ('Bearer ' + settings.edit_token).encode('utf-8')
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'), expected):
+        return jsonify({"status": "error", "error": "missing or wrong edit token"}), 401, \
+            {"WWW-Authenticate": "Bearer"}
+    return None
+
+def edit_deck(op, status=200, **fields):
+    """Apply one DeckEditor record built from the JSON body and the URL.
+
+    An optional ``revision`` (in the body or the query string) makes the edit
+    fail with 409 if the deck changed since the client read it.
+    """
+    denied = edit_denied()
+    if denied is not None:
+        return denied
+    payload = request.get_json(silent=True) if request.content_length else {}
+    if not isinstance(payload, dict):
+        return jsonify({"status": "error", "error": "expected a JSON object"}), 400
+    revision = payload.pop('revision', None) or request.args.get('revision')
+    try:
+        snapshot, record, revision = vocab.vocab_store.edit(dict(payload, op=op, **fields), revision)
+    except VocabEditError as e:
+        return jsonify({"status": "error", "error": str(e)}), e.status
+    return jsonify({"status": "success", "edit": record, "revision": revision,
+                    "version": snapshot.version}), status
+
+@app.route('/api/lessons')
+def api_lessons():
+    # Read before the snapshot: if they disagree, the revision is the older one
+    # and an edit based on it fails instead of overwriting unseen changes.
+    revision = vocab.vocab_store.revision
+    snapshot = vocab.vocab_store.snapshot()
+    lessons = [{"id": idx, "lesson_name": summary.lesson_name, "word_count": summary.word_count}
+               for idx, summary in enumerate(lesson_summaries(snapshot))]
+    return jsonify({"revision": revision, "version": snapshot.version, "lessons": lessons})
+
+@app.route('/api/lessons', methods=['POST'])
+def api_add_lesson():
+    return edit_deck('add_lesson', status=201)
+
+@app.route('/api/lessons/<int:lesson_id>', methods=['PATCH'])
+def api_update_lesson(lesson_id):
+    return edit_deck('update_lesson', lesson=lesson_id)
+
+@app.route('/api/lessons/<int:lesson_id>', methods=['DELETE'])
+def api_delete_lesson(lesson_id):
+    return edit_deck('delete_lesson', lesson=lesson_id)
+
+@app.route('/api/lessons/<int:lesson_id>/words')
+def api_lesson_words(lesson_id):
+    revision = vocab.vocab_store.revision
+    snapshot = vocab.vocab_store.snapshot()
+    words = lesson_words(snapshot, lesson_id)
+    if words is None:
+        return jsonify({"status": "error", "error": "unknown lesson"}), 404
+    return jsonify({"revision": revision, "version": snapshot.version,
+                    "lesson_id": lesson_id, "lesson_name": lesson_summaries(snapshot)[lesson_id].lesson_name,
+                    "words": [dict(w) for w in words]})
+
+@app.route('/api/lessons/<int:lesson_id>/words', methods=['POST'])
+def api_add_word(lesson_id):
+    return edit_deck('add_word', status=201, lesson=lesson_id)
+
+@app.route('/api/lessons/<int:lesson_id>/words/<int:position>', methods=['PATCH'])
+def api_update_word(lesson_id, position):
+    return edit_deck('update_word', lesson=lesson_id, position=position)
+
+@app.route('/api/lessons/<int:lesson_id>/words/<int:position>', methods=['DELETE'])
+def api_delete_word(lesson_id, position):
+    return edit_deck('delete_word', lesson=lesson_id, position=position)
+
+
+# -------------------------------------------------------------------
+# Static export
+# -------------------------------------------------------------------
+# Names written by an export are content-hashed (``lesson-3.<hash>.json``)
+# except the entry pages; only files named like that are ever pruned.
+_EXPORTED_RE = re.compile(r'^[\w-]+\.[0-9a-f]{16}\.\w+(\.gz|\.br)?$')
+EXPORT_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+
+def export_variants(body):
+    """``{encoding: bytes}`` to write for ``body``: as is, gzip and (if available) brotli."""
+    variants = {None: body}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        variants['gzip'] = compress(body, 'gzip', static=True)
+        if brotli is not None:
+            variants['br'] = compress(body, 'br', static=True)
+    return variants
+
+
+def write_exported(out_dir, path, body, variants=None):
+    """Write ``path`` with .gz/.br copies next to it (for nginx's gzip_static); returns bytes written.
+
+    A content-hashed file that already exists is left alone, since its name
+    says it is the same. Compressed copies are written first, so a new plain
+    file never sits next to stale ones.
+    """
+    full = os.path.join(out_dir, path)
+    if _EXPORTED_RE.match(os.path.basename(path)) and os.path.exists(full):
+        return 0
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    variants = variants or export_variants(body)
+    written = 0
+    for encoding in sorted(variants, key=lambda e: e is None):
+        target = full + EXPORT_SUFFIXES.get(encoding, '')
+        tmp = '%s.%d.tmp' % (target, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(variants[encoding])
+        os.replace(tmp, target)
+        written += len(variants[encoding])
+    for encoding, suffix in EXPORT_SUFFIXES.items():
+        if encoding not in variants and os.path.exists(full + suffix):
+            os.unlink(full + suffix)
+    return written
+
+
+def export_lessons(out_dir, lesson_ids):
+    """Write the question bundles of ``lesson_ids``; ``([(lesson_id, path)], bytes)``.
+
+    A bundle holds the lesson's pre-encoded practice questions, every
+    alternative of every word, and practice.js builds sessions from it.
+    """
+    snapshot = vocab.vocab_store.snapshot()
+    summaries = lesson_summaries(snapshot)
+    done, written = [], 0
+    for idx in lesson_ids:
+        choices = [b'[' + b','.join(word) + b']' for word in practice_fragments(snapshot, idx)]
+        body = session_json(choices, lesson_id=idx, lesson_name=summaries[idx].lesson_name)
+        path = 'lessons/' + hashed_name('lesson-%d.json' % idx, body)
+        written += write_exported(out_dir, path, body)
+        done.append((idx, path))
+    return done, written
+
+
+def _init_export_worker(path, compiled_path, lazy):
+    # Forked workers already hold the exporting process's deck.
+    if vocab.vocab_store.path != path:
+        vocab.vocab_store = vocab.VocabStore(path, compiled_path, lazy=lazy)
+
+
+def export_site(out_dir, jobs=1):
+    """Render the read-only part of the app into ``out_dir`` as static files.
+
+    Writes index.html, dictionary.html, custom.html and practice.html, the
+    assets, the word list the dictionary searches, and one question bundle
+    per lesson, built by ``jobs`` processes. Progress is kept in the
+    browser. Hashed files left over from earlier exports are removed once
+    the new pages are in place. Returns counts for the summary line.
+    """
+    store = vocab.vocab_store
+    snapshot = store.snapshot()
+    summaries = lesson_summaries(snapshot)
+    keep, written = set(), 0
+
+    for asset in STATIC_ASSETS.values():
+        path = 'assets/' + asset.filename
+        written += write_exported(out_dir, path, asset.variants[None], asset.variants)
+        keep.add(path)
+
+    ids = list(range(len(summaries)))
+    size = max(1, min(64, len(ids) // (4 * jobs) + 1))
+    chunks = [ids[i:i + size] for i in range(0, len(ids), size)]
+    if jobs <= 1 or len(chunks) <= 1:
+        results = [export_lessons(out_dir, chunk) for chunk in chunks]
+    else:
+        if not isinstance(snapshot.lessons, CompiledDeck):
+            distractor_index(snapshot)  # built once, then shared with forked workers
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(jobs, initializer=_init_export_worker,
+                                 initargs=(store.path, store.compiled_path, store.lazy)) as pool:
+            results = list(pool.map(export_lessons, [out_dir] * len(chunks), chunks))
+    bundles = [None] * len(ids)
+    for done, n in results:
+        written += n
+        for idx, path in done:
+            bundles[idx] = '/' + path
+            keep.add(path)
+
+    words = json.dumps([[w['spanish'], w['czech'], w.get('type', 'Other'), w.get('notes', '')]
+                        for w in iter_words(snapshot)], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    words_path = 'assets/' + hashed_name('words.json', words)
+    written += write_exported(out_dir, words_path, words)
+    keep.add(words_path)
+
+    stats = deck_stats(snapshot)
+    stop = min(DICTIONARY_PAGE_SIZE, stats.total)
+    with app.app_context():
+        card = app.jinja_env.get_template('lesson_card.html')
+        cards = ''.join(card.render(i=i, lesson=lesson, done=False) for i, lesson in enumerate(summaries))
+        pages = {
+            'index.html': render_template('index.html', lessons=summaries, lesson_cards=Markup(cards),
+                                          static_site=True),
+            'dictionary.html': render_template('dictionary.html', all_words=iter_words(snapshot, 0, stop),
+                                               total_words=stats.total, stats=stats.by_type, next_offset=stop,
+                                               sort=None, words_url='/' + words_path, static_site=True),
+            'custom.html': render_template('custom.html', lessons=list(enumerate(summaries)), static_site=True),
+            'practice.html': render_template('practice.html', bundles=bundles, static_site=True),
+        }
+    # The entry pages go last: everything they point to is in place by then.
+    for name, page in pages.items():
+        written += write_exported(out_dir, name, page.encode('utf-8'))
+
+    pruned = 0
+    for folder in ('assets', 'lessons'):
+        full = os.path.join(out_dir, folder)
+        if not os.path.isdir(full):
+            continue
+        for name in sorted(os.listdir(full)):
+            base = name[:-3] if name.endswith(('.gz', '.br')) else name
+            if _EXPORTED_RE.match(name) and '%s/%s' % (folder, base) not in keep:
+                os.unlink(os.path.join(full, name))
+                pruned += 1
+    return {'lessons': len(ids), 'files': len(keep) + len(pages), 'bytes': written, 'pruned': pruned}